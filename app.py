@@ -1,11 +1,33 @@
-from flask import Flask, redirect, render_template, session, url_for
+import json
+import logging
+import threading
+import time
+
+import click
+from flask import (
+    Flask,
+    Response,
+    abort,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 
 from config import Config
+from models import events, instrumentation, jobs, metrics, repository
+from models.catalog import catalog_cache
+from models.dashboard import dashboard_cache
+from models.resilience import ServiceUnavailable
 from routes import admin, auth, customer
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+slow_log = logging.getLogger("slow_requests")
+
 
 # ===== Blueprints =====
 app.register_blueprint(auth.bp)
@@ -13,6 +35,84 @@ app.register_blueprint(admin.bp, url_prefix="/admin")
 app.register_blueprint(customer.bp, url_prefix="/customer")
 
 
+# ===== Query instrumentation =====
+@app.before_request
+def start_request_stats():
+    instrumentation.begin()
+
+
+@app.after_request
+def report_request_stats(response):
+    stats = instrumentation.current()
+    if stats is None:
+        return response
+    if app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = stats.server_timing()
+    if stats.degraded:
+        response.headers["X-Degraded"] = ", ".join(sorted(stats.degraded))
+
+    elapsed_ms = stats.elapsed_ms()
+    max_ms = app.config["SLOW_REQUEST_MS"]
+    max_calls = app.config["SLOW_REQUEST_QUERIES"]
+    if (max_ms and elapsed_ms >= max_ms) or (max_calls and len(stats.calls) >= max_calls):
+        slow_log.warning(
+            json.dumps(
+                {
+                    "event": "slow_request",
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "ms": round(elapsed_ms, 1),
+                    "db_calls": len(stats.calls),
+                    "db_ms": round(stats.db_ms(), 1),
+                    "calls": stats.by_call(),
+                }
+            )
+        )
+    return response
+
+
+@app.teardown_request
+def end_request_stats(exc):
+    instrumentation.end()
+
+
+# ===== Metrics =====
+metrics.registry.register_cache("catalog", catalog_cache)
+metrics.registry.register_cache("dashboard", dashboard_cache)
+
+
+@app.after_request
+def record_metrics(response):
+    stats = instrumentation.current()
+    if stats is None:
+        return response
+    blueprint = request.blueprint or "app"
+    endpoint = request.endpoint or "unmatched"
+    metrics.REQUEST_DURATION.observe(
+        stats.elapsed_ms() / 1000, blueprint=blueprint, endpoint=endpoint
+    )
+    metrics.REQUESTS.inc(
+        blueprint=blueprint, endpoint=endpoint, status=str(response.status_code)
+    )
+    metrics.record_calls(stats.calls, source="http")
+    metrics.registry.maybe_flush()
+    return response
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    # Scrapers send METRICS_TOKEN; otherwise only a logged-in admin may read it
+    token = app.config["METRICS_TOKEN"]
+    authorized = token and request.headers.get("Authorization") == f"Bearer {token}"
+    if not authorized and session.get("role") != "admin":
+        abort(401)
+    return Response(
+        metrics.registry.render(), mimetype="text/plain; version=0.0.4"
+    )
+
+
 @app.route("/")
 def index():
     if "user" in session:
@@ -22,11 +122,60 @@ def index():
     return redirect(url_for("auth.login"))
 
 
+# ===== Background jobs =====
+@app.before_request
+def start_job_workers():
+    # Started on the first request rather than at import, so that workers
+    # forked from a preloaded app each get their own threads
+    jobs.ensure_worker_threads()
+
+
+@app.cli.command("run-jobs")
+@click.option("--threads", default=1, show_default=True, help="Worker threads.")
+@click.option("--once", is_flag=True, help="Run the jobs due now, then exit.")
+@click.option("--purge-days", default=7.0, show_default=True,
+              help="Delete finished jobs older than this on start.")
+def run_jobs(threads, once, purge_days):
+    """Run background jobs (models/jobs.py) in this process."""
+    events.warn_if_local_only("flask run-jobs publishes from its own process")
+    click.echo(f"purged {jobs.queue.purge(purge_days * 86400)} finished jobs")
+    if once:
+        click.echo(f"ran {jobs.queue.run_pending()} jobs")
+        return
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=jobs.work, args=(stop, app.config["JOBS_POLL_SECONDS"]))
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+@app.cli.command("reconcile-ledger")
+def reconcile_ledger():
+    """Rebuild the debt ledger (orders.paid_amount, customer_balances)."""
+    click.echo(json.dumps(repository.reconcile_debt_ledger()))
+
+
 @app.errorhandler(404)
 def not_found(e):
     return render_template("404.html"), 404
 
 
+@app.errorhandler(ServiceUnavailable)
+def service_unavailable(e):
+    response = make_response(render_template("503.html"), 503)
+    response.headers["Retry-After"] = str(max(1, round(e.retry_after or 5)))
+    return response
+
+
 if __name__ == "__main__":
     # For local development
     app.run(debug=True)
@@ -0,0 +1,127 @@
+"""
+ASGI entry point serving the same Flask app from an asyncio server.
+
+    uvicorn asgi:app --workers 2
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 2
+
+This is the production entry point (render.yaml); with more than one worker,
+or with `flask run-jobs`, set EVENTS_DATABASE_URL (see models/events.py).
+
+Connections and idle keep-alives wait on the event loop, and each request runs
+the unchanged blueprints on a thread from a per-process pool (ASGI_THREADS), so
+a Supabase round trip blocks one thread instead of a whole worker process.
+`gunicorn app:app` still works but has no change feed.
+
+The customer change feed (/customer/events, see models/events.py) is served
+here directly on the event loop: each open stream is a coroutine waiting on
+its queue, so thousands of idle streams don't take request threads.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+
+from app import app as flask_app
+from config import Config
+from models import events
+
+wsgi_app = WSGIMiddleware(flask_app, workers=Config.ASGI_THREADS)
+
+if Config.WEB_CONCURRENCY > 1:
+    events.warn_if_local_only(f"{Config.WEB_CONCURRENCY} ASGI workers")
+
+EVENTS_PATH = "/customer/events"
+
+
+def _session_customer_id(scope):
+    """customer_id from the signed Flask session cookie, or None."""
+    header = dict(scope["headers"]).get(b"cookie")
+    if not header:
+        return None
+    morsel = SimpleCookie(header.decode("latin-1")).get(flask_app.config["SESSION_COOKIE_NAME"])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if morsel is None or serializer is None:
+        return None
+    try:
+        data = serializer.loads(
+            morsel.value, max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+        )
+    except BadSignature:
+        return None
+    if "user" not in data:
+        return None
+    return data.get("customer_id")
+
+
+async def _plain(send, status, body=b""):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def event_stream(scope, receive, send):
+    customer_id = _session_customer_id(scope)
+    if customer_id is None:
+        # 204 tells EventSource to stop reconnecting
+        await _plain(send, 204)
+        return
+
+    sub = events.subscribe(customer_id)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    getter = None
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send(
+            {"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True}
+        )
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(sub.queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnected},
+                timeout=Config.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                return
+            if getter in done:
+                body = events.format_sse(getter.result())
+                getter = None
+            else:
+                body = b": keep-alive\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    except OSError:
+        pass  # client went away mid-write
+    finally:
+        for task in (getter, disconnected):
+            if task is not None:
+                task.cancel()
+        events.unsubscribe(sub)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,115 @@
+"""
+Read/write latency and cross-process invalidation of the cache backends.
+
+For each backend (memory, sqlite, redis) a cache entry the size of a catalog
+is written and read back, and a second process checks that it sees the entry
+and that its invalidate() is seen here. The redis backend needs the `redis`
+package and runs against --redis-url, or else an in-process `fakeredis`
+TCP server when that package is installed; otherwise it is skipped.
+
+    python -m benchmarks.cache_backends [--rows 2000] [--reads 2000]
+                                        [--redis-url redis://localhost:6379/0]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from models import cache
+
+try:
+    from fakeredis import TcpFakeServer
+except ImportError:
+    TcpFakeServer = None
+
+NAMESPACE = "benchmark"
+
+
+def _store(backend, target):
+    if backend == "memory":
+        return cache.MemoryStore(16)
+    if backend == "sqlite":
+        return cache.SQLiteStore(target, NAMESPACE, 16)
+    return cache.RedisStore(target, NAMESPACE)
+
+
+def _other_worker(backend, target, results):
+    """Runs in a second process: read the entry, then invalidate it."""
+    store = _store(backend, target)
+    results.put(store.get("catalog") is not cache.MISSING)
+    cache.TTLCache(16, 60, store).invalidate("catalog")
+
+
+def _run(backend, target, rows, reads):
+    catalog = [
+        {"id": f"product-{i}", "name": f"Product {i}", "category": "benchmark"}
+        for i in range(rows)
+    ]
+    c = cache.TTLCache(16, 60, _store(backend, target))
+    c.invalidate()
+
+    start = time.perf_counter()
+    c.set("catalog", catalog)
+    write_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        c.get("catalog")
+        timings.append((time.perf_counter() - start) * 1000)
+
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_other_worker, args=(backend, target, results)
+    )
+    worker.start()
+    worker.join()
+    seen_by_other = results.get()
+    invalidated_here = c.get("catalog") is None
+    return write_ms, statistics.median(timings), seen_by_other, invalidated_here
+
+
+def _start_fake_redis():
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"redis://{host}:{port}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    server = None
+    redis_url = args.redis_url
+    if not redis_url and cache.redis is not None and TcpFakeServer is not None:
+        server, redis_url = _start_fake_redis()
+    sqlite_path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+
+    backends = [("memory", None), ("sqlite", sqlite_path)]
+    if redis_url and cache.redis is not None:
+        backends.append(("redis", redis_url))
+    else:
+        print("redis: skipped (needs the redis package and --redis-url or fakeredis)")
+
+    print(f"entry: {args.rows} rows, reads: {args.reads}")
+    print(f"{'backend':<8}{'write ms':>10}{'read p50 ms':>13}{'shared':>8}{'coherent':>10}")
+    for backend, target in backends:
+        write_ms, read_ms, shared, coherent = _run(backend, target, args.rows, args.reads)
+        print(
+            f"{backend:<8}{write_ms:>10.2f}{read_ms:>13.3f}"
+            f"{'yes' if shared else 'no':>8}{'yes' if coherent else 'no':>10}"
+        )
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Detail-page latency with and without concurrent fan-out of independent reads.
+
+Runs the real Flask app in-process against the in-memory fake backend with a
+simulated per-call round trip, once with a single-thread pool (reads run one
+after another) and once with the configured pool (reads run concurrently).
+
+    python -m benchmarks.detail_pages [--latency-ms 30] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["DATA_BACKEND"] = "fake"
+    os.environ["FAKE_LATENCY_MS"] = str(args.latency_ms)
+
+    from app import app
+    from config import Config
+    from models import concurrency, db
+
+    fake = db.supabase
+    customer = fake.tables["customers"][0]
+    offers = fake.tables["product_suppliers"][:5]
+    fake.seed("requests", [{"customer_id": customer["id"], "status": "accepted"}])
+    request_id = fake.tables["requests"][-1]["id"]
+    fake.seed(
+        "request_items",
+        [{"request_id": request_id, "product_id": o["product_id"], "quantity": 1} for o in offers],
+    )
+    fake.seed("quotes", [{"request_id": request_id, "status": "accepted", "total_amount": 0}])
+    quote_id = fake.tables["quotes"][-1]["id"]
+    fake.seed(
+        "quote_items",
+        [
+            {
+                "quote_id": quote_id,
+                "product_supplier_id": o["id"],
+                "quantity": 1,
+                "quoted_price": o["sell_price"],
+                "subtotal": o["sell_price"],
+            }
+            for o in offers
+        ],
+    )
+    fake.seed(
+        "orders",
+        [
+            {
+                "quote_id": quote_id,
+                "customer_id": customer["id"],
+                "supplier_id": offers[0]["supplier_id"],
+                "total_cost": 100,
+                "total_sell": 120,
+                "profit": 20,
+                "status": "pending",
+            }
+        ],
+    )
+    order_id = fake.tables["orders"][-1]["id"]
+    fake.seed(
+        "order_items",
+        [
+            {
+                "order_id": order_id,
+                "product_supplier_id": o["id"],
+                "quantity": 1,
+                "cost_price": o["cost_price"],
+                "sell_price": o["sell_price"],
+                "subtotal": o["sell_price"],
+            }
+            for o in offers
+        ],
+    )
+    fake.seed("customer_payments", [{"order_id": order_id, "amount": 50}])
+
+    pages = {
+        "admin.order_detail": f"/admin/orders/{order_id}",
+        "admin.request_detail": f"/admin/requests/{request_id}",
+    }
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = "benchmark-admin"
+        session["role"] = "admin"
+
+    print(f"latency per call: {args.latency_ms:.0f} ms, runs: {args.runs}")
+    print(f"{'page':<24}{'sequential p50':>16}{'concurrent p50':>16}{'speedup':>10}")
+    for name, url in pages.items():
+        results = {}
+        for label, workers in (("sequential", 1), ("concurrent", Config.DB_FANOUT_WORKERS)):
+            concurrency.configure(workers)
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.status_code
+            results[label] = statistics.median(timings)
+        print(
+            f"{name:<24}{results['sequential']:>13.1f} ms"
+            f"{results['concurrent']:>13.1f} ms"
+            f"{results['sequential'] / results['concurrent']:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
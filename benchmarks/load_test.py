@@ -0,0 +1,138 @@
+"""
+Load test comparing the serving modes against the fake backend.
+
+Starts the app in a subprocess in each mode, logs in as the demo admin and
+hammers one page from many concurrent clients for a fixed time:
+
+    sync      gunicorn app:app                       (one request per process)
+    threaded  gunicorn app:app --threads N           (one request per thread)
+    asgi      gunicorn asgi:app -k UvicornWorker     (see asgi.py)
+
+    python -m benchmarks.load_test [--latency-ms 50] [--clients 32] [--duration 10]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _commands(workers, threads, bind):
+    gunicorn = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", bind]
+    modes = {
+        "sync": gunicorn + ["app:app"],
+        "threaded": gunicorn + ["--threads", str(threads), "app:app"],
+    }
+    try:
+        import uvicorn  # noqa: F401
+
+        modes["asgi"] = gunicorn + ["-k", "uvicorn.workers.UvicornWorker", "asgi:app"]
+    except ImportError:
+        print("uvicorn not installed, skipping asgi mode")
+    return modes
+
+
+def _wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/login", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def _run_load(base_url, path, clients, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client_loop():
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            client.post(
+                "/login", data={"email": "admin@example.com", "password": "password"}
+            )
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                try:
+                    response = client.get(path)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--path", default="/admin/dashboard")
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        DATA_BACKEND="fake",
+        FAKE_LATENCY_MS=str(args.latency_ms),
+        SECRET_KEY="load-test",
+        ASGI_THREADS=str(args.threads),
+    )
+    print(
+        f"{args.path}, {args.clients} clients, {args.duration:.0f}s, "
+        f"{args.workers} workers, {args.latency_ms:.0f} ms per backend call"
+    )
+    print(f"{'mode':<10}{'req/s':>10}{'p50':>12}{'p99':>12}{'errors':>8}")
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    for mode, command in _commands(args.workers, args.threads, f"127.0.0.1:{port}").items():
+        server = subprocess.Popen(
+            command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_ready(base_url)
+            latencies, errors = _run_load(base_url, args.path, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        if latencies:
+            p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+            print(
+                f"{mode:<10}{len(latencies) / args.duration:>10.1f}"
+                f"{statistics.median(latencies):>9.1f} ms{p99:>9.1f} ms{errors:>8}"
+            )
+        else:
+            print(f"{mode:<10}{'-':>10}{'-':>12}{'-':>12}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
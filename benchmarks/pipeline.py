@@ -0,0 +1,268 @@
+"""
+Benchmark of the quote-to-order pipeline across cart sizes and supplier counts.
+
+Runs the real Flask app in-process against a local PostgREST stand-in
+(models/fake_postgrest.py) with a simulated per-call round trip, so every call
+goes through postgrest-py, the shared httpx pool and JSON over a socket as it
+does against Supabase. The stand-in serves the in-memory fake from a thread of
+the benchmark process, so it shares the interpreter (and the GIL) with the
+app; --backend fake calls the fake directly instead, without the HTTP layer.
+For every (cart size, supplier count) scenario the data is reseeded and the
+full pipeline is driven through HTTP:
+
+    customer.new_request -> admin.create_quote -> customer.accept_quote
+    -> job.quote_orders -> admin.add_payment (once per order)
+    -> admin.statistics
+
+and p50 / p99 latency, outbound data calls per request and throughput are
+reported per step. job.quote_orders is the background order fan-out, run
+in-process right after the accept request. Use --json to keep results for
+comparing changes.
+
+    python -m benchmarks.pipeline [--backend http|fake] [--latency-ms 20]
+                                  [--iterations 20] [--carts 1,5,20]
+                                  [--suppliers 1,3,8] [--json results.json]
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+
+STEPS = (
+    "customer.new_request",
+    "admin.create_quote",
+    "customer.accept_quote",
+    "job.quote_orders",
+    "admin.add_payment",
+    "admin.statistics",
+)
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _seed(fake, cart_size, supplier_count):
+    fake.reset()
+    fake.seed("customers", [{"user_id": "benchmark-customer", "name": "Benchmark"}])
+    fake.seed(
+        "suppliers", [{"name": f"Supplier {i}"} for i in range(supplier_count)]
+    )
+    fake.seed("products", [{"name": f"Product {i}"} for i in range(cart_size)])
+    for i, product in enumerate(fake.tables["products"]):
+        for j, supplier in enumerate(fake.tables["suppliers"]):
+            cost = 1000 * (i + 1) + 10 * j
+            fake.seed(
+                "product_suppliers",
+                [
+                    {
+                        "product_id": product["id"],
+                        "supplier_id": supplier["id"],
+                        "cost_price": cost,
+                        "sell_price": round(cost * 1.2),
+                    }
+                ],
+            )
+    return fake.tables["customers"][0]["id"]
+
+
+class _Pipeline:
+    """Drives one pipeline run and records latency and calls for each request."""
+
+    def __init__(self, fake, jobs, customer, admin, samples):
+        self.fake = fake
+        self.jobs = jobs
+        self.customer = customer
+        self.admin = admin
+        self.samples = samples
+
+    def _send(self, step, client, method, url, **kwargs):
+        calls = self.fake.calls
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code in (200, 302), (step, response.status_code)
+        self.samples[step].append((elapsed, self.fake.calls - calls))
+        return response
+
+    def _run_jobs(self, step):
+        calls = self.fake.calls
+        start = time.perf_counter()
+        ran = self.jobs.queue.run_pending()
+        elapsed = (time.perf_counter() - start) * 1000
+        assert ran, (step, "no job was queued")
+        self.samples[step].append((elapsed, self.fake.calls - calls))
+
+    def run(self):
+        fake = self.fake
+        products = fake.tables["products"]
+        offers = {}
+        for offer in fake.tables["product_suppliers"]:
+            offers.setdefault(offer["product_id"], []).append(offer)
+
+        self._send(
+            "customer.new_request",
+            self.customer,
+            "POST",
+            "/customer/request/new",
+            data={
+                "product_id[]": [p["id"] for p in products],
+                "quantity[]": ["2"] * len(products),
+                "note": "benchmark",
+            },
+        )
+        request_id = fake.tables["requests"][-1]["id"]
+
+        # Spread lines round-robin over suppliers so accept fans out to
+        # min(cart size, supplier count) orders
+        form = {}
+        for i, product in enumerate(products):
+            offer = offers[product["id"]][i % len(offers[product["id"]])]
+            form[f"product_supplier_{product['id']}"] = offer["id"]
+            form[f"quantity_{product['id']}"] = "2"
+            form[f"price_{product['id']}"] = str(offer["sell_price"])
+        self._send(
+            "admin.create_quote",
+            self.admin,
+            "POST",
+            f"/admin/requests/{request_id}/quote",
+            data=form,
+        )
+        quote_id = fake.tables["quotes"][-1]["id"]
+        assert fake.tables["quotes"][-1]["request_id"] == request_id, "quote not created"
+
+        self._send(
+            "customer.accept_quote",
+            self.customer,
+            "POST",
+            f"/customer/quotes/{quote_id}/accept",
+        )
+        self._run_jobs("job.quote_orders")
+        orders = [o for o in fake.tables["orders"] if o["quote_id"] == quote_id]
+        assert orders, "accept_quote created no orders"
+
+        for order in orders:
+            self._send(
+                "admin.add_payment",
+                self.admin,
+                "POST",
+                f"/admin/orders/{order['id']}/payment",
+                data={"amount": str(order["total_sell"] / 2), "payment_method": "cash"},
+            )
+
+        self._send("admin.statistics", self.admin, "GET", "/admin/statistics")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=("http", "fake"), default="http")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--carts", default="1,5,20")
+    parser.add_argument("--suppliers", default="1,3,8")
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    # Jobs are run by the benchmark itself, in a throwaway queue
+    os.environ["JOBS_WORKER_THREADS"] = "0"
+    os.environ["JOBS_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+    if args.backend == "http":
+        from models import fake_postgrest
+        from models.fake import FakeClient
+
+        fake = FakeClient(latency=args.latency_ms / 1000)
+        server = fake_postgrest.start(fake)
+        os.environ["DATA_BACKEND"] = "supabase"
+        os.environ["SUPABASE_URL"] = server.url
+        os.environ["SUPABASE_KEY"] = fake_postgrest.API_KEY
+    else:
+        os.environ["DATA_BACKEND"] = "fake"
+        os.environ["FAKE_LATENCY_MS"] = str(args.latency_ms)
+
+    from app import app
+    from models import db, jobs
+    from models.catalog import invalidate_catalog
+
+    if args.backend == "fake":
+        fake = db.supabase
+    customer = app.test_client()
+    admin = app.test_client()
+    with admin.session_transaction() as session:
+        session["user"] = "benchmark-admin"
+        session["role"] = "admin"
+
+    carts = [int(n) for n in args.carts.split(",")]
+    supplier_counts = [int(n) for n in args.suppliers.split(",")]
+    results = []
+
+    print(
+        f"backend: {args.backend}, latency per call: {args.latency_ms:.0f} ms, "
+        f"iterations: {args.iterations}"
+    )
+    print(
+        f"{'cart':>5}{'suppl':>6}  {'step':<24}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'calls':>7}{'req/s':>8}"
+    )
+    for cart_size in carts:
+        for supplier_count in supplier_counts:
+            customer_id = _seed(fake, cart_size, supplier_count)
+            invalidate_catalog()
+            with customer.session_transaction() as session:
+                session["user"] = "benchmark-customer"
+                session["role"] = "customer"
+                session["customer_id"] = customer_id
+
+            samples = {step: [] for step in STEPS}
+            pipeline = _Pipeline(fake, jobs, customer, admin, samples)
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                pipeline.run()
+            wall = time.perf_counter() - start
+
+            for step in STEPS:
+                timings = [ms for ms, _ in samples[step]]
+                calls = [n for _, n in samples[step]]
+                row = {
+                    "cart_size": cart_size,
+                    "suppliers": supplier_count,
+                    "step": step,
+                    "requests": len(timings),
+                    "p50_ms": round(_percentile(timings, 50), 2),
+                    "p99_ms": round(_percentile(timings, 99), 2),
+                    "calls_per_request": round(sum(calls) / len(calls), 2),
+                    "requests_per_s": round(len(timings) / (sum(timings) / 1000), 1),
+                }
+                results.append(row)
+                print(
+                    f"{cart_size:>5}{supplier_count:>6}  {step:<24}"
+                    f"{row['p50_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                    f"{row['calls_per_request']:>7.1f}{row['requests_per_s']:>8.1f}"
+                )
+            pipelines_per_s = args.iterations / wall
+            results.append(
+                {
+                    "cart_size": cart_size,
+                    "suppliers": supplier_count,
+                    "step": "pipeline",
+                    "pipelines_per_s": round(pipelines_per_s, 2),
+                }
+            )
+            print(f"{'':>13}{'full pipeline':<24}{pipelines_per_s:>33.2f} /s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(
+                {"backend": args.backend, "latency_ms": args.latency_ms,
+                 "iterations": args.iterations, "results": results},
+                f,
+                indent=2,
+            )
+        print(f"results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,11 +9,138 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+    # service_role key, only for maintenance commands (flask reconcile-ledger)
+    # that call functions not granted to the anon key
+    SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+    # "supabase" (default) or "fake" to run against the in-memory backend
+    # in models/fake.py, optionally with simulated per-call latency
+    DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase")
+    FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "0"))
+    # Fault injection in the fake backend: share of calls that fail, and how
+    # ("timeout", "connect" or "http503")
+    FAKE_FAULT_RATE = float(os.getenv("FAKE_FAULT_RATE", "0"))
+    FAKE_FAULT_KIND = os.getenv("FAKE_FAULT_KIND", "timeout")
     
     # Redirect URL for auth (password reset, email confirmation, etc.)
     # Default to localhost:5000 for Flask dev server
     REDIRECT_URL = os.getenv("REDIRECT_URL", "http://localhost:5000")
 
+    # Rows per page on the admin list pages (keyset pagination)
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+
+    # Rows fetched per request when streaming CSV / XLSX exports
+    EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+    # Rows per bulk write when importing price lists from CSV
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "100"))
+
+    # Where cached catalogs and dashboards live (models/cache.py): "memory"
+    # (per worker), "sqlite" (a file shared by the workers on one host) or
+    # "redis" (shared by all hosts; needs the optional redis package). With
+    # several workers use a shared one so invalidations reach every worker.
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_SQLITE_PATH = os.getenv(
+        "CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "app-cache.sqlite3")
+    )
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "1"))
+
+    # Seconds the product / supplier catalogs stay cached, and how much longer
+    # an expired copy may still be served while Supabase is unavailable
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+    CATALOG_STALE_TTL = int(os.getenv("CATALOG_STALE_TTL", "3600"))
+
+    # Per-customer dashboard cache: entries kept and their lifetime (seconds),
+    # which bounds staleness with the memory backend in workers that did not
+    # see a write
+    DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "1024"))
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+
+    # Thread pool for running independent reads concurrently on detail pages
+    DB_FANOUT_WORKERS = int(os.getenv("DB_FANOUT_WORKERS", "16"))
+
+    # Shared HTTP pool to Supabase (models/http.py): timeouts in seconds,
+    # retries of failed connection attempts, and pool size / keep-alive.
+    # HTTP_MAX_CONNECTIONS should cover ASGI_THREADS + DB_FANOUT_WORKERS.
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+    # Per-call timeouts (seconds) by HTTP method: reads (GET / HEAD) and
+    # everything else; HTTP_CONNECT_TIMEOUT still bounds connecting
+    DB_READ_TIMEOUT = float(os.getenv("DB_READ_TIMEOUT", "5"))
+    DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "10"))
+
+    # Time budgets, nested so the inner one runs out first: a read and its
+    # retries stop within DB_READ_DEADLINE (a retry only starts if another
+    # DB_READ_TIMEOUT still fits), and a group of concurrent reads
+    # (models/concurrency.py) gets DB_FANOUT_TIMEOUT, by default that plus 2s
+    # of slack. Both give the user a 503 with Retry-After.
+    DB_READ_DEADLINE = float(os.getenv("DB_READ_DEADLINE", "8"))
+    DB_FANOUT_TIMEOUT = float(os.getenv("DB_FANOUT_TIMEOUT", str(DB_READ_DEADLINE + 2)))
+
+    # Resilience around Supabase calls (models/resilience.py): retries of
+    # reads with jittered backoff (base seconds), the retry budget (tokens
+    # earned per call, bucket size), and the circuit breaker (consecutive
+    # transient failures to open it, seconds before a probe call)
+    DB_READ_RETRIES = int(os.getenv("DB_READ_RETRIES", "2"))
+    DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.05"))
+    DB_RETRY_BUDGET_RATIO = float(os.getenv("DB_RETRY_BUDGET_RATIO", "0.2"))
+    DB_RETRY_BUDGET_MAX = float(os.getenv("DB_RETRY_BUDGET_MAX", "10"))
+    DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+    DB_BREAKER_RESET = float(os.getenv("DB_BREAKER_RESET", "30"))
+
+    # Per-request query instrumentation: send a Server-Timing header, and log
+    # requests that make at least SLOW_REQUEST_QUERIES data calls or take at
+    # least SLOW_REQUEST_MS (0 disables either threshold)
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "25"))
+
+    # /metrics: with several worker processes, set METRICS_DIR to a directory
+    # shared by them (emptied on deploy) so every scrape covers all workers,
+    # including `flask run-jobs` processes.
+    # Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>";
+    # without a token only logged-in admins can read /metrics.
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # Customer change feed (models/events.py): queued events per connection,
+    # seconds between keep-alive comments, and the Postgres LISTEN/NOTIFY
+    # relay. The relay is required as soon as more than one process serves
+    # or publishes: several ASGI workers (WEB_CONCURRENCY), or `flask
+    # run-jobs`, whose publishes otherwise reach no browser.
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+    EVENTS_DATABASE_URL = os.getenv("EVENTS_DATABASE_URL", "")
+    EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "customer_events")
+
+    # Background jobs (models/jobs.py): SQLite file shared by the processes on
+    # the host, worker threads started in each web process (0 when jobs run
+    # only in `flask run-jobs` processes), idle poll interval, lease of a
+    # claimed job, and retry backoff (doubling from BACKOFF up to MAX_BACKOFF).
+    # The queue must survive restarts: keep JOBS_DB_PATH on persistent storage
+    # (a mounted disk on Render, see render.yaml), never in the temp dir.
+    JOBS_DB_PATH = os.getenv(
+        "JOBS_DB_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "app-jobs.sqlite3"),
+    )
+    JOBS_WORKER_THREADS = int(os.getenv("JOBS_WORKER_THREADS", "1"))
+    JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "0.5"))
+    JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+    JOBS_BACKOFF_SECONDS = float(os.getenv("JOBS_BACKOFF_SECONDS", "2"))
+    JOBS_MAX_BACKOFF_SECONDS = float(os.getenv("JOBS_MAX_BACKOFF_SECONDS", "300"))
+
+    # Request threads per process when served through asgi.py
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", "32"))
+    # ASGI worker processes; uvicorn and gunicorn read the same variable
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
     # Basic Flask session security
     SESSION_COOKIE_SECURE = False  # set True behind HTTPS / in production
     SESSION_COOKIE_HTTPONLY = True
@@ -0,0 +1,387 @@
+"""
+Cache cho dữ liệu được nhiều request đọc nhưng ít khi ghi.
+
+Nơi gọi dùng `TTLCache` (get / set / get_or_load / invalidate / stats); phần
+tử được lưu ở một store thay thế được, chọn theo CACHE_BACKEND:
+
+    memory  MemoryStore  LRU trong process; mỗi worker một bản riêng
+    sqlite  SQLiteStore  một file SQLite dùng chung cho các worker trên một máy
+    redis   RedisStore   server Redis, qua gói `redis` (tùy chọn)
+
+Với store dùng chung, mọi worker đọc cùng một phần tử, nên invalidate() từ
+worker xử lý thao tác ghi có hiệu lực ở các worker khác ngay lần đọc tiếp
+theo thay vì phải chờ hết TTL. Store dùng chung lưu giá trị dạng JSON (không
+pickle: ai ghi được vào store thì không chạy được mã trong worker), nên giá trị
+chỉ gồm dict / list / str / số / bool / None, tuple đọc lại thành list. Khoá
+là str(key). Store bị lỗi được coi như cache miss.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from config import Config
+
+try:
+    import redis
+    from redis.backoff import NoBackoff
+    from redis.retry import Retry
+except ImportError:  # CACHE_BACKEND=redis is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class _Entry(NamedTuple):
+    fresh_until: float  # time.time(), so sánh được giữa các process
+    value: Any
+
+
+def _dumps(entry: _Entry) -> bytes:
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _loads(data: bytes) -> _Entry:
+    return _Entry(*json.loads(data))
+
+
+class MemoryStore:
+    """LRU trong process, mỗi phần tử có hạn riêng."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+class SQLiteStore:
+    """
+    Các phần tử của một namespace trong file SQLite dùng chung cho các worker
+    trên máy. Mỗi thread mở kết nối riêng (chế độ WAL, người đọc không chặn
+    người ghi). Cứ PRUNE_EVERY lần ghi thì xoá các phần tử đã hết hạn và, khi
+    vượt maxsize, các phần tử sắp hết hạn nhất.
+    """
+
+    name = "sqlite"
+    PRUNE_EVERY = 32
+
+    def __init__(self, path: str, namespace: str, maxsize: int):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # Kết nối không được dùng lại sau fork, nên gắn thêm theo pid
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("pragma journal_mode = wal")
+            conn.execute("pragma synchronous = normal")
+            conn.execute(
+                "create table if not exists cache_entries ("
+                " namespace text not null, key text not null,"
+                " value blob not null, expires_at real not null,"
+                " primary key (namespace, key)) without rowid"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "select value from cache_entries"
+            " where namespace = ? and key = ? and expires_at > ?",
+            (self.namespace, str(key), time.time()),
+        ).fetchone()
+        return _loads(row[0]) if row else MISSING
+
+    def set(self, key, value, ttl: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "insert or replace into cache_entries values (?, ?, ?, ?)",
+            (
+                self.namespace,
+                str(key),
+                _dumps(value),
+                time.time() + ttl,
+            ),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "delete from cache_entries where namespace = ? and expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        conn.execute(
+            "delete from cache_entries where namespace = ? and key in ("
+            " select key from cache_entries where namespace = ?"
+            " order by expires_at limit max("
+            "  (select count(*) from cache_entries where namespace = ?) - ?, 0))",
+            (self.namespace, self.namespace, self.namespace, self.maxsize),
+        )
+
+    def delete(self, key) -> None:
+        self._conn().execute(
+            "delete from cache_entries where namespace = ? and key = ?",
+            (self.namespace, str(key)),
+        )
+
+    def clear(self) -> None:
+        self._conn().execute(
+            "delete from cache_entries where namespace = ?", (self.namespace,)
+        )
+
+    def size(self) -> Optional[int]:
+        return self._conn().execute(
+            "select count(*) from cache_entries where namespace = ? and expires_at > ?",
+            (self.namespace, time.time()),
+        ).fetchone()[0]
+
+
+class RedisStore:
+    """
+    Các phần tử của một namespace là các khoá "<namespace>:<key>" trên
+    server Redis, hết hạn qua SET ... PX. Kích thước do chính sách maxmemory
+    của server giới hạn. Client của redis-py giữ pool kết nối dùng chung cho
+    các thread (tự mở lại sau fork) và thử lại một lần khi mất kết nối.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, namespace: str, timeout: float = 1.0):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        self.url = url
+        self.namespace = namespace
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            retry=Retry(NoBackoff(), 1),
+        )
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        data = self.client.get(self._key(key))
+        return MISSING if data is None else _loads(data)
+
+    def set(self, key, value, ttl: float) -> None:
+        self.client.set(self._key(key), _dumps(value), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key) -> None:
+        self.client.delete(self._key(key))
+
+    def clear(self) -> None:
+        # Gom khoá trước: vừa quét vừa xoá có thể bỏ sót khoá
+        keys = list(self.client.scan_iter(match=f"{self.namespace}:*", count=500))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+    def size(self) -> Optional[int]:
+        return None  # cần SCAN toàn bộ namespace
+
+
+class TTLCache:
+    """
+    Cache giới hạn số phần tử, hết hạn theo TTL và có thể xoá chủ động, lưu
+    trên một trong các store ở trên (mặc định bộ nhớ của từng worker). Đếm
+    hit/miss theo từng worker để theo dõi tỉ lệ trúng cache.
+
+    Với stale_ttl, phần tử được giữ thêm chừng ấy giây sau khi hết hạn, chỉ
+    để get_or_load trả về khi tải lại thất bại (chế độ suy giảm).
+    """
+
+    def __init__(self, maxsize=128, ttl=300, store=None, stale_ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.store = store if store is not None else MemoryStore(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _read(self, key):
+        try:
+            entry = self.store.get(key)
+        except Exception:
+            logger.warning("%s cache read failed", self.store.name, exc_info=True)
+            return None
+        return entry if isinstance(entry, _Entry) else None
+
+    def get(self, key, default=None):
+        entry = self._read(key)
+        fresh = entry is not None and entry.fresh_until > time.time()
+        self._count(fresh)
+        return entry.value if fresh else default
+
+    def set(self, key, value):
+        try:
+            self.store.set(
+                key, _Entry(time.time() + self.ttl, value), self.ttl + self.stale_ttl
+            )
+        except Exception:
+            logger.warning("%s cache write failed", self.store.name, exc_info=True)
+
+    def get_or_load(self, key, loader, stale_on=(), on_stale=None):
+        """
+        Trả về giá trị trong cache, hoặc gọi loader() và lưu kết quả. Nếu
+        loader() ném một exception thuộc `stale_on` mà phần tử hết hạn vẫn còn
+        được giữ (xem stale_ttl) thì trả về phần tử đó và gọi on_stale().
+        """
+        entry = self._read(key)
+        if entry is not None and entry.fresh_until > time.time():
+            self._count(True)
+            return entry.value
+        self._count(False)
+        try:
+            value = loader()
+        except stale_on:
+            if entry is None:
+                raise
+            with self._lock:
+                self.stale_served += 1
+            logger.warning(
+                "serving %s cache entry %r %.0fs past its TTL",
+                self.store.name, key, time.time() - entry.fresh_until,
+            )
+            if on_stale is not None:
+                on_stale()
+            return entry.value
+        self.set(key, value)
+        return value
+
+    def get_many_or_load(self, keys, loader, stale_on=(), on_stale=None):
+        """
+        Như get_or_load cho nhiều key: loader(missing) được gọi một lần với
+        các key chưa có hoặc đã hết hạn và trả về {key: giá trị}. Khi loader
+        lỗi, bản hết hạn chỉ được dùng nếu còn giữ đủ mọi key thiếu.
+        """
+        now = time.time()
+        entries = {key: self._read(key) for key in keys}
+        values = {
+            key: entry.value
+            for key, entry in entries.items()
+            if entry is not None and entry.fresh_until > now
+        }
+        missing = [key for key in entries if key not in values]
+        with self._lock:
+            self.hits += len(values)
+            self.misses += len(missing)
+        if not missing:
+            return values
+        try:
+            loaded = loader(missing)
+        except stale_on:
+            if any(entries[key] is None for key in missing):
+                raise
+            with self._lock:
+                self.stale_served += 1
+            logger.warning(
+                "serving %d %s cache entries past their TTL", len(missing), self.store.name
+            )
+            if on_stale is not None:
+                on_stale()
+            values.update((key, entries[key].value) for key in missing)
+            return values
+        for key in missing:
+            self.set(key, loaded[key])
+            values[key] = loaded[key]
+        return values
+
+    def invalidate(self, key=None):
+        """
+        Xoá một key, hoặc toàn bộ cache nếu không truyền key. Thao tác ghi
+        trước đó đã xong, nên store lỗi chỉ được ghi log chứ không ném lỗi;
+        khi đó TTL giới hạn độ cũ của phần tử.
+        """
+        try:
+            if key is None:
+                self.store.clear()
+            else:
+                self.store.delete(key)
+        except Exception:
+            logger.error("%s cache invalidation failed", self.store.name, exc_info=True)
+
+    def stats(self):
+        try:
+            size = self.store.size()
+        except Exception:
+            size = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.store.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_served": self.stale_served,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+def make_cache(namespace: str, maxsize: int, ttl: int, stale_ttl: int = 0) -> TTLCache:
+    """TTLCache cho `namespace` trên store được chọn bởi CACHE_BACKEND."""
+    backend = Config.CACHE_BACKEND
+    if backend == "memory":
+        store = MemoryStore(maxsize)
+    elif backend == "sqlite":
+        store = SQLiteStore(Config.CACHE_SQLITE_PATH, namespace, maxsize)
+    elif backend == "redis":
+        store = RedisStore(Config.CACHE_REDIS_URL, namespace, Config.CACHE_REDIS_TIMEOUT)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend!r}")
+    return TTLCache(maxsize=maxsize, ttl=ttl, store=store, stale_ttl=stale_ttl)
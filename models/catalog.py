@@ -0,0 +1,89 @@
+from config import Config
+from models import instrumentation, repository
+from models.cache import make_cache
+from models.resilience import ServiceUnavailable
+
+# Danh mục sản phẩm / nhà cung cấp và giá nhà cung cấp của từng sản phẩm chỉ
+# đổi khi admin ghi dữ liệu, nên được cache (xem CACHE_BACKEND) và xoá khi có
+# thay đổi.
+# Khi Supabase không phản hồi, bản đã hết hạn vẫn được dùng thêm tối đa
+# CATALOG_STALE_TTL giây (chế độ suy giảm).
+catalog_cache = make_cache(
+    "catalog",
+    # Hai danh mục cộng giá của từng sản phẩm
+    maxsize=4096,
+    ttl=Config.CATALOG_CACHE_TTL,
+    stale_ttl=Config.CATALOG_STALE_TTL,
+)
+
+
+def _cached(key, loader):
+    return catalog_cache.get_or_load(
+        key,
+        loader,
+        stale_on=(ServiceUnavailable,),
+        on_stale=lambda: instrumentation.mark_degraded("catalog"),
+    )
+
+
+def list_products():
+    return _cached("products", repository.list_product_catalog)
+
+
+def list_suppliers():
+    return _cached("suppliers", repository.list_supplier_catalog)
+
+
+def _offers_key(product_id):
+    return f"offers:{product_id}"
+
+
+def _load_offers(keys):
+    """{key: giá đang áp dụng của sản phẩm} cho các key thiếu, một lần đọc."""
+    product_ids = {key.split(":", 1)[1] for key in keys}
+    offers = {product_id: [] for product_id in product_ids}
+    for offer in repository.list_active_offers(product_ids):
+        # Dòng thiếu giá vốn hoặc giá bán chưa báo giá được, bỏ qua
+        if offer.get("cost_price") is None or offer.get("sell_price") is None:
+            continue
+        offer["margin"] = offer["sell_price"] - offer["cost_price"]
+        offers[offer["product_id"]].append(offer)
+    for product_offers in offers.values():
+        product_offers.sort(key=lambda o: (o["cost_price"], -o["margin"]))
+    return {_offers_key(product_id): offers[product_id] for product_id in product_ids}
+
+
+def offers_for(product_ids):
+    """
+    {product_id: các giá đang áp dụng, rẻ nhất trước (bằng giá: lãi cao hơn
+    trước)} cho các sản phẩm được hỏi. Giá được cache theo từng sản phẩm, nên
+    lần trượt cache chỉ đọc giá của các sản phẩm còn thiếu, trong một query.
+    Có thể dùng chung giữa các request nên không được sửa các list.
+    """
+    keys = {_offers_key(product_id): product_id for product_id in product_ids}
+    values = catalog_cache.get_many_or_load(
+        list(keys),
+        _load_offers,
+        stale_on=(ServiceUnavailable,),
+        on_stale=lambda: instrumentation.mark_degraded("catalog"),
+    )
+    return {keys[key]: offers for key, offers in values.items()}
+
+
+def best_offer(offers, strategy="cheapest"):
+    """Giá rẻ nhất, hoặc giá có lãi cao nhất khi strategy='margin'."""
+    if not offers:
+        return None
+    if strategy == "margin":
+        return max(offers, key=lambda o: (o["margin"], -o["cost_price"]))
+    return offers[0]
+
+
+def invalidate_catalog(name=None):
+    """Gọi sau khi ghi vào products / suppliers / product_suppliers."""
+    catalog_cache.invalidate(name)
+
+
+def invalidate_offers(product_id):
+    """Gọi sau khi ghi giá của một sản phẩm (product_suppliers)."""
+    catalog_cache.invalidate(_offers_key(product_id))
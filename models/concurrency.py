@@ -0,0 +1,59 @@
+"""
+Run independent data-layer calls concurrently.
+
+Detail pages need two or three unrelated reads; running them on a shared
+thread pool makes page latency roughly the slowest round trip instead of the
+sum of all of them. Calls run inside a copy of the caller's contextvars, so
+Flask's `g` / `request` stay reachable from the worker threads.
+"""
+import contextvars
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from config import Config
+from models.resilience import ServiceUnavailable
+
+_THREAD_PREFIX = "db-fanout"
+_executor = ThreadPoolExecutor(
+    max_workers=Config.DB_FANOUT_WORKERS, thread_name_prefix=_THREAD_PREFIX
+)
+
+
+def configure(max_workers: int) -> None:
+    """Replace the shared pool (used by benchmarks to compare pool sizes)."""
+    global _executor
+    old = _executor
+    _executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix=_THREAD_PREFIX
+    )
+    old.shutdown(wait=False)
+
+
+def gather(*calls, timeout: float = None) -> list:
+    """
+    Call each zero-argument callable concurrently and return their results in
+    order. All calls share one deadline (`timeout` seconds, default
+    Config.DB_FANOUT_TIMEOUT); if it passes, ServiceUnavailable is raised (a
+    503 with Retry-After, like any other unanswered data call). As soon
+    as one call fails its exception is re-raised here and calls that have not
+    started yet are cancelled. Nested calls from a pool thread run inline so a
+    saturated pool cannot deadlock on itself.
+    """
+    if threading.current_thread().name.startswith(_THREAD_PREFIX):
+        return [call() for call in calls]
+
+    timeout = Config.DB_FANOUT_TIMEOUT if timeout is None else timeout
+    futures = [
+        _executor.submit(contextvars.copy_context().run, call) for call in calls
+    ]
+    try:
+        done, pending = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        if pending:
+            raise ServiceUnavailable(retry_after=timeout)
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,49 @@
+"""
+Per-customer cache of the customer dashboard data.
+
+The dashboard's requests and orders are cached per customer together with an
+ETag over their content, so a refresh costs no data calls and an unchanged
+page can be answered with 304 Not Modified. Write paths that change what a
+customer sees call `invalidate_dashboard(customer_id)`. With a shared
+CACHE_BACKEND that reaches every worker; with the per-worker memory backend
+the TTL bounds how long the other workers can lag.
+"""
+import hashlib
+import json
+from typing import List, NamedTuple, Optional
+
+from config import Config
+from models import repository
+from models.cache import make_cache
+from models.concurrency import gather
+
+dashboard_cache = make_cache(
+    "dashboard", maxsize=Config.DASHBOARD_CACHE_SIZE, ttl=Config.DASHBOARD_CACHE_TTL
+)
+
+
+class Dashboard(NamedTuple):
+    requests: List[dict]
+    orders: List[dict]
+    etag: str
+
+
+def _load(customer_id: str) -> Dashboard:
+    requests, orders = gather(
+        lambda: repository.list_customer_requests(customer_id),
+        lambda: repository.list_customer_orders(customer_id),
+    )
+    digest = hashlib.sha1(
+        json.dumps([requests, orders], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return Dashboard(requests, orders, digest)
+
+
+def get_dashboard(customer_id: str) -> Dashboard:
+    # Shared stores keep JSON, so the tuple comes back as a list
+    return Dashboard(*dashboard_cache.get_or_load(customer_id, lambda: _load(customer_id)))
+
+
+def invalidate_dashboard(customer_id: Optional[str]) -> None:
+    if customer_id:
+        dashboard_cache.invalidate(customer_id)
@@ -1,20 +1,88 @@
+from functools import lru_cache
+
 from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+
 from config import Config
+from models.http import http_client
+from models.resilience import ResilientClient
+
+# Every call goes through the circuit breaker / read retries in
+# models/resilience.py, for the fake backend as well
+if Config.DATA_BACKEND == "fake":
+    from models.fake import Faults, FakeClient, seed_demo
+
+    fake = FakeClient(latency=Config.FAKE_LATENCY_MS / 1000)
+    seed_demo(fake)
+    fake.faults = Faults(Config.FAKE_FAULT_RATE, Config.FAKE_FAULT_KIND)
+    supabase = ResilientClient(fake)
+else:
+    supabase = ResilientClient(
+        create_client(
+            Config.SUPABASE_URL,
+            Config.SUPABASE_KEY,
+            options=SyncClientOptions(httpx_client=http_client),
+        )
+    )
+
+
+def user_client():
+    """
+    Short-lived client for one user's auth session (set_session, update_user,
+    code exchange), so that state never lands on the shared `supabase` client.
+    It uses the shared connection pool and starts no token refresh timer.
+    """
+    if Config.DATA_BACKEND == "fake":
+        return supabase
+    return ResilientClient(
+        create_client(
+            Config.SUPABASE_URL,
+            Config.SUPABASE_KEY,
+            options=SyncClientOptions(
+                httpx_client=http_client,
+                persist_session=False,
+                auto_refresh_token=False,
+            ),
+        )
+    )
 
-supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+
+@lru_cache(maxsize=None)
+def service_client():
+    """
+    Client with the service_role key: it bypasses row level security and may
+    call revoked functions. Only for server-side reads of tables closed to the
+    anon key (customer_balances) and for maintenance commands; never hand its
+    results to a user without an authorization check. Built once per process.
+    """
+    if Config.DATA_BACKEND == "fake":
+        return supabase
+    if not Config.SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_SERVICE_KEY is not set")
+    return ResilientClient(
+        create_client(
+            Config.SUPABASE_URL,
+            Config.SUPABASE_SERVICE_KEY,
+            options=SyncClientOptions(
+                httpx_client=http_client,
+                persist_session=False,
+                auto_refresh_token=False,
+            ),
+        )
+    )
 
 
-def get_user_role(user_id: str) -> str:
+def resolve_user(user_id: str):
     """
-    Determine user role based on presence in customers table.
-    If a row exists in `customers` for this user_id → 'customer', else 'admin'.
+    Determine role and customer id with a single lookup in `customers`.
+    If a row exists for this user_id → ('customer', customers.id), else ('admin', None).
     """
     result = (
         supabase.table("customers")
-        .select("user_id")
+        .select("id")
         .eq("user_id", user_id)
         .execute()
     )
-    return "customer" if result.data else "admin"
-
-
+    if result.data:
+        return "customer", result.data[0]["id"]
+    return "admin", None
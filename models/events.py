@@ -0,0 +1,193 @@
+"""
+Per-customer change feed, pushed to the browser as server-sent events.
+
+Admin write paths call `publish(customer_id, event, data)` after the write.
+The bus hands each message to the SSE connections of that customer that this
+process serves (see asgi.py). A connection is an asyncio queue awaited by a
+coroutine on the event loop, not a thread, so idle connections cost only
+memory; publishing from a request thread goes through
+loop.call_soon_threadsafe.
+
+The feed only exists under the ASGI entry point (asgi.py); `gunicorn app:app`
+answers /customer/events with 204 and pages update on reload.
+
+With a single ASGI worker that also runs the jobs (JOBS_WORKER_THREADS) the
+in-process bus is enough. Anything more needs EVENTS_DATABASE_URL (a direct
+Postgres connection string; needs the `psycopg` package): publish() then sends
+NOTIFY on EVENTS_CHANNEL and each process LISTENs and delivers to its own
+connections, so a customer connected to one worker sees writes handled by
+another worker or by `flask run-jobs`. Without it, publish() in a process
+with no open streams (run-jobs, or another worker) reaches nobody; such
+processes call warn_if_local_only() at startup.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from config import Config
+
+try:
+    import psycopg
+except ImportError:  # LISTEN/NOTIFY backing is optional
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"event": "resync", "data": {}}
+
+
+class Subscription:
+    """One SSE connection: a bounded queue drained on its event loop."""
+
+    def __init__(self, customer_id: str, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.customer_id = customer_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def put(self, message: dict) -> None:
+        """Runs on the subscription's loop."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind just reloads the page
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class EventBus:
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, customer_id: str) -> Subscription:
+        """Call from a coroutine on the loop that will drain the queue."""
+        sub = Subscription(customer_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(customer_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.customer_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.customer_id]
+
+    def deliver(self, customer_id: str, message: dict) -> None:
+        """Hand a message to this process's connections for customer_id."""
+        with self._lock:
+            subs = list(self._subscribers.get(customer_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.put, message)
+            except RuntimeError:  # loop already closed
+                self.unsubscribe(sub)
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+bus = EventBus(Config.EVENTS_QUEUE_SIZE)
+
+
+class _PostgresRelay:
+    """NOTIFY on publish; one LISTEN thread per process feeding the bus."""
+
+    def __init__(self, url: str, channel: str):
+        self.url = url
+        self.channel = channel
+        self._conn = None
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    def notify(self, payload: str) -> None:
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._conn is None or self._conn.closed:
+                        self._conn = psycopg.connect(self.url, autocommit=True)
+                    self._conn.execute("select pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except psycopg.OperationalError:
+                    self._conn = None
+                    if attempt == 2:
+                        raise
+
+    def ensure_listening(self) -> None:
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                with psycopg.connect(self.url, autocommit=True) as conn:
+                    conn.execute(f'listen "{self.channel}"')
+                    for notify in conn.notifies():
+                        message = json.loads(notify.payload)
+                        bus.deliver(message.pop("customer_id"), message)
+            except Exception:
+                logger.exception("events listener lost its connection, retrying")
+                time.sleep(5)
+
+
+_relay: Optional[_PostgresRelay] = None
+if Config.EVENTS_DATABASE_URL:
+    if psycopg is None:
+        logger.warning("EVENTS_DATABASE_URL is set but psycopg is not installed")
+    else:
+        _relay = _PostgresRelay(Config.EVENTS_DATABASE_URL, Config.EVENTS_CHANNEL)
+
+
+def warn_if_local_only(reason: str) -> None:
+    """Called at startup by processes whose events must reach other processes."""
+    if _relay is None:
+        logger.warning(
+            "%s but EVENTS_DATABASE_URL is not set: customer events only reach "
+            "streams served by the publishing process",
+            reason,
+        )
+
+
+def subscribe(customer_id: str) -> Subscription:
+    if _relay is not None:
+        _relay.ensure_listening()
+    return bus.subscribe(customer_id)
+
+
+def unsubscribe(sub: Subscription) -> None:
+    bus.unsubscribe(sub)
+
+
+def publish(customer_id: Optional[str], event: str, data: dict) -> None:
+    """
+    Push an event to the customer's open pages. Never raises: the write it
+    reports has already happened, and pages still show it on reload.
+    """
+    if not customer_id:
+        return
+    message = {"event": event, "data": data}
+    try:
+        if _relay is not None:
+            _relay.notify(
+                json.dumps({"customer_id": customer_id, **message}, default=str)
+            )
+            return
+    except Exception:
+        logger.exception("NOTIFY failed, delivering to this process only")
+    bus.deliver(customer_id, message)
+
+
+def format_sse(message: dict) -> bytes:
+    data = json.dumps(message["data"], default=str, ensure_ascii=False)
+    return f"event: {message['event']}\ndata: {data}\n\n".encode()
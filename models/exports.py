@@ -0,0 +1,147 @@
+"""
+Streaming CSV / XLSX exports for the admin pages.
+
+Rows come from the repository's keyset iterators and are written out in
+small batches, so an export holds one page of rows in memory however large
+the date range. XLSX needs the optional `openpyxl` package; its write-only
+workbook spills rows to temporary files and the finished file is streamed
+back in chunks.
+"""
+import csv
+import io
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from models import repository
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional
+    openpyxl = None
+
+XLSX_AVAILABLE = openpyxl is not None
+
+Column = Tuple[str, Callable[[dict], object]]
+
+
+class Dataset(NamedTuple):
+    rows: Callable[..., Iterator[dict]]
+    columns: List[Column]
+    has_status: bool
+
+
+def _embed(row, *path):
+    for name in path:
+        row = row.get(name) if isinstance(row, dict) else None
+    return row
+
+
+DATASETS: Dict[str, Dataset] = {
+    "orders": Dataset(
+        repository.iter_orders_export,
+        [
+            ("Mã đơn", lambda r: r["id"]),
+            ("Ngày tạo", lambda r: r["created_at"]),
+            ("Ngày hoàn thành", lambda r: r.get("completed_at")),
+            ("Trạng thái", lambda r: r.get("status")),
+            ("Khách hàng", lambda r: _embed(r, "customers", "name")),
+            ("Nhà cung cấp", lambda r: _embed(r, "suppliers", "name")),
+            ("Giá vốn", lambda r: r.get("total_cost")),
+            ("Tổng tiền", lambda r: r.get("total_sell")),
+            ("Lợi nhuận", lambda r: r.get("profit")),
+            ("Đã thanh toán", lambda r: r.get("paid_amount") or 0),
+            ("Còn nợ", lambda r: (r.get("total_sell") or 0) - (r.get("paid_amount") or 0)),
+            ("Mã vận chuyển", lambda r: r.get("tracking_code")),
+        ],
+        has_status=True,
+    ),
+    "order_items": Dataset(
+        repository.iter_order_items_export,
+        [
+            ("Mã đơn", lambda r: r["order_id"]),
+            ("Ngày tạo", lambda r: r["created_at"]),
+            ("Khách hàng", lambda r: _embed(r, "orders", "customers", "name")),
+            ("Nhà cung cấp", lambda r: _embed(r, "product_suppliers", "suppliers", "name")),
+            ("Sản phẩm", lambda r: _embed(r, "product_suppliers", "products", "name")),
+            ("Số lượng", lambda r: r.get("quantity")),
+            ("Giá vốn", lambda r: r.get("cost_price")),
+            ("Giá bán", lambda r: r.get("sell_price")),
+            ("Thành tiền", lambda r: r.get("subtotal")),
+        ],
+        has_status=False,
+    ),
+    "payments": Dataset(
+        repository.iter_payments_export,
+        [
+            ("Mã thanh toán", lambda r: r["id"]),
+            ("Ngày thanh toán", lambda r: r["paid_at"]),
+            ("Mã đơn", lambda r: r.get("order_id")),
+            ("Khách hàng", lambda r: _embed(r, "orders", "customers", "name")),
+            ("Số tiền", lambda r: r.get("amount")),
+            ("Phương thức", lambda r: r.get("payment_method")),
+            ("Ghi chú", lambda r: r.get("note")),
+        ],
+        has_status=False,
+    ),
+    "quotes": Dataset(
+        repository.iter_quotes_export,
+        [
+            ("Mã báo giá", lambda r: r["id"]),
+            ("Ngày tạo", lambda r: r["created_at"]),
+            ("Mã yêu cầu", lambda r: r.get("request_id")),
+            ("Khách hàng", lambda r: _embed(r, "requests", "customers", "name")),
+            ("Trạng thái", lambda r: r.get("status")),
+            ("Tổng tiền", lambda r: r.get("total_amount")),
+        ],
+        has_status=True,
+    ),
+}
+
+
+# Spreadsheet apps treat text starting with these as a formula (OWASP "CSV
+# injection"); such cells get a leading apostrophe so they stay plain text
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _values(columns: List[Column], row: dict) -> list:
+    return [_cell(value(row)) for _, value in columns]
+
+
+def csv_chunks(
+    columns: List[Column], rows: Iterable[dict], batch_rows: int = 500
+) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM so Excel opens the UTF-8 file correctly
+    writer.writerow([header for header, _ in columns])
+    for i, row in enumerate(rows, 1):
+        writer.writerow(_values(columns, row))
+        if i % batch_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def xlsx_chunks(
+    columns: List[Column], rows: Iterable[dict], chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([header for header, _ in columns])
+    for row in rows:
+        sheet.append(_values(columns, row))
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
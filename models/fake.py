@@ -0,0 +1,700 @@
+"""
+In-memory stand-in for the supabase client, used when DATA_BACKEND=fake.
+
+It implements the subset of the supabase-py / postgrest query builder API the
+app relies on (select with embeds, insert/update/delete, eq/in_/or_/... filters,
+order, limit, single, count/head, rpc) so the whole app can run and be
+benchmarked offline. An optional per-call latency simulates network round trips,
+and `Faults` injects failures to exercise models/resilience.py.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthApiError
+
+from models import instrumentation
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Column defaults the real schema fills in on insert (callables are evaluated)
+# Only the tables that really have a created_at column get one, so the fake does
+# not hide queries on a timestamp the schema lacks
+DEFAULTS = {
+    "product_suppliers": {"is_active": True},
+    "customer_payments": {"paid_at": _now},
+    "orders": {"paid_amount": 0, "created_at": _now},
+    "suppliers": {"created_at": _now},
+    "requests": {"created_at": _now},
+    "quotes": {"created_at": _now},
+}
+
+
+def _instrumented(table, op, run):
+    """Run one fake call, reporting it like the HTTP transport would."""
+    stats = instrumentation.current()
+    if stats is None:
+        return run()
+    start = time.perf_counter()
+    rows = nbytes = None
+    error = True
+    try:
+        response = run()
+        data = response.data
+        rows = len(data) if isinstance(data, list) else int(data is not None)
+        nbytes = len(json.dumps(data, default=str))
+        error = False
+        return response
+    finally:
+        stats.add(
+            instrumentation.Call(
+                table, op, (time.perf_counter() - start) * 1000, rows, nbytes, error
+            )
+        )
+
+
+class Faults:
+    """
+    Injected failures: every call fails with probability `rate`, and the next
+    `fail_next(n)` calls fail regardless. Kinds mimic what the real client
+    raises: "timeout" (httpx.ReadTimeout), "connect" (httpx.ConnectError) and
+    "http503" (postgrest APIError with code 503).
+    """
+
+    KINDS = ("timeout", "connect", "http503")
+
+    def __init__(self, rate=0.0, kind="timeout"):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown fault kind: {kind!r}")
+        self.rate = rate
+        self.kind = kind
+        self.pending = 0
+        self.injected = 0
+        self._lock = threading.Lock()
+
+    def fail_next(self, n=1, kind=None):
+        with self._lock:
+            self.pending += n
+            if kind:
+                self.kind = kind
+
+    def clear(self):
+        with self._lock:
+            self.pending = 0
+            self.rate = 0.0
+
+    def check(self):
+        with self._lock:
+            if self.pending:
+                self.pending -= 1
+            elif not (self.rate and random.random() < self.rate):
+                return
+            self.injected += 1
+        if self.kind == "timeout":
+            raise httpx.ReadTimeout("injected fault")
+        if self.kind == "connect":
+            raise httpx.ConnectError("injected fault")
+        raise APIError({"message": "Service Unavailable (injected fault)", "code": 503})
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _singular(table):
+    return table[:-1] if table.endswith("s") else table
+
+
+def _split_top_level(spec, sep=","):
+    """
+    Split on `sep`, ignoring separators inside parentheses or double quotes
+    (where a backslash escapes the next character).
+    """
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for ch in spec:
+        if escaped:
+            escaped = False
+        elif quoted and ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _parse_select(spec):
+    """'*, customers(name), x' -> (["*", "x"], {"customers": "name"})"""
+    columns, embeds = [], {}
+    for token in _split_top_level(spec or "*"):
+        if "(" in token:
+            name, inner = token.split("(", 1)
+            embeds[name.strip()] = inner[:-1]
+        else:
+            columns.append(token)
+    return columns, embeds
+
+
+def _comparable(a, b):
+    """Coerce two values so they compare like Postgres would (numbers vs text)."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower(), str(b).lower()
+    if isinstance(a, (int, float)) or isinstance(b, (int, float)):
+        try:
+            return float(a), float(b)
+        except (TypeError, ValueError):
+            pass
+    return str(a), str(b)
+
+
+def _match(value, op, arg):
+    if op == "is":
+        return value is None if arg in (None, "null") else _match(value, "eq", arg)
+    if op == "in":
+        return any(_match(value, "eq", a) for a in arg)
+    if value is None:
+        return False
+    left, right = _comparable(value, arg)
+    return {
+        "eq": left == right,
+        "neq": left != right,
+        "gt": left > right,
+        "gte": left >= right,
+        "lt": left < right,
+        "lte": left <= right,
+    }[op]
+
+
+def _parse_logic(expr):
+    """
+    Parse a PostgREST logic tree into row predicates,
+    e.g. 'created_at.lt."t",and(created_at.eq."t",id.lt.x)'.
+    """
+    predicates = []
+    for term in _split_top_level(expr):
+        if term.startswith(("and(", "or(")):
+            kind, inner = term.split("(", 1)
+            children = _parse_logic(inner[:-1])
+            combine = all if kind == "and" else any
+            predicates.append(
+                lambda row, c=children, f=combine: f(p(row) for p in c)
+            )
+        else:
+            predicates.append(_predicate(*term.split(".", 2)))
+    return predicates
+
+
+def _predicate(column, op, value):
+    """Row predicate for one 'column.op.value' term (value as PostgREST sends it)."""
+    if value.startswith('"') and value.endswith('"'):
+        value = re.sub(r"\\(.)", r"\1", value[1:-1])
+    if op == "in":
+        value = [v.strip('"') for v in _split_top_level(value[1:-1])]
+    return lambda row: _match(row.get(column), op, value)
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.offset_count = 0
+        self.is_single = False
+        self.maybe_single_flag = False
+        self.count_method = None
+        self.head = False
+        self.on_conflict = "id"
+
+    # ----- operations -----
+    def select(self, *columns, count=None, head=None):
+        self.columns = ",".join(columns) or "*"
+        self.count_method = count
+        self.head = bool(head)
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.op = "insert"
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.op = "upsert"
+        self.payload = rows
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, values, **kwargs):
+        self.op = "update"
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    # ----- filters -----
+    def _filter(self, column, op, value):
+        self.filters.append(lambda row: _match(row.get(column), op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def or_(self, filters, reference_table=None):
+        predicates = _parse_logic(filters)
+        self.filters.append(lambda row: any(p(row) for p in predicates))
+        return self
+
+    def filter(self, column, operator, criteria):
+        """
+        A filter in PostgREST's own syntax, as a query string carries it:
+        ("status", "eq", "paid"), ("id", "in", '(a,"b,c")'), ("x", "not.is",
+        "null"), or (None, "or", "(a.eq.1,b.eq.2)") for logic trees.
+        """
+        if operator in ("or", "and"):
+            predicates = _parse_logic(criteria[1:-1])
+            combine = any if operator == "or" else all
+            self.filters.append(lambda row: combine(p(row) for p in predicates))
+            return self
+        negate = operator.startswith("not.")
+        if negate:
+            operator = operator[4:]
+        predicate = _predicate(column, operator, criteria)
+        if negate:
+            self.filters.append(lambda row: not predicate(row))
+        else:
+            self.filters.append(predicate)
+        return self
+
+    # ----- modifiers -----
+    def order(self, column, desc=False, nullsfirst=None, foreign_table=None):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, foreign_table=None):
+        self.limit_count = size
+        return self
+
+    def offset(self, size):
+        self.offset_count = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self.offset_count = start
+        self.limit_count = end - start + 1
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def maybe_single(self):
+        self.maybe_single_flag = True
+        return self
+
+    def execute(self):
+        op = "count" if self.head else self.op
+        return _instrumented(self.table_name, op, lambda: self.client._execute(self))
+
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return _instrumented(self.name, "rpc", lambda: self.client._execute_rpc(self))
+
+
+class FakeAuth:
+    """Minimal email + password auth kept in memory."""
+
+    def __init__(self, client):
+        self.client = client
+        self.users = {}
+
+    def sign_up(self, credentials):
+        self.client.faults.check()
+        email = credentials["email"]
+        if email in self.users:
+            raise Exception("User already registered")
+        user = SimpleNamespace(id=str(uuid.uuid4()), email=email, user_metadata={})
+        self.users[email] = (credentials["password"], user)
+        return SimpleNamespace(user=user, session=None)
+
+    def sign_in_with_password(self, credentials):
+        self.client.faults.check()
+        password, user = self.users.get(credentials["email"], (None, None))
+        if user is None or password != credentials["password"]:
+            raise AuthApiError("Invalid login credentials", 400, "invalid_credentials")
+        return SimpleNamespace(user=user, session=None)
+
+    def reset_password_email(self, email, options=None):
+        return None
+
+    def __getattr__(self, name):
+        raise NotImplementedError(f"auth.{name} is not supported by the fake backend")
+
+
+class FakeClient:
+    def __init__(self, latency=0.0, faults=None):
+        self.latency = latency
+        self.faults = faults or Faults()
+        self.tables = defaultdict(list)
+        self.auth = FakeAuth(self)
+        self.calls = 0
+        self.rpc_handlers = {
+            "admin_statistics": _admin_statistics,
+            "reconcile_debt_ledger": _reconcile_debt_ledger,
+        }
+        # Row triggers (supabase/migrations), called as trigger(client, old, new)
+        self.triggers = {
+            "orders": _ledger_orders,
+            "customer_payments": _ledger_payments,
+        }
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None, **kwargs):
+        return FakeRPC(self, name, params)
+
+    def seed(self, table, rows):
+        for row in rows:
+            row = self._new_row(table, row)
+            self.tables[table].append(row)
+            self._fire(table, None, row)
+
+    def reset(self):
+        with self._lock:
+            self.tables.clear()
+            self.calls = 0
+
+    # ----- internals -----
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.faults.check()
+
+    def _new_row(self, table, values):
+        row = {
+            column: default() if callable(default) else default
+            for column, default in DEFAULTS.get(table, {}).items()
+        }
+        row["id"] = str(uuid.uuid4())
+        row.update(values)
+        return row
+
+    def _project(self, table, row, spec):
+        columns, embeds = _parse_select(spec)
+        if "*" in columns:
+            result = dict(row)
+        else:
+            result = {c: row.get(c) for c in columns}
+        for name, inner in embeds.items():
+            fk = f"{_singular(name)}_id"
+            if fk in row:
+                target = next(
+                    (r for r in self.tables[name] if r["id"] == row[fk]), None
+                )
+                result[name] = (
+                    self._project(name, target, inner) if target else None
+                )
+            else:
+                back = f"{_singular(table)}_id"
+                result[name] = [
+                    self._project(name, r, inner)
+                    for r in self.tables[name]
+                    if r.get(back) == row["id"]
+                ]
+        return result
+
+    def _fire(self, table, old, new):
+        trigger = self.triggers.get(table)
+        if trigger is not None:
+            trigger(self, old, new)
+
+    def _execute(self, q):
+        self._round_trip()
+        with self._lock:
+            rows = self.tables[q.table_name]
+            if q.op in ("insert", "upsert"):
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                result = []
+                for values in payload:
+                    existing = None
+                    if q.op == "upsert":
+                        keys = [k.strip() for k in q.on_conflict.split(",")]
+                        existing = next(
+                            (
+                                r for r in rows
+                                if all(k in values and r.get(k) == values[k] for k in keys)
+                            ),
+                            None,
+                        )
+                    if existing is not None:
+                        old = dict(existing)
+                        existing.update(values)
+                        self._fire(q.table_name, old, existing)
+                        result.append(dict(existing))
+                    else:
+                        row = self._new_row(q.table_name, values)
+                        rows.append(row)
+                        self._fire(q.table_name, None, row)
+                        result.append(dict(row))
+                return FakeResponse(result)
+
+            matched = [r for r in rows if all(f(r) for f in q.filters)]
+            if q.op == "update":
+                for r in matched:
+                    old = dict(r)
+                    r.update(q.payload)
+                    self._fire(q.table_name, old, r)
+                return FakeResponse([dict(r) for r in matched])
+            if q.op == "delete":
+                self.tables[q.table_name] = [r for r in rows if r not in matched]
+                for r in matched:
+                    self._fire(q.table_name, r, None)
+                return FakeResponse([dict(r) for r in matched])
+
+            for column, desc in reversed(q.orders):
+                matched.sort(
+                    key=lambda r: (
+                        r.get(column) is None,
+                        r.get(column) if r.get(column) is not None else "",
+                    ),
+                    reverse=desc,
+                )
+            count = len(matched) if q.count_method else None
+            matched = matched[q.offset_count:]
+            if q.limit_count is not None:
+                matched = matched[: q.limit_count]
+            data = [self._project(q.table_name, r, q.columns) for r in matched]
+
+        if q.head:
+            return FakeResponse([], count)
+        if q.is_single or q.maybe_single_flag:
+            if len(data) == 1:
+                return FakeResponse(data[0], count)
+            if q.maybe_single_flag and not data:
+                return FakeResponse(None, count)
+            raise APIError(
+                {
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "code": "PGRST116",
+                    "details": f"The result contains {len(data)} rows",
+                    "hint": None,
+                }
+            )
+        return FakeResponse(data, count)
+
+    def _execute_rpc(self, call):
+        self._round_trip()
+        handler = self.rpc_handlers.get(call.name)
+        if handler is None:
+            raise APIError(
+                {
+                    "message": f"Could not find the function public.{call.name}",
+                    "code": "PGRST202",
+                    "details": None,
+                    "hint": None,
+                }
+            )
+        with self._lock:
+            return FakeResponse(handler(self, **call.params))
+
+
+def _admin_statistics(client, p_from=None, p_to=None):
+    """Python port of the admin_statistics SQL function (supabase/migrations)."""
+    start = date.fromisoformat(p_from) if p_from else None
+    end = date.fromisoformat(p_to) + timedelta(days=1) if p_to else None
+
+    months = {}
+    for o in client.tables["orders"]:
+        stamp = datetime.fromisoformat(o.get("completed_at") or o["created_at"])
+        if start and stamp.date() < start or end and stamp.date() >= end:
+            continue
+        m = months.setdefault(
+            stamp.strftime("%Y-%m"), {"revenue": 0, "profit": 0, "debt": 0}
+        )
+        if o["status"] == "completed":
+            m["revenue"] += o["total_sell"]
+            m["profit"] += o["profit"]
+        m["debt"] += o["total_sell"] - o.get("paid_amount", 0)
+
+    series = [dict(month=k, **v) for k, v in sorted(months.items())]
+    return {
+        "total_revenue": sum(m["revenue"] for m in series),
+        "total_profit": sum(m["profit"] for m in series),
+        "total_debt": sum(m["debt"] for m in series),
+        "months": series,
+    }
+
+
+def _ledger_apply(client, customer_id, sell, paid):
+    if customer_id is None:
+        return
+    balances = client.tables["customer_balances"]
+    balance = next((b for b in balances if b["customer_id"] == customer_id), None)
+    if balance is None:
+        balance = {"customer_id": customer_id, "total_sell": 0, "total_paid": 0}
+        balances.append(balance)
+    balance["total_sell"] += sell or 0
+    balance["total_paid"] += paid or 0
+    balance["debt"] = balance["total_sell"] - balance["total_paid"]
+    balance["updated_at"] = _now()
+
+
+def _ledger_orders(client, old, new):
+    """Port of the orders_ledger trigger (supabase/migrations)."""
+    if old is not None:
+        _ledger_apply(
+            client, old.get("customer_id"), -old.get("total_sell", 0), -old.get("paid_amount", 0)
+        )
+    if new is not None:
+        _ledger_apply(
+            client, new.get("customer_id"), new.get("total_sell", 0), new.get("paid_amount", 0)
+        )
+
+
+def _ledger_payments(client, old, new):
+    """Port of the customer_payments_ledger trigger (supabase/migrations)."""
+    for payment, sign in ((old, -1), (new, 1)):
+        if payment is None:
+            continue
+        order = next(
+            (o for o in client.tables["orders"] if o["id"] == payment["order_id"]), None
+        )
+        if order is None:
+            continue
+        before = dict(order)
+        order["paid_amount"] = order.get("paid_amount", 0) + sign * payment["amount"]
+        _ledger_orders(client, before, order)
+
+
+def _reconcile_debt_ledger(client):
+    """Python port of the reconcile_debt_ledger SQL function (supabase/migrations)."""
+    paid = defaultdict(float)
+    for p in client.tables["customer_payments"]:
+        paid[p["order_id"]] += p["amount"]
+    orders_fixed = 0
+    totals = {c["id"]: [0, 0] for c in client.tables["customers"]}
+    for o in client.tables["orders"]:
+        if o.get("paid_amount") != paid[o["id"]]:
+            o["paid_amount"] = paid[o["id"]]
+            orders_fixed += 1
+        total = totals.setdefault(o["customer_id"], [0, 0])
+        total[0] += o["total_sell"]
+        total[1] += o["paid_amount"]
+
+    customers_fixed = 0
+    balances = {b["customer_id"]: b for b in client.tables["customer_balances"]}
+    for customer_id, (total_sell, total_paid) in totals.items():
+        balance = balances.get(customer_id)
+        if balance and (balance["total_sell"], balance["total_paid"]) == (total_sell, total_paid):
+            continue
+        if balance is None:
+            balance = {"customer_id": customer_id}
+            client.tables["customer_balances"].append(balance)
+        balance.update(
+            total_sell=total_sell,
+            total_paid=total_paid,
+            debt=total_sell - total_paid,
+            updated_at=_now(),
+        )
+        customers_fixed += 1
+    return {"orders_fixed": orders_fixed, "customers_fixed": customers_fixed}
+
+
+def seed_demo(client):
+    """Demo data for running the app offline (password: `password`)."""
+    client.auth.sign_up({"email": "admin@example.com", "password": "password"})
+    customer_user = client.auth.sign_up(
+        {"email": "customer@example.com", "password": "password"}
+    ).user
+    client.seed(
+        "customers",
+        [
+            {
+                "user_id": customer_user.id,
+                "name": "Khách hàng mẫu",
+                "phone": "0900000000",
+                "email": customer_user.email,
+                "address": "Hà Nội",
+            }
+        ],
+    )
+    client.seed(
+        "suppliers",
+        [{"name": f"Nhà cung cấp {i}", "phone": f"09100000{i:02d}"} for i in range(1, 4)],
+    )
+    client.seed(
+        "products",
+        [{"name": f"Sản phẩm {i}", "category": "Mẫu"} for i in range(1, 11)],
+    )
+    for i, product in enumerate(client.tables["products"]):
+        for j, supplier in enumerate(client.tables["suppliers"]):
+            cost = 10000 * (i + 1) + 1000 * j
+            client.seed(
+                "product_suppliers",
+                [
+                    {
+                        "product_id": product["id"],
+                        "supplier_id": supplier["id"],
+                        "cost_price": cost,
+                        "sell_price": round(cost * 1.2),
+                    }
+                ],
+            )
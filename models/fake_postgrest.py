@@ -0,0 +1,215 @@
+"""
+Local PostgREST stand-in: serves the in-memory fake (models/fake.py) over HTTP.
+
+Pointing SUPABASE_URL at it runs the app with the real supabase client, so
+requests go through postgrest-py, the shared httpx pool (models/http.py),
+JSON over a socket and the per-call timeouts, as they would against Supabase.
+It understands the /rest/v1 requests postgrest-py sends for this app: select
+with embeds, column filters (eq, neq, gt, gte, lt, lte, is, in, not.*), or=,
+order, limit / offset, count via Prefer / HEAD, single objects, insert /
+upsert / update / delete, and POST /rest/v1/rpc/<name>. The fake's latency
+and Faults apply to every call. Auth endpoints are not served.
+
+    python -m models.fake_postgrest [--port 54321] [--latency-ms 20]
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=local.stand.in flask run
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from postgrest.exceptions import APIError
+
+from models.fake import FakeClient, seed_demo
+
+# An API key in the shape create_client accepts; the stand-in ignores it
+API_KEY = "local.stand.in"
+
+_REST_PREFIX = "/rest/v1/"
+_RPC_PREFIX = "/rest/v1/rpc/"
+_SINGLE_OBJECT = "application/vnd.pgrst.object+json"
+# Query parameters that are not column filters
+_RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+# PostgREST status codes for the fake's error codes
+_ERROR_STATUS = {"PGRST116": 406, "PGRST202": 404, "503": 503}
+
+
+def _prefer(headers) -> dict:
+    """'return=representation,count=exact' -> {"return": ..., "count": ...}"""
+    prefs = {}
+    for part in (headers.get("Prefer") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            prefs[name] = value
+    return prefs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's connection pool is exercised; no Nagle delay
+    # between the header and body writes of a response
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    @property
+    def fake(self) -> FakeClient:
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    # ----- HTTP methods -----
+    def do_GET(self):
+        self._handle()
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _handle(self, head=False):
+        url = urlsplit(self.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        try:
+            body = self._body()
+            if url.path.startswith(_RPC_PREFIX):
+                name = url.path[len(_RPC_PREFIX):]
+                args = body if body is not None else dict(params)
+                response = self.fake.rpc(name, args).execute()
+                self._send(200, response.data)
+            elif url.path.startswith(_REST_PREFIX):
+                self._table(url.path[len(_REST_PREFIX):], params, body, head)
+            else:
+                self._send(404, {"message": f"Not served by the stand-in: {url.path}"})
+        except APIError as e:
+            self._send(_ERROR_STATUS.get(str(e.code), 400), e.json())
+        except Exception as e:
+            # Injected transport faults and bugs alike become a 500 here
+            self._send(500, {"message": f"{type(e).__name__}: {e}", "code": "500"})
+
+    def _table(self, table, params, body, head):
+        prefer = _prefer(self.headers)
+        query = self.fake.table(table)
+        method = self.command
+        if method == "POST":
+            if prefer.get("resolution") == "merge-duplicates":
+                query.upsert(body, on_conflict=dict(params).get("on_conflict") or "id")
+            else:
+                query.insert(body)
+        elif method == "PATCH":
+            query.update(body)
+        elif method == "DELETE":
+            query.delete()
+        else:
+            query.select(
+                dict(params).get("select", "*"),
+                count=prefer.get("count"),
+                head=head,
+            )
+
+        for key, value in params:
+            if key in _RESERVED or "." in key:
+                continue  # embedded-resource modifiers (e.g. items.order) are ignored
+            if key in ("or", "and"):
+                query.filter(None, key, value)
+            else:
+                operator, _, criteria = value.partition(".")
+                if operator == "not":
+                    negated, _, criteria = criteria.partition(".")
+                    operator = f"not.{negated}"
+                query.filter(key, operator, criteria)
+        for key, value in params:
+            if key == "order":
+                for term in value.split(","):
+                    column, _, direction = term.partition(".")
+                    query.order(column, desc=direction.startswith("desc"))
+            elif key == "limit":
+                query.limit(int(value))
+            elif key == "offset":
+                query.offset(int(value))
+
+        single = self.headers.get("Accept") == _SINGLE_OBJECT
+        if single:
+            query.single()
+        response = query.execute()
+
+        if method != "GET" and method != "HEAD" and prefer.get("return") == "minimal":
+            self._send(204 if method != "POST" else 201, None)
+            return
+        self._send(
+            201 if method == "POST" else 200,
+            None if head else response.data,
+            content_range=self._content_range(response, single),
+        )
+
+    @staticmethod
+    def _content_range(response, single) -> Optional[str]:
+        if response.count is None:
+            return None
+        rows = 1 if single else len(response.data or [])
+        span = f"0-{rows - 1}" if rows else "*"
+        return f"{span}/{response.count}"
+
+    def _send(self, status, data, content_range=None):
+        payload = b"" if data is None else json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+
+class FakePostgrestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], fake: FakeClient):
+        super().__init__(address, _Handler)
+        self.fake = fake
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start(fake: FakeClient, host: str = "127.0.0.1", port: int = 0) -> FakePostgrestServer:
+    """Serve `fake` on a background thread; port 0 picks a free port."""
+    server = FakePostgrestServer((host, port), fake)
+    threading.Thread(target=server.serve_forever, name="fake-postgrest", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostgREST stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    fake = FakeClient(latency=args.latency_ms / 1000)
+    seed_demo(fake)
+    server = FakePostgrestServer((args.host, args.port), fake)
+    print(f"PostgREST stand-in on {server.url} (SUPABASE_KEY={API_KEY})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
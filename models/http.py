@@ -0,0 +1,150 @@
+"""
+Shared HTTP connection pool.
+
+One httpx client per process, used by the supabase client in `models.db` and
+by the auth routes for direct calls to Supabase Auth, so connections to the
+Supabase host are kept alive and reused instead of opened per request. Each
+call made during a request or background job is reported to
+`models.instrumentation`, and
+gets a timeout by method (DB_READ_TIMEOUT / DB_WRITE_TIMEOUT).
+"""
+import time
+from typing import Optional, Tuple
+
+import httpx
+
+from config import Config
+from models import instrumentation
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:  # HTTP/2 needs the optional `h2` package (httpx[http2])
+    HTTP2 = False
+
+_REST_PREFIX = "/rest/v1/"
+_RPC_PREFIX = "/rest/v1/rpc/"
+_AUTH_PREFIX = "/auth/v1/"
+_METHOD_OPS = {
+    "GET": "select",
+    "HEAD": "count",
+    "POST": "insert",
+    "PATCH": "update",
+    "PUT": "upsert",
+    "DELETE": "delete",
+}
+
+
+def _describe(request: httpx.Request) -> Tuple[str, str]:
+    """(table, operation) of a PostgREST / Auth request, from its URL and method."""
+    path = request.url.path
+    if path.startswith(_RPC_PREFIX):
+        return path[len(_RPC_PREFIX):], "rpc"
+    if path.startswith(_REST_PREFIX):
+        op = _METHOD_OPS.get(request.method, request.method.lower())
+        if op == "insert" and "merge-duplicates" in request.headers.get("prefer", ""):
+            op = "upsert"
+        return path[len(_REST_PREFIX):], op
+    if path.startswith(_AUTH_PREFIX):
+        return "auth", path[len(_AUTH_PREFIX):]
+    return request.url.host, request.method.lower()
+
+
+def _row_count(response: httpx.Response) -> Optional[int]:
+    """Rows in the body according to PostgREST's Content-Range ("0-24/*", "*/0")."""
+    content_range = response.headers.get("content-range")
+    if not content_range:
+        return None
+    span = content_range.split("/", 1)[0]
+    if span == "*":
+        return 0
+    try:
+        first, last = span.split("-", 1)
+        return int(last) - int(first) + 1
+    except ValueError:
+        return None
+
+
+class _MeteredStream(httpx.SyncByteStream):
+    """Counts body bytes as they are read and reports once the body is closed."""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._bytes = 0
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+        self._on_close(self._bytes)
+
+
+def _timeout(method: str) -> dict:
+    """Per-call timeouts: reads get DB_READ_TIMEOUT, other calls DB_WRITE_TIMEOUT."""
+    limit = Config.DB_READ_TIMEOUT if method in ("GET", "HEAD") else Config.DB_WRITE_TIMEOUT
+    return {"connect": Config.HTTP_CONNECT_TIMEOUT, "read": limit, "write": limit, "pool": limit}
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["timeout"] = _timeout(request.method)
+        stats = instrumentation.current()
+        if stats is None:
+            return self._transport.handle_request(request)
+
+        table, op = _describe(request)
+        start = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            stats.add(
+                instrumentation.Call(
+                    table, op, (time.perf_counter() - start) * 1000, None, None, True
+                )
+            )
+            raise
+
+        rows = _row_count(response)
+        error = response.status_code >= 400
+
+        def done(nbytes):
+            stats.add(
+                instrumentation.Call(
+                    table, op, (time.perf_counter() - start) * 1000, rows, nbytes, error
+                )
+            )
+
+        response.stream = _MeteredStream(response.stream, done)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def build_client() -> httpx.Client:
+    # Transport retries only cover failures to establish a connection, so they
+    # are safe for non-idempotent POST/PATCH requests as well.
+    transport = httpx.HTTPTransport(
+        http2=HTTP2,
+        retries=Config.HTTP_RETRIES,
+        limits=httpx.Limits(
+            max_connections=Config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(
+        transport=InstrumentedTransport(transport),
+        timeout=httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT),
+    )
+
+
+http_client = build_client()
@@ -0,0 +1,184 @@
+"""
+Bulk import of supplier price lists from CSV.
+
+The upload is read as a text stream and processed in chunks of
+IMPORT_CHUNK_SIZE rows: each chunk is validated, missing suppliers and
+products (matched by name) are created in bulk, and the prices are written
+with `repository.save_product_supplier_prices`. Only the current chunk, the
+supplier names seen so far and a capped list of row errors stay in memory.
+
+Expected columns (header row required; the optional ones may be omitted):
+
+    product_name, supplier_name, cost_price, sell_price,
+    category, description, supplier_phone, supplier_email
+"""
+import csv
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import repository
+
+REQUIRED_COLUMNS = ("product_name", "supplier_name", "cost_price", "sell_price")
+MAX_ERRORS = 200
+
+logger = logging.getLogger(__name__)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.products_created = 0
+        self.suppliers_created = 0
+        self.prices_inserted = 0
+        self.prices_updated = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def _price(value: Optional[str], column: str) -> float:
+    try:
+        price = float((value or "").replace(",", ""))
+    except ValueError:
+        raise ValueError(f"{column} không phải là số: {value!r}")
+    if price < 0:
+        raise ValueError(f"{column} không được âm")
+    return price
+
+
+def _parse_row(row: Dict[str, str]) -> dict:
+    product = (row.get("product_name") or "").strip()
+    supplier = (row.get("supplier_name") or "").strip()
+    if not product:
+        raise ValueError("Thiếu product_name")
+    if not supplier:
+        raise ValueError("Thiếu supplier_name")
+    return {
+        "product_name": product,
+        "supplier_name": supplier,
+        "cost_price": _price(row.get("cost_price"), "cost_price"),
+        "sell_price": _price(row.get("sell_price"), "sell_price"),
+        "category": (row.get("category") or "").strip(),
+        "description": (row.get("description") or "").strip(),
+        "supplier_phone": (row.get("supplier_phone") or "").strip(),
+        "supplier_email": (row.get("supplier_email") or "").strip(),
+    }
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Importer:
+    def __init__(self, report: ImportReport):
+        self.report = report
+        # Price lists usually cover few suppliers, so their ids are kept for
+        # the whole file; product ids are looked up per chunk.
+        self.supplier_ids: Dict[str, str] = {}
+
+    def _resolve_suppliers(self, rows: List[dict]) -> None:
+        missing = {r["supplier_name"] for r in rows} - set(self.supplier_ids)
+        if not missing:
+            return
+        self.supplier_ids.update(repository.find_suppliers_by_name(missing))
+        new = {}
+        for r in rows:
+            name = r["supplier_name"]
+            if name not in self.supplier_ids and name not in new:
+                new[name] = {
+                    "name": name,
+                    "phone": r["supplier_phone"],
+                    "email": r["supplier_email"],
+                }
+        created = repository.create_suppliers(list(new.values()))
+        self.supplier_ids.update({s["name"]: s["id"] for s in created})
+        self.report.suppliers_created += len(created)
+
+    def _resolve_products(self, rows: List[dict]) -> Dict[str, str]:
+        product_ids = repository.find_products_by_name(r["product_name"] for r in rows)
+        new = {}
+        for r in rows:
+            name = r["product_name"]
+            if name not in product_ids and name not in new:
+                new[name] = {
+                    "name": name,
+                    "category": r["category"],
+                    "description": r["description"],
+                }
+        created = repository.create_products(list(new.values()))
+        product_ids.update({p["name"]: p["id"] for p in created})
+        self.report.products_created += len(created)
+        return product_ids
+
+    def run_chunk(self, chunk: List[Tuple[int, Dict[str, str]]]) -> None:
+        rows = []
+        for line, raw in chunk:
+            try:
+                rows.append(_parse_row(raw))
+            except ValueError as e:
+                self.report.add_error(line, str(e))
+        if not rows:
+            return
+        try:
+            self._write(rows)
+        except Exception:
+            # Chi tiết lỗi chỉ ghi vào log, không đưa vào báo cáo cho người dùng
+            first, last = chunk[0][0], chunk[-1][0]
+            logger.exception("Writing price list lines %s-%s failed", first, last)
+            self.report.add_error(
+                first, f"Không ghi được dữ liệu dòng {first}-{last}, vui lòng thử lại"
+            )
+
+    def _write(self, rows: List[dict]) -> None:
+        self._resolve_suppliers(rows)
+        product_ids = self._resolve_products(rows)
+        # The last line for a (product, supplier) pair in the chunk wins
+        prices = {}
+        for r in rows:
+            key = (product_ids[r["product_name"]], self.supplier_ids[r["supplier_name"]])
+            prices[key] = {
+                "product_id": key[0],
+                "supplier_id": key[1],
+                "cost_price": r["cost_price"],
+                "sell_price": r["sell_price"],
+            }
+        inserted, updated = repository.save_product_supplier_prices(list(prices.values()))
+        self.report.prices_inserted += inserted
+        self.report.prices_updated += updated
+
+
+def import_price_list(lines: Iterable[str], chunk_size: int) -> ImportReport:
+    """
+    Import a CSV price list from an iterable of text lines (e.g. a text
+    stream over the upload). Row-level problems are collected in the report;
+    a missing required column raises ValueError before anything is written.
+    """
+    report = ImportReport()
+    reader = csv.DictReader(lines)
+    header = [name.strip() for name in reader.fieldnames or []]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Thiếu cột: {', '.join(missing)}")
+    reader.fieldnames = header
+
+    importer = _Importer(report)
+
+    def numbered():
+        for row in reader:
+            report.rows += 1
+            yield reader.line_num, row
+
+    for chunk in _chunks(numbered(), chunk_size):
+        importer.run_chunk(chunk)
+    return report
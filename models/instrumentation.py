@@ -0,0 +1,91 @@
+"""
+Per-request accounting of outbound data calls.
+
+`app.py` opens a RequestStats for every request; the HTTP transport in
+`models.http` (and the fake backend) report each call to it with its table,
+operation, rows, bytes, duration and whether it failed. Background jobs open
+one per job (models/jobs.py); nothing is recorded outside a request or job.
+The stats live in a contextvar, which `models.concurrency.gather` copies into
+its worker threads, so concurrent fan-out calls land in the same request.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+
+class Call(NamedTuple):
+    table: str
+    op: str
+    ms: float
+    rows: Optional[int]
+    bytes: Optional[int]
+    # Raised, or answered with an HTTP error status
+    error: bool = False
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls: List[Call] = []
+        # Data served from an expired cache because Supabase was unavailable
+        self.degraded: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, call: Call) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def db_ms(self) -> float:
+        """Summed call time; overlapping fan-out calls can exceed wall time."""
+        return sum(call.ms for call in self.calls)
+
+    def by_call(self) -> List[Dict[str, Any]]:
+        """Calls aggregated per (table, op), slowest first."""
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for call in self.calls:
+            group = groups.setdefault(
+                (call.table, call.op),
+                {"table": call.table, "op": call.op, "count": 0, "ms": 0.0,
+                 "rows": 0, "bytes": 0},
+            )
+            group["count"] += 1
+            group["ms"] += call.ms
+            group["rows"] += call.rows or 0
+            group["bytes"] += call.bytes or 0
+        for group in groups.values():
+            group["ms"] = round(group["ms"], 1)
+        return sorted(groups.values(), key=lambda g: g["ms"], reverse=True)
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_ms():.1f};desc="{len(self.calls)} calls", '
+            f"app;dur={self.elapsed_ms():.1f}"
+        )
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def begin() -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def mark_degraded(name: str) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.degraded.add(name)
+
+
+def end() -> None:
+    _current.set(None)
+
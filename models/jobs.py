@@ -0,0 +1,333 @@
+"""
+Durable background jobs for side effects that don't need to finish before
+the HTTP response (order fan-out after a quote is accepted, notifications).
+
+Jobs are rows in a SQLite table (JOBS_DB_PATH) shared by every process on
+the host. `enqueue(kind, payload, key=...)` records one and returns; an
+idempotency key makes enqueueing the same piece of work twice a no-op while
+an earlier job for it is queued, running or done. Workers claim due jobs
+with one atomic UPDATE ... RETURNING and lease them for JOBS_LEASE_SECONDS,
+so a job whose worker died is picked up again after the lease. While a
+handler runs, a heartbeat thread keeps extending the lease, so a slow job is
+not handed to a second worker. Each claim gets its own lease token. Only the
+holder of the token can renew, complete or fail the job. A handler calls
+check_lease() before destructive steps, and that raises LeaseLost once
+another worker has taken the job over. A failing job
+is retried with exponential backoff until its handler's max_attempts, then
+marked "dead" and its on_dead hook runs (e.g. to undo a partial state).
+
+Workers run as JOBS_WORKER_THREADS threads in each web process (the default,
+so a plain `gunicorn app:app` needs nothing else) and/or as dedicated
+processes with `flask run-jobs`. Handlers are registered with @handler in
+models/tasks.py and must be safe to run more than once.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, NamedTuple, Optional
+
+from config import Config
+from models import instrumentation, metrics
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+create table if not exists jobs (
+    id integer primary key autoincrement,
+    kind text not null,
+    payload text not null,
+    idempotency_key text,
+    status text not null default 'queued',
+    attempts integer not null default 0,
+    run_at real not null,
+    locked_until real,
+    last_error text,
+    lease_token text,
+    created_at real not null,
+    updated_at real not null
+);
+create index if not exists jobs_due on jobs (status, run_at);
+create unique index if not exists jobs_idempotency
+    on jobs (idempotency_key) where status != 'dead';
+"""
+
+
+class Handler(NamedTuple):
+    run: Callable[[dict], None]
+    max_attempts: int
+    on_dead: Optional[Callable[[dict], None]]
+
+
+_handlers: Dict[str, Handler] = {}
+
+
+def handler(kind: str, max_attempts: int = 5, on_dead=None):
+    """Register the function that runs jobs of `kind` (called with the payload)."""
+
+    def register(fn):
+        _handlers[kind] = Handler(fn, max_attempts, on_dead)
+        return fn
+
+    return register
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    token: str
+
+
+class LeaseLost(Exception):
+    """Another worker has taken over the job (its lease ran out)."""
+
+
+# The job the current thread is running, for check_lease()
+_running = threading.local()
+
+
+class JobQueue:
+    def __init__(self, path: str, lease: float, backoff: float, max_backoff: float):
+        self.path = path
+        self.lease = lease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process (they must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("pragma journal_mode = wal")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("pragma table_info(jobs)")}
+            if "lease_token" not in columns:  # files created before leases had tokens
+                conn.execute("alter table jobs add column lease_token text")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, kind: str, payload: dict, key: Optional[str] = None,
+                delay: float = 0) -> int:
+        """Queue a job; with a key already queued/running/done, return that job's id."""
+        now = time.time()
+        conn = self._conn()
+        cursor = conn.execute(
+            "insert or ignore into jobs"
+            " (kind, payload, idempotency_key, run_at, created_at, updated_at)"
+            " values (?, ?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload), key, now + delay, now, now),
+        )
+        if cursor.rowcount:
+            return cursor.lastrowid
+        return conn.execute(
+            "select id from jobs where idempotency_key = ? and status != 'dead'", (key,)
+        ).fetchone()[0]
+
+    def claim(self) -> Optional[Job]:
+        """Lease the oldest due job (or one whose lease ran out)."""
+        now = time.time()
+        token = uuid.uuid4().hex
+        row = self._conn().execute(
+            "update jobs set status = 'running', attempts = attempts + 1,"
+            " locked_until = ?, lease_token = ?, updated_at = ?"
+            " where id = (select id from jobs"
+            "  where (status = 'queued' and run_at <= ?)"
+            "     or (status = 'running' and locked_until < ?)"
+            "  order by run_at limit 1)"
+            " returning id, kind, payload, attempts",
+            (now + self.lease, token, now, now, now),
+        ).fetchone()
+        if row is None:
+            return None
+        return Job(row[0], row[1], json.loads(row[2]), row[3], token)
+
+    def renew(self, job: Job) -> bool:
+        """Extend the lease of a running job; False once it is no longer ours."""
+        now = time.time()
+        return bool(
+            self._conn().execute(
+                "update jobs set locked_until = ?, updated_at = ?"
+                " where id = ? and lease_token = ? and status = 'running'",
+                (now + self.lease, now, job.id, job.token),
+            ).rowcount
+        )
+
+    def holds(self, job: Job) -> bool:
+        """True while `job`'s lease is current and still held by its claimer."""
+        return (
+            self._conn().execute(
+                "select 1 from jobs where id = ? and lease_token = ?"
+                " and status = 'running' and locked_until > ?",
+                (job.id, job.token, time.time()),
+            ).fetchone()
+            is not None
+        )
+
+    def _heartbeat(self, job: Job, stop: threading.Event) -> None:
+        while not stop.wait(self.lease / 3):
+            try:
+                if not self.renew(job):
+                    logger.warning("job %s (%s) lost its lease", job.id, job.kind)
+                    return
+            except sqlite3.Error:
+                logger.warning("renewing the lease of job %s failed", job.id, exc_info=True)
+
+    def complete(self, job: Job) -> bool:
+        return bool(
+            self._conn().execute(
+                "update jobs set status = 'done', locked_until = null, updated_at = ?"
+                " where id = ? and lease_token = ?",
+                (time.time(), job.id, job.token),
+            ).rowcount
+        )
+
+    def fail(self, job: Job, error: str, dead: bool) -> bool:
+        now = time.time()
+        if dead:
+            status, run_at = "dead", now
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (job.attempts - 1))
+            status, run_at = "queued", now + delay * random.uniform(0.8, 1.2)
+        return bool(
+            self._conn().execute(
+                "update jobs set status = ?, run_at = ?, locked_until = null,"
+                " last_error = ?, updated_at = ? where id = ? and lease_token = ?",
+                (status, run_at, error[:2000], now, job.id, job.token),
+            ).rowcount
+        )
+
+    def run_one(self) -> bool:
+        """Claim and run one due job. Returns False when none was due."""
+        job = self.claim()
+        if job is None:
+            return False
+        spec = _handlers.get(job.kind)
+        if spec is None:
+            self.fail(job, f"no handler for {job.kind!r}", dead=True)
+            return True
+        # Supabase calls of the job are counted like those of a request
+        stats = instrumentation.begin()
+        outcome = "done"
+        stop = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job, stop), name=f"job-{job.id}-lease", daemon=True
+        ).start()
+        _running.job = job
+        try:
+            spec.run(job.payload)
+        except LeaseLost:
+            # The worker that took over records the outcome
+            outcome = "lost"
+            logger.warning("job %s (%s) stopped: lease taken over", job.id, job.kind)
+        except Exception as e:
+            dead = job.attempts >= spec.max_attempts
+            outcome = "dead" if dead else "retry"
+            logger.warning(
+                "job %s (%s) failed, attempt %s/%s",
+                job.id, job.kind, job.attempts, spec.max_attempts, exc_info=True,
+            )
+            if not self.fail(job, f"{type(e).__name__}: {e}", dead):
+                outcome = "lost"
+            elif dead and spec.on_dead is not None:
+                try:
+                    spec.on_dead(job.payload)
+                except Exception:
+                    logger.exception("on_dead hook of job %s failed", job.id)
+        else:
+            if not self.complete(job):
+                outcome = "lost"
+                logger.warning("job %s (%s) finished after losing its lease", job.id, job.kind)
+        finally:
+            stop.set()
+            _running.job = None
+            instrumentation.end()
+            metrics.JOB_DURATION.observe(stats.elapsed_ms() / 1000, kind=job.kind)
+            metrics.JOBS.inc(kind=job.kind, outcome=outcome)
+            metrics.record_calls(stats.calls, source="job")
+            metrics.registry.maybe_flush()
+        return True
+
+    def run_pending(self) -> int:
+        """Run every job that is due now (tests, benchmarks, `flask run-jobs --once`)."""
+        count = 0
+        while self.run_one():
+            count += 1
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        return dict(
+            self._conn().execute("select status, count(*) from jobs group by status")
+        )
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated more than `older_than` seconds ago."""
+        return self._conn().execute(
+            "delete from jobs where status in ('done', 'dead') and updated_at < ?",
+            (time.time() - older_than,),
+        ).rowcount
+
+
+queue = JobQueue(
+    Config.JOBS_DB_PATH,
+    lease=Config.JOBS_LEASE_SECONDS,
+    backoff=Config.JOBS_BACKOFF_SECONDS,
+    max_backoff=Config.JOBS_MAX_BACKOFF_SECONDS,
+)
+
+
+def enqueue(kind: str, payload: dict, key: Optional[str] = None, delay: float = 0) -> int:
+    return queue.enqueue(kind, payload, key=key, delay=delay)
+
+
+def check_lease() -> None:
+    """
+    Raise LeaseLost if the job this thread runs has been taken over by another
+    worker. Handlers call it before steps that would undo another run's work.
+    Outside a job it does nothing.
+    """
+    job = getattr(_running, "job", None)
+    if job is not None and not queue.holds(job):
+        raise LeaseLost(f"job {job.id} is no longer leased to this worker")
+
+
+def work(stop: threading.Event, poll_interval: float) -> None:
+    """Worker loop: run due jobs, sleep poll_interval when there are none."""
+    while not stop.is_set():
+        try:
+            if queue.run_one():
+                continue
+        except Exception:
+            logger.exception("job worker error")
+        stop.wait(poll_interval)
+
+
+_threads_pid: Optional[int] = None
+_threads_lock = threading.Lock()
+
+
+def ensure_worker_threads() -> None:
+    """Start JOBS_WORKER_THREADS daemon workers once per process."""
+    global _threads_pid
+    if not Config.JOBS_WORKER_THREADS or _threads_pid == os.getpid():
+        return
+    with _threads_lock:
+        if _threads_pid == os.getpid():
+            return
+        _threads_pid = os.getpid()
+        stop = threading.Event()
+        for i in range(Config.JOBS_WORKER_THREADS):
+            threading.Thread(
+                target=work,
+                args=(stop, Config.JOBS_POLL_SECONDS),
+                name=f"jobs-worker-{i}",
+                daemon=True,
+            ).start()
@@ -0,0 +1,245 @@
+"""
+Minimal Prometheus-style metrics registry.
+
+Counters and histograms are kept in memory per process. With several gunicorn
+workers each process also writes a snapshot of its metrics to METRICS_DIR
+(at most every METRICS_FLUSH_SECONDS and at exit), and `/metrics` sums the
+snapshots of all processes, so whichever worker answers the scrape reports
+the whole service. Empty the directory on deploy; snapshots of exited workers
+are kept so counters never go backwards while the service runs. Processes
+running `flask run-jobs` write snapshots too, so with METRICS_DIR set their
+jobs and Supabase calls are part of every scrape.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Set from a counter kept elsewhere (e.g. TTLCache.stats())."""
+        with self._lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # label key -> [count per bucket..., count above last bucket, sum]
+        self.values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), list(series)] for key, series in self.values.items()]
+
+
+class Registry:
+    def __init__(self, directory: str = "", flush_interval: float = 5.0):
+        self.metrics: Dict[str, object] = {}
+        self.caches: Dict[str, object] = {}
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def register_cache(self, name: str, cache) -> None:
+        """Report hits/misses of a TTLCache-like object exposing stats()."""
+        self.caches[name] = cache
+
+    # ----- snapshots -----
+    def _collect_caches(self) -> None:
+        hits = self.counter("cache_hits_total", "Cache lookups answered from the cache.")
+        misses = self.counter("cache_misses_total", "Cache lookups that had to load.")
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.set_total(stats["hits"], cache=name)
+            misses.set_total(stats["misses"], cache=name)
+
+    def snapshot(self) -> dict:
+        self._collect_caches()
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self) -> None:
+        """Write this process's snapshot for the other workers to read."""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self) -> None:
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _all_snapshots(self) -> List[dict]:
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = self._path(os.getpid())
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # being replaced right now; next scrape gets it
+        return snapshots
+
+    # ----- exposition -----
+    def render(self) -> str:
+        merged: Dict[str, Dict[LabelKey, object]] = {}
+        for snapshot in self._all_snapshots():
+            for name, series in snapshot.items():
+                values = merged.setdefault(name, {})
+                for labels, value in series:
+                    key = tuple(tuple(pair) for pair in labels)
+                    if isinstance(value, list):
+                        current = values.get(key) or [0] * len(value)
+                        values[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (None,), value[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound is None else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(key, le=le)} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(key)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(key)} {_number(cumulative)}")
+
+        lines.extend(_cache_ratios(merged))
+        return "\n".join(lines) + "\n"
+
+
+def _cache_ratios(merged) -> List[str]:
+    hits = merged.get("cache_hits_total", {})
+    misses = merged.get("cache_misses_total", {})
+    if not hits and not misses:
+        return []
+    lines = [
+        "# HELP cache_hit_ratio Share of cache lookups answered from the cache.",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for key in sorted(set(hits) | set(misses)):
+        total = hits.get(key, 0) + misses.get(key, 0)
+        ratio = hits.get(key, 0) / total if total else 0
+        lines.append(f"cache_hit_ratio{_labels(key)} {_number(ratio)}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: LabelKey, le: Optional[str] = None) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in key]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+registry = Registry(Config.METRICS_DIR, Config.METRICS_FLUSH_SECONDS)
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Request latency by blueprint and endpoint."
+)
+REQUESTS = registry.counter(
+    "http_requests_total", "Requests by blueprint, endpoint and status code."
+)
+DATA_CALLS = registry.counter(
+    "supabase_calls_total", "Outbound Supabase calls by table and operation."
+)
+DATA_CALL_SECONDS = registry.counter(
+    "supabase_call_seconds_total", "Time spent in Supabase calls by table and operation."
+)
+DATA_CALL_ERRORS = registry.counter(
+    "supabase_call_errors_total",
+    "Supabase calls that raised or returned an error status, by table and operation.",
+)
+JOB_DURATION = registry.histogram(
+    "job_duration_seconds", "Background job run time by kind."
+)
+JOBS = registry.counter(
+    "jobs_total", "Background job runs by kind and outcome (done, retry, dead, lost)."
+)
+
+
+def record_calls(calls, source: str) -> None:
+    """Count the Supabase calls of one request or job (source "http" / "job")."""
+    for call in calls:
+        DATA_CALLS.inc(table=call.table, op=call.op, source=source)
+        DATA_CALL_SECONDS.inc(call.ms / 1000, table=call.table, op=call.op, source=source)
+        if call.error:
+            DATA_CALL_ERRORS.inc(table=call.table, op=call.op, source=source)
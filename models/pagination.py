@@ -0,0 +1,105 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+
+class Page(NamedTuple):
+    rows: List[dict]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(row: dict, key: str = "created_at") -> str:
+    """Encode a row's (key, id) as a URL-safe cursor."""
+    raw = json.dumps([row[key], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str = "created_at"):
+    """
+    Inverse of encode_cursor. Raises ValueError unless the id is a UUID and,
+    for a timestamp key (*_at), the value is an ISO timestamp, so a crafted
+    cursor cannot smuggle filter syntax into the query.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        row_id = str(uuid.UUID(row_id))
+        if key.endswith("_at"):
+            datetime.fromisoformat(value)
+        elif not isinstance(value, str):
+            raise TypeError(value)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    return value, row_id
+
+
+def _quote(value: str) -> str:
+    """A PostgREST filter value in double quotes, escaped."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def keyset_page(
+    query,
+    page_size: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    key: str = "created_at",
+    descending: bool = True,
+) -> Page:
+    """
+    Keyset pagination on (key, id): newest first by default, or ascending
+    (e.g. by name) with descending=False. `after` fetches the next page,
+    `before` the previous one. The query must select both key and id;
+    a malformed cursor raises ValueError.
+    """
+    cursor = after or before
+    if cursor:
+        value, row_id = decode_cursor(cursor, key)
+        op = "lt" if bool(after) == descending else "gt"
+        query = query.or_(
+            f"{key}.{op}.{_quote(value)},"
+            f"and({key}.eq.{_quote(value)},id.{op}.{row_id})"
+        )
+
+    # The previous page is read backwards from the cursor, then flipped
+    desc = descending if not before else not descending
+    rows = (
+        query.order(key, desc=desc)
+        .order("id", desc=desc)
+        .limit(page_size + 1)
+        .execute()
+        .data
+        or []
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    has_next = has_more if not before else True
+    has_prev = has_more if before else bool(after)
+    return Page(
+        rows=rows,
+        next_cursor=encode_cursor(rows[-1], key) if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0], key) if rows and has_prev else None,
+    )
+
+
+def iter_keyset(
+    make_query: Callable, page_size: int, key: str = "created_at"
+) -> Iterator[dict]:
+    """
+    Yield every row of a query page by page, newest first by `key`, holding at
+    most one page in memory. `make_query` builds a fresh query for each page because
+    query builders are mutated by the filters keyset_page adds.
+    """
+    cursor = None
+    while True:
+        page = keyset_page(make_query(), page_size, after=cursor, key=key)
+        yield from page.rows
+        if not page.next_cursor:
+            return
+        cursor = page.next_cursor
@@ -0,0 +1,707 @@
+"""
+Data-access layer over the supabase client.
+
+Routes call these functions instead of building `supabase.table(...)` queries
+themselves, so table names, embeds, column lists and multi-step writes live in
+one place. The client is looked up through `models.db` on every call, which is
+what lets DATA_BACKEND=fake swap in the in-memory backend from `models.fake`.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import db
+from models.concurrency import gather
+from models.pagination import Page, iter_keyset, keyset_page
+
+Row = Dict[str, Any]
+
+logger = logging.getLogger(__name__)
+
+
+def _table(name: str):
+    return db.supabase.table(name)
+
+
+# ===== Customers =====
+def get_customer_id(user_id: str) -> str:
+    result = _table("customers").select("id").eq("user_id", user_id).single().execute()
+    return result.data["id"]
+
+
+# ===== Products & suppliers =====
+def list_products_page(
+    page_size: int, after: Optional[str] = None, before: Optional[str] = None
+) -> Page:
+    # Alphabetical: the products table has no creation timestamp to order by
+    query = _table("products").select("id, name, category")
+    return keyset_page(
+        query, page_size, after=after, before=before, key="name", descending=False
+    )
+
+
+def list_suppliers_page(
+    page_size: int, after: Optional[str] = None, before: Optional[str] = None
+) -> Page:
+    query = _table("suppliers").select(
+        "id, created_at, name, contact_person, phone, email"
+    )
+    return keyset_page(query, page_size, after=after, before=before)
+
+
+def list_product_catalog() -> List[Row]:
+    return _table("products").select("id, name").execute().data or []
+
+
+def list_supplier_catalog() -> List[Row]:
+    return _table("suppliers").select("id, name").execute().data or []
+
+
+def create_product(values: Row) -> Row:
+    return _table("products").insert(values).execute().data[0]
+
+
+def create_supplier(values: Row) -> Row:
+    return _table("suppliers").insert(values).execute().data[0]
+
+
+def list_product_suppliers(product_id: str) -> List[Row]:
+    result = (
+        _table("product_suppliers")
+        .select("*, suppliers(name)")
+        .eq("product_id", product_id)
+        .execute()
+    )
+    return result.data or []
+
+
+def add_product_supplier(values: Row) -> Row:
+    return _table("product_suppliers").insert(values).execute().data[0]
+
+
+def find_products_by_name(names: Iterable[str]) -> Dict[str, str]:
+    """{name: id} of existing products among `names`."""
+    names = list(set(names))
+    if not names:
+        return {}
+    result = _table("products").select("id, name").in_("name", names).execute()
+    return {row["name"]: row["id"] for row in result.data or []}
+
+
+def find_suppliers_by_name(names: Iterable[str]) -> Dict[str, str]:
+    """{name: id} of existing suppliers among `names`."""
+    names = list(set(names))
+    if not names:
+        return {}
+    result = _table("suppliers").select("id, name").in_("name", names).execute()
+    return {row["name"]: row["id"] for row in result.data or []}
+
+
+def create_products(rows: List[Row]) -> List[Row]:
+    if not rows:
+        return []
+    return _table("products").insert(rows).execute().data or []
+
+
+def create_suppliers(rows: List[Row]) -> List[Row]:
+    if not rows:
+        return []
+    return _table("suppliers").insert(rows).execute().data or []
+
+
+def save_product_supplier_prices(prices: List[Row]) -> Tuple[int, int]:
+    """
+    Insert or update product_suppliers prices ({product_id, supplier_id,
+    cost_price, sell_price}) with one lookup and at most two bulk writes:
+    existing pairs are upserted by id, new pairs are inserted.
+    Returns (inserted, updated).
+    """
+    if not prices:
+        return 0, 0
+    existing = (
+        _table("product_suppliers")
+        .select("id, product_id, supplier_id")
+        .in_("product_id", list({p["product_id"] for p in prices}))
+        .in_("supplier_id", list({p["supplier_id"] for p in prices}))
+        .execute()
+    )
+    ids = {(r["product_id"], r["supplier_id"]): r["id"] for r in existing.data or []}
+    updates, inserts = [], []
+    for price in prices:
+        row = dict(price, is_active=True)
+        offer_id = ids.get((price["product_id"], price["supplier_id"]))
+        if offer_id:
+            updates.append(dict(row, id=offer_id))
+        else:
+            inserts.append(row)
+    if updates:
+        _table("product_suppliers").upsert(updates, on_conflict="id").execute()
+    if inserts:
+        _table("product_suppliers").insert(inserts).execute()
+    return len(inserts), len(updates)
+
+
+def list_active_offers(product_ids: Iterable[str], chunk_size: int = 200) -> List[Row]:
+    """
+    Active product_suppliers rows of the given products, with supplier names.
+    One in_() query per `chunk_size` products keeps the URL short.
+    """
+    product_ids = list(product_ids)
+    rows = []
+    for start in range(0, len(product_ids), chunk_size):
+        result = (
+            _table("product_suppliers")
+            .select("id, product_id, supplier_id, cost_price, sell_price, suppliers(name)")
+            .eq("is_active", True)
+            .in_("product_id", product_ids[start:start + chunk_size])
+            .execute()
+        )
+        rows.extend(result.data or [])
+    return rows
+
+
+# ===== Requests =====
+def list_requests_page(
+    page_size: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    status: Optional[str] = None,
+) -> Page:
+    query = _table("requests").select("id, created_at, status, customers(name, phone)")
+    if status:
+        query = query.eq("status", status)
+    return keyset_page(query, page_size, after=after, before=before)
+
+
+def list_customer_requests(customer_id: str) -> List[Row]:
+    result = (
+        _table("requests")
+        .select("*")
+        .eq("customer_id", customer_id)
+        .order("created_at", desc=True)
+        .execute()
+    )
+    return result.data or []
+
+
+def get_request(request_id: str) -> Row:
+    result = (
+        _table("requests")
+        .select("*, customers(name, phone, address)")
+        .eq("id", request_id)
+        .single()
+        .execute()
+    )
+    return result.data
+
+
+def list_request_items(request_id: str) -> List[Row]:
+    result = (
+        _table("request_items")
+        .select("*, products(id, name, category)")
+        .eq("request_id", request_id)
+        .execute()
+    )
+    return result.data or []
+
+
+def list_request_quotes(request_id: str) -> List[Row]:
+    return _table("quotes").select("*").eq("request_id", request_id).execute().data or []
+
+
+def get_request_detail(request_id: str) -> Tuple[Row, List[Row], List[Row]]:
+    """Request, its items and its quotes, fetched concurrently."""
+    return tuple(
+        gather(
+            lambda: get_request(request_id),
+            lambda: list_request_items(request_id),
+            lambda: list_request_quotes(request_id),
+        )
+    )
+
+
+def create_request_with_items(customer_id: str, note: str, items: Dict[str, int]) -> str:
+    """
+    Create a request and all its items ({product_id: quantity}) in one bulk
+    insert. The request is deleted again if the items cannot be written.
+    """
+    req = (
+        _table("requests")
+        .insert({"customer_id": customer_id, "status": "pending", "note": note})
+        .execute()
+    )
+    request_id = req.data[0]["id"]
+    try:
+        _table("request_items").insert(
+            [
+                {"request_id": request_id, "product_id": pid, "quantity": qty}
+                for pid, qty in items.items()
+            ]
+        ).execute()
+    except Exception:
+        _table("requests").delete().eq("id", request_id).execute()
+        raise
+    return request_id
+
+
+def set_request_status(request_id: str, status: str) -> Optional[str]:
+    """Set a request's status and return its customer_id (None if not found)."""
+    result = _table("requests").update({"status": status}).eq("id", request_id).execute()
+    return result.data[0]["customer_id"] if result.data else None
+
+
+# ===== Quotes =====
+def list_quotes_page(
+    page_size: int, after: Optional[str] = None, before: Optional[str] = None
+) -> Page:
+    query = _table("quotes").select(
+        "id, created_at, request_id, status, total_amount, requests(customers(name))"
+    )
+    return keyset_page(query, page_size, after=after, before=before)
+
+
+def get_quote(quote_id: str) -> Row:
+    result = (
+        _table("quotes")
+        .select("*, requests(*, customers(name, phone))")
+        .eq("id", quote_id)
+        .single()
+        .execute()
+    )
+    return result.data
+
+
+def get_request_quote(request_id: str) -> Row:
+    return _table("quotes").select("*").eq("request_id", request_id).single().execute().data
+
+
+def list_quote_items(quote_id: str) -> List[Row]:
+    result = (
+        _table("quote_items")
+        .select("*, product_suppliers(*, products(name), suppliers(name))")
+        .eq("quote_id", quote_id)
+        .execute()
+    )
+    return result.data or []
+
+
+def get_quote_with_items(quote_id: str) -> Tuple[Row, List[Row]]:
+    """Quote header and its items, fetched concurrently."""
+    return tuple(gather(lambda: get_quote(quote_id), lambda: list_quote_items(quote_id)))
+
+
+def create_quote_with_items(
+    request_id: str, admin_id: str, lines: List[Row]
+) -> Tuple[str, Optional[str]]:
+    """
+    Write a quote header with its final total, all quote_items in one bulk
+    insert, and mark the request as quoted. On failure the quote and its items
+    are removed again so no half-written quote is left behind.
+    Returns (quote_id, customer_id of the request).
+    """
+    total = sum(line["subtotal"] for line in lines)
+    quote = (
+        _table("quotes")
+        .insert(
+            {
+                "request_id": request_id,
+                "admin_id": admin_id,
+                "status": "sent",
+                "total_amount": total,
+            }
+        )
+        .execute()
+    )
+    quote_id = quote.data[0]["id"]
+    try:
+        if lines:
+            _table("quote_items").insert(
+                [dict(line, quote_id=quote_id) for line in lines]
+            ).execute()
+        customer_id = set_request_status(request_id, "quoted")
+    except Exception:
+        # The write error is what the caller needs; a failed cleanup is logged
+        try:
+            _table("quote_items").delete().eq("quote_id", quote_id).execute()
+            _table("quotes").delete().eq("id", quote_id).execute()
+        except Exception:
+            logger.exception("Removing half-written quote %s failed", quote_id)
+        raise
+    return quote_id, customer_id
+
+
+def accept_quote(quote_id: str) -> Optional[Row]:
+    """
+    Claim a quote with a conditional 'sent' -> 'accepted' update, so a double
+    submit finds nothing to claim and returns None. The orders are created
+    afterwards by `create_quote_orders` (run as a background job).
+    Returns {"request_id", "customer_id"} of the accepted quote.
+    """
+    claimed = (
+        _table("quotes")
+        .update({"status": "accepted"})
+        .eq("id", quote_id)
+        .eq("status", "sent")
+        .execute()
+    )
+    if not claimed.data:
+        return None
+    request_id = claimed.data[0]["request_id"]
+    try:
+        req = (
+            _table("requests")
+            .select("customer_id")
+            .eq("id", request_id)
+            .single()
+            .execute()
+        )
+    except Exception:
+        reopen_quote(quote_id)
+        raise
+    return {"request_id": request_id, "customer_id": req.data["customer_id"]}
+
+
+def reopen_quote(quote_id: str) -> None:
+    """Put an accepted quote whose orders could not be created back to 'sent'."""
+    _table("quotes").update({"status": "sent"}).eq("id", quote_id).eq(
+        "status", "accepted"
+    ).execute()
+
+
+def create_quote_orders(
+    quote_id: str,
+    request_id: str,
+    customer_id: str,
+    before_rebuild: Optional[Callable[[], None]] = None,
+) -> List[Row]:
+    """
+    Fan an accepted quote out into one order per supplier: order headers and
+    order_items are written in two bulk inserts, and the request is marked
+    accepted. Safe to run again: complete orders of an earlier run are
+    returned as they are, and half-written ones (headers without items) are
+    removed and rebuilt. `before_rebuild` is called first and may raise to stop
+    (e.g. jobs.check_lease, when another run may be writing those headers).
+    The rebuild is skipped when the quote is no longer accepted. On failure
+    only the orders this call inserted are removed before raising.
+    Returns the orders as {id, supplier_id, status}.
+    """
+    existing = (
+        _table("orders")
+        .select("id, supplier_id, status")
+        .eq("quote_id", quote_id)
+        .execute()
+        .data
+        or []
+    )
+    if existing:
+        items = (
+            _table("order_items")
+            .select("id", count="exact", head=True)
+            .in_("order_id", [o["id"] for o in existing])
+            .execute()
+        )
+        if items.count:
+            set_request_status(request_id, "accepted")
+            return existing
+
+    if before_rebuild is not None:
+        before_rebuild()
+    quote = _table("quotes").select("status").eq("id", quote_id).execute().data
+    if not quote or quote[0]["status"] != "accepted":
+        return []  # reopened (or gone) since the job was queued
+    if existing:
+        _table("orders").delete().in_("id", [o["id"] for o in existing]).execute()
+
+    quote_items = (
+        _table("quote_items")
+        .select("*, product_suppliers(supplier_id, cost_price)")
+        .eq("quote_id", quote_id)
+        .execute()
+    )
+    supplier_items: Dict[str, List[Row]] = {}
+    for item in quote_items.data or []:
+        sid = item["product_suppliers"]["supplier_id"]
+        supplier_items.setdefault(sid, []).append(item)
+
+    order_rows = []
+    for supplier_id, items in supplier_items.items():
+        total_cost = sum(
+            i["quantity"] * i["product_suppliers"]["cost_price"] for i in items
+        )
+        total_sell = sum(i["subtotal"] for i in items)
+        order_rows.append(
+            {
+                "quote_id": quote_id,
+                "customer_id": customer_id,
+                "supplier_id": supplier_id,
+                "total_cost": total_cost,
+                "total_sell": total_sell,
+                "profit": total_sell - total_cost,
+                "status": "pending",
+            }
+        )
+
+    orders: List[Row] = []
+    try:
+        if order_rows:
+            orders = _table("orders").insert(order_rows).execute().data
+            order_ids = {o["supplier_id"]: o["id"] for o in orders}
+            _table("order_items").insert(
+                [
+                    {
+                        "order_id": order_ids[supplier_id],
+                        "product_supplier_id": item["product_supplier_id"],
+                        "quantity": item["quantity"],
+                        "cost_price": item["product_suppliers"]["cost_price"],
+                        "sell_price": item["quoted_price"],
+                        "subtotal": item["subtotal"],
+                    }
+                    for supplier_id, items in supplier_items.items()
+                    for item in items
+                ]
+            ).execute()
+    except Exception:
+        if orders:
+            _table("orders").delete().in_("id", [o["id"] for o in orders]).execute()
+        raise
+
+    set_request_status(request_id, "accepted")
+    return [
+        {"id": o["id"], "supplier_id": o["supplier_id"], "status": o["status"]}
+        for o in orders
+    ]
+
+
+# ===== Orders =====
+def count_orders(status: Optional[str] = None) -> int:
+    """Count orders with a HEAD + count=exact request, without fetching rows."""
+    query = _table("orders").select("id", count="exact", head=True)
+    if status:
+        query = query.eq("status", status)
+    return query.execute().count or 0
+
+
+def list_orders_page(
+    page_size: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    status: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    supplier_id: Optional[str] = None,
+) -> Page:
+    query = _table("orders").select(
+        "id, created_at, customer_id, supplier_id, total_sell, profit, status, "
+        "tracking_code, customers(name), suppliers(name)"
+    )
+    for column, value in (
+        ("status", status),
+        ("customer_id", customer_id),
+        ("supplier_id", supplier_id),
+    ):
+        if value:
+            query = query.eq(column, value)
+    return keyset_page(query, page_size, after=after, before=before)
+
+
+def list_customer_orders(customer_id: str) -> List[Row]:
+    result = (
+        _table("orders")
+        .select("*, suppliers(name)")
+        .eq("customer_id", customer_id)
+        .order("created_at", desc=True)
+        .execute()
+    )
+    return result.data or []
+
+
+def get_order(order_id: str) -> Row:
+    result = (
+        _table("orders")
+        .select("*, customers(name, phone), suppliers(name)")
+        .eq("id", order_id)
+        .single()
+        .execute()
+    )
+    return result.data
+
+
+def list_order_items(order_id: str) -> List[Row]:
+    result = (
+        _table("order_items")
+        .select("*, product_suppliers(*, products(name), suppliers(name))")
+        .eq("order_id", order_id)
+        .execute()
+    )
+    return result.data or []
+
+
+def list_order_payments(order_id: str) -> List[Row]:
+    return (
+        _table("customer_payments").select("*").eq("order_id", order_id).execute().data
+        or []
+    )
+
+
+def get_order_with_items(order_id: str) -> Tuple[Row, List[Row]]:
+    """Order header and its items, fetched concurrently."""
+    return tuple(
+        gather(lambda: get_order(order_id), lambda: list_order_items(order_id))
+    )
+
+
+def get_order_detail(order_id: str) -> Tuple[Row, List[Row], List[Row]]:
+    """Order header, items and payments, fetched concurrently."""
+    return tuple(
+        gather(
+            lambda: get_order(order_id),
+            lambda: list_order_items(order_id),
+            lambda: list_order_payments(order_id),
+        )
+    )
+
+
+def add_payment(order_id: str, values: Row) -> Row:
+    return (
+        _table("customer_payments")
+        .insert(dict(values, order_id=order_id))
+        .execute()
+        .data[0]
+    )
+
+
+def get_order_customer_id(order_id: str) -> Optional[str]:
+    result = _table("orders").select("customer_id").eq("id", order_id).execute()
+    return result.data[0]["customer_id"] if result.data else None
+
+
+def update_order(order_id: str, values: Row) -> Optional[Row]:
+    """Update an order and return the updated row (None if not found)."""
+    result = _table("orders").update(values).eq("id", order_id).execute()
+    return result.data[0] if result.data else None
+
+
+# ===== Debt ledger =====
+def list_customer_balances(limit: int = 200) -> List[Row]:
+    """
+    Customers with outstanding debt, largest first (customer_balances).
+    The ledger is closed to the anon key, so it is read with the service key.
+    """
+    result = (
+        db.service_client()
+        .table("customer_balances")
+        .select("customer_id, total_sell, total_paid, debt, updated_at, customers(name, phone)")
+        .gt("debt", 0)
+        .order("debt", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return result.data or []
+
+
+def reconcile_debt_ledger() -> Row:
+    """
+    Rebuild orders.paid_amount and customer_balances from the source rows.
+    The function is only granted to service_role (see the migration).
+    """
+    return db.service_client().rpc("reconcile_debt_ledger", {}).execute().data or {}
+
+
+# ===== Exports =====
+def _iter_export(
+    table: str,
+    columns: str,
+    page_size: int,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None,
+    date_column: str = "created_at",
+) -> Iterator[Row]:
+    """
+    All rows of `table` whose `date_column` falls in [date_from, date_to], one
+    page at a time, newest first. `columns` must include `date_column` and id.
+    """
+    date_end = (date.fromisoformat(date_to) + timedelta(days=1)).isoformat() if date_to else None
+
+    def make_query():
+        query = _table(table).select(columns)
+        if date_from:
+            query = query.gte(date_column, date_from)
+        if date_end:
+            query = query.lt(date_column, date_end)
+        if status:
+            query = query.eq("status", status)
+        return query
+
+    return iter_keyset(make_query, page_size, key=date_column)
+
+
+def iter_orders_export(page_size: int, date_from=None, date_to=None, status=None):
+    return _iter_export(
+        "orders",
+        "id, created_at, completed_at, status, total_cost, total_sell, profit, "
+        "paid_amount, tracking_code, customers(name), suppliers(name)",
+        page_size, date_from, date_to, status,
+    )
+
+
+def iter_order_items_export(page_size: int, date_from=None, date_to=None, status=None):
+    """
+    Items of the orders created in the range. order_items has no timestamp of
+    its own, so the orders are paged by created_at and each page's items are
+    fetched with one in_() query; every item carries its order's created_at.
+    """
+    orders = _iter_export(
+        "orders", "id, created_at, customers(name)", page_size, date_from, date_to
+    )
+    while True:
+        batch = {o["id"]: o for o in islice(orders, page_size)}
+        if not batch:
+            return
+        items = (
+            _table("order_items")
+            .select(
+                "id, order_id, quantity, cost_price, sell_price, subtotal, "
+                "product_suppliers(products(name), suppliers(name))"
+            )
+            .in_("order_id", list(batch))
+            .order("id")
+            .execute()
+            .data
+            or []
+        )
+        by_order = defaultdict(list)
+        for item in items:
+            by_order[item["order_id"]].append(item)
+        for order_id, order in batch.items():
+            for item in by_order[order_id]:
+                item["created_at"] = order["created_at"]
+                item["orders"] = {"customers": order.get("customers")}
+                yield item
+
+
+def iter_payments_export(page_size: int, date_from=None, date_to=None, status=None):
+    return _iter_export(
+        "customer_payments",
+        "id, paid_at, order_id, amount, payment_method, note, orders(customers(name))",
+        page_size, date_from, date_to,
+        date_column="paid_at",
+    )
+
+
+def iter_quotes_export(page_size: int, date_from=None, date_to=None, status=None):
+    return _iter_export(
+        "quotes",
+        "id, created_at, request_id, status, total_amount, requests(customers(name))",
+        page_size, date_from, date_to, status,
+    )
+
+
+# ===== Statistics =====
+def get_statistics(date_from: Optional[str] = None, date_to: Optional[str] = None) -> Row:
+    """Totals and per-month series from the admin_statistics RPC."""
+    result = db.supabase.rpc(
+        "admin_statistics", {"p_from": date_from or None, "p_to": date_to or None}
+    ).execute()
+    return result.data or {}
@@ -0,0 +1,257 @@
+"""
+Failure handling around every Supabase call.
+
+`ResilientClient` wraps the supabase client (or the fake) in models/db.py:
+
+- Every .execute() passes through a per-process circuit breaker. After
+  DB_BREAKER_FAILURES consecutive transient failures (network errors,
+  timeouts, 5xx / PostgREST connection errors) it opens, and calls fail at
+  once with CircuitOpenError for DB_BREAKER_RESET seconds. Then a single
+  probe call is let through: success closes it, failure opens it again.
+- Reads (select / count and read-only RPCs) are retried up to DB_READ_RETRIES
+  times with full-jitter backoff, but only while the retry budget has tokens:
+  each call adds DB_RETRY_BUDGET_RATIO of a token and each retry spends one,
+  so retries stay a fraction of traffic and can't pile onto an outage. A
+  retry is also only started if another DB_READ_TIMEOUT still fits within
+  DB_READ_DEADLINE of the first attempt, so a read gives up before the
+  DB_FANOUT_TIMEOUT of a concurrent group (models/concurrency.py) runs out.
+  Writes are never retried here (the HTTP transport only retries failed
+  connection attempts, which never reached the server). postgrest-py's own
+  retry of reads is turned off on every wrapped query.
+- Auth calls go through the breaker without retries.
+
+Per-call timeouts are set by method on the HTTP transport (models/http.py).
+Transient failures surface as ServiceUnavailable, which app.py answers with
+503; other errors (not found, constraint violations) pass through as they are.
+"""
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthRetryableError
+
+from config import Config
+
+# RPCs that only read, so they may be retried like selects
+READ_ONLY_RPCS = {"admin_statistics"}
+
+_WRITE_VERBS = {"insert", "update", "upsert", "delete"}
+_TRANSIENT_CODES = {"502", "503", "504", "57014", "PGRST000", "PGRST001", "PGRST002"}
+
+
+class ServiceUnavailable(Exception):
+    """The data service did not answer (after retries, if the call allowed them)."""
+
+    MESSAGE = "Hệ thống dữ liệu tạm thời không phản hồi, vui lòng thử lại sau."
+
+    def __init__(self, message: str = MESSAGE, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ServiceUnavailable):
+    """Failed fast: the circuit breaker is open."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (httpx.TransportError, AuthRetryableError, ServiceUnavailable)):
+        return True
+    if isinstance(exc, APIError):
+        return str(exc.code) in _TRANSIENT_CODES
+    return False
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining > 0:
+                raise CircuitOpenError(retry_after=remaining)
+            if self._probing:
+                raise CircuitOpenError(retry_after=1)
+            self.state = self.HALF_OPEN
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+class RetryBudget:
+    """Token bucket: calls deposit `ratio` tokens, retries withdraw one."""
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Policy:
+    """Breaker + retry budget shared by all clients of a process."""
+
+    def __init__(self, breaker: CircuitBreaker, budget: RetryBudget,
+                 retries: int, backoff: float, sleep: Callable[[float], None] = time.sleep,
+                 deadline: Optional[float] = None, attempt_timeout: float = 0):
+        self.breaker = breaker
+        self.budget = budget
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+
+    def _retry_fits(self, started: float, delay: float) -> bool:
+        if self.deadline is None:
+            return True
+        elapsed = time.monotonic() - started
+        return elapsed + delay + self.attempt_timeout <= self.deadline
+
+    def call(self, fn: Callable, idempotent: bool):
+        self.budget.deposit()
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()  # the service answered
+                    raise
+                self.breaker.record_failure()
+                # Full jitter: uniform in [0, backoff * 2^attempt]
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if not (
+                    idempotent
+                    and attempt < self.retries
+                    and self._retry_fits(started, delay)
+                    and self.budget.withdraw()
+                ):
+                    if isinstance(e, ServiceUnavailable):
+                        raise
+                    raise ServiceUnavailable() from e
+                self.sleep(delay)
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+
+policy = Policy(
+    CircuitBreaker(Config.DB_BREAKER_FAILURES, Config.DB_BREAKER_RESET),
+    RetryBudget(Config.DB_RETRY_BUDGET_RATIO, Config.DB_RETRY_BUDGET_MAX),
+    retries=Config.DB_READ_RETRIES,
+    backoff=Config.DB_RETRY_BACKOFF,
+    deadline=Config.DB_READ_DEADLINE,
+    attempt_timeout=Config.DB_READ_TIMEOUT,
+)
+
+
+class _Query:
+    """Proxy over a query builder: chains stay wrapped, execute() is guarded."""
+
+    def __init__(self, builder, idempotent: bool, policy: Policy):
+        # postgrest-py retries GET/HEAD on 503/520 inside execute() with fixed
+        # sleeps, outside the budget and deadline; turned off so that every
+        # HTTP attempt is one attempt of the policy
+        if hasattr(builder, "retry"):
+            builder.retry(False)
+        self._builder = builder
+        self._idempotent = idempotent
+        self._policy = policy
+
+    def execute(self):
+        return self._policy.call(self._builder.execute, self._idempotent)
+
+    def _wrap(self, name, result):
+        if hasattr(result, "execute"):
+            idempotent = self._idempotent and name not in _WRITE_VERBS
+            return _Query(result, idempotent, self._policy)
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return self._wrap(name, attr)  # e.g. the `not_` property
+        return lambda *args, **kwargs: self._wrap(name, attr(*args, **kwargs))
+
+
+class _Auth:
+    """Proxy over client.auth: each method call goes through the breaker."""
+
+    def __init__(self, auth, policy: Policy):
+        self._auth = auth
+        self._policy = policy
+
+    def __getattr__(self, name):
+        attr = getattr(self._auth, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self._policy.call(
+            lambda: attr(*args, **kwargs), idempotent=False
+        )
+
+
+class ResilientClient:
+    """The supabase client API (table / rpc / auth) with the policy applied."""
+
+    def __init__(self, client, policy: Policy = policy):
+        self._client = client
+        self._policy = policy
+        self.auth = _Auth(client.auth, policy)
+
+    def table(self, name):
+        # Reads until a write verb is chained (see _Query)
+        return _Query(self._client.table(name), True, self._policy)
+
+    def rpc(self, name, params=None, **kwargs):
+        return _Query(
+            self._client.rpc(name, params, **kwargs), name in READ_ONLY_RPCS, self._policy
+        )
+
+    def __getattr__(self, name):
+        # Anything else (e.g. the fake's tables / seed / reset) is passed through
+        return getattr(self._client, name)
@@ -0,0 +1,43 @@
+"""
+Background job handlers (see models/jobs.py).
+
+Each handler receives the JSON payload given to `jobs.enqueue` and may run
+more than once for the same payload, so it must be idempotent.
+"""
+from models import events, jobs, repository
+from models.dashboard import invalidate_dashboard
+
+QUOTE_ORDERS = "quote_orders"
+
+
+def _reopen_quote(payload: dict) -> None:
+    """All attempts failed: let the customer accept the quote again."""
+    repository.reopen_quote(payload["quote_id"])
+    invalidate_dashboard(payload["customer_id"])
+    events.publish(payload["customer_id"], "resync", {})
+
+
+@jobs.handler(QUOTE_ORDERS, max_attempts=5, on_dead=_reopen_quote)
+def create_quote_orders(payload: dict) -> None:
+    customer_id = payload["customer_id"]
+    orders = repository.create_quote_orders(
+        payload["quote_id"],
+        payload["request_id"],
+        customer_id,
+        before_rebuild=jobs.check_lease,
+    )
+    invalidate_dashboard(customer_id)
+    for order in orders:
+        events.publish(
+            customer_id,
+            "order",
+            {"order_id": order["id"], "status": order["status"], "tracking_code": None},
+        )
+
+
+def enqueue_quote_orders(quote_id: str, request_id: str, customer_id: str) -> int:
+    return jobs.enqueue(
+        QUOTE_ORDERS,
+        {"quote_id": quote_id, "request_id": request_id, "customer_id": customer_id},
+        key=f"{QUOTE_ORDERS}:{quote_id}",
+    )
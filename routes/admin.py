@@ -1,8 +1,13 @@
+import io
 from datetime import datetime
 
 from flask import (
     Blueprint,
+    Response,
+    abort,
+    current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -11,45 +16,57 @@ from flask import (
 )
 
 from decorators import admin_required
-from models.db import supabase
+from models import events, exports, importer, repository
+from models.catalog import (
+    best_offer,
+    catalog_cache,
+    invalidate_catalog,
+    invalidate_offers,
+    list_suppliers,
+    offers_for,
+)
+from models.dashboard import invalidate_dashboard
+from models.resilience import ServiceUnavailable
 
 bp = Blueprint("admin", __name__)
 
 
+def _page(list_page, **filters):
+    """Trang hiện tại của một danh sách theo tham số ?after= / ?before=."""
+    try:
+        return list_page(
+            current_app.config["PAGE_SIZE"],
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            **filters,
+        )
+    except ValueError:
+        abort(400)
+
+
 @bp.route("/dashboard")
 @admin_required
 def dashboard():
-    orders = supabase.table("orders").select("*").execute()
-    data = orders.data or []
-    total_orders = len(data)
-    pending = len([o for o in data if o.get("status") == "pending"])
-    completed = len([o for o in data if o.get("status") == "completed"])
-
     return render_template(
         "admin/dashboard.html",
-        total_orders=total_orders,
-        pending=pending,
-        completed=completed,
+        total_orders=repository.count_orders(),
+        pending=repository.count_orders("pending"),
+        completed=repository.count_orders("completed"),
     )
 
 
 @bp.route("/suppliers")
 @admin_required
 def suppliers():
-    data = (
-        supabase.table("suppliers")
-        .select("*")
-        .order("created_at", desc=True)
-        .execute()
-    )
-    return render_template("admin/suppliers.html", suppliers=data.data or [])
+    page = _page(repository.list_suppliers_page)
+    return render_template("admin/suppliers.html", suppliers=page.rows, page=page)
 
 
 @bp.route("/suppliers/add", methods=["GET", "POST"])
 @admin_required
 def add_supplier():
     if request.method == "POST":
-        supabase.table("suppliers").insert(
+        repository.create_supplier(
             {
                 "name": request.form.get("name"),
                 "contact_person": request.form.get("contact_person"),
@@ -57,7 +74,8 @@ def add_supplier():
                 "email": request.form.get("email"),
                 "address": request.form.get("address"),
             }
-        ).execute()
+        )
+        invalidate_catalog("suppliers")
         flash("Thêm nhà cung cấp thành công", "success")
         return redirect(url_for("admin.suppliers"))
     return render_template("admin/supplier_form.html")
@@ -66,51 +84,92 @@ def add_supplier():
 @bp.route("/products")
 @admin_required
 def products():
-    data = supabase.table("products").select("*").execute()
-    return render_template("admin/products.html", products=data.data or [])
+    page = _page(repository.list_products_page)
+    return render_template("admin/products.html", products=page.rows, page=page)
 
 
 @bp.route("/products/add", methods=["GET", "POST"])
 @admin_required
 def add_product():
     if request.method == "POST":
-        supabase.table("products").insert(
+        repository.create_product(
             {
                 "name": request.form.get("name"),
                 "description": request.form.get("description"),
                 "category": request.form.get("category"),
             }
-        ).execute()
+        )
+        invalidate_catalog("products")
         flash("Thêm sản phẩm thành công", "success")
         return redirect(url_for("admin.products"))
     return render_template("admin/product_form.html")
 
 
+@bp.route("/products/import", methods=["GET", "POST"])
+@admin_required
+def import_prices():
+    """
+    Nhập hàng loạt sản phẩm, nhà cung cấp và giá từ file CSV. File được đọc
+    dạng stream và ghi theo từng lô (xem models/importer.py).
+    """
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Vui lòng chọn file CSV", "error")
+            return redirect(url_for("admin.import_prices"))
+
+        lines = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        try:
+            report = importer.import_price_list(
+                lines, current_app.config["IMPORT_CHUNK_SIZE"]
+            )
+        except UnicodeDecodeError:
+            flash("File CSV phải được lưu với mã hóa UTF-8", "error")
+            return redirect(url_for("admin.import_prices"))
+        except (ValueError, ServiceUnavailable) as e:
+            # Thiếu cột bắt buộc, hoặc Supabase không phản hồi
+            flash(str(e), "error")
+            return redirect(url_for("admin.import_prices"))
+        except Exception:
+            current_app.logger.exception("Price list import failed")
+            flash("Nhập file thất bại, vui lòng thử lại sau.", "error")
+            return redirect(url_for("admin.import_prices"))
+        finally:
+            invalidate_catalog()
+
+        flash(
+            f"Đã xử lý {report.rows} dòng, {report.error_count} dòng lỗi",
+            "success" if not report.error_count else "warning",
+        )
+    return render_template("admin/import.html", report=report)
+
+
 @bp.route("/products/<product_id>/suppliers", methods=["GET", "POST"])
 @admin_required
 def product_suppliers(product_id):
     if request.method == "POST":
-        supabase.table("product_suppliers").insert(
+        try:
+            cost_price = float(request.form.get("cost_price", 0))
+            sell_price = float(request.form.get("sell_price", 0))
+        except ValueError:
+            flash("Giá vốn và giá bán phải là số", "error")
+            return redirect(url_for("admin.product_suppliers", product_id=product_id))
+        repository.add_product_supplier(
             {
                 "product_id": product_id,
                 "supplier_id": request.form.get("supplier_id"),
-                "cost_price": request.form.get("cost_price"),
-                "sell_price": request.form.get("sell_price"),
+                "cost_price": cost_price,
+                "sell_price": sell_price,
             }
-        ).execute()
+        )
+        invalidate_offers(product_id)
         flash("Thêm nhà cung cấp cho sản phẩm thành công", "success")
-    ps = (
-        supabase.table("product_suppliers")
-        .select("*, suppliers(name)")
-        .eq("product_id", product_id)
-        .execute()
-    )
-    suppliers = supabase.table("suppliers").select("*").execute()
 
     return render_template(
         "admin/product_suppliers.html",
-        product_suppliers=ps.data or [],
-        suppliers=suppliers.data or [],
+        product_suppliers=repository.list_product_suppliers(product_id),
+        suppliers=list_suppliers(),
         product_id=product_id,
     )
 
@@ -118,43 +177,51 @@ def product_suppliers(product_id):
 @bp.route("/requests")
 @admin_required
 def requests():
-    data = (
-        supabase.table("requests")
-        .select("*, customers(name, phone)")
-        .order("created_at", desc=True)
-        .execute()
+    status = request.args.get("status", "")
+    page = _page(repository.list_requests_page, status=status)
+    return render_template(
+        "admin/requests.html", requests=page.rows, page=page, status=status
     )
-    return render_template("admin/requests.html", requests=data.data or [])
 
 
 @bp.route("/requests/<request_id>")
 @admin_required
 def request_detail(request_id):
-    req = (
-        supabase.table("requests")
-        .select("*, customers(name, phone, address)")
-        .eq("id", request_id)
-        .single()
-        .execute()
-    )
-    items = (
-        supabase.table("request_items")
-        .select("*, products(name, category)")
-        .eq("request_id", request_id)
-        .execute()
-    )
-    quotes = (
-        supabase.table("quotes").select("*").eq("request_id", request_id).execute()
-    )
+    req, items, quotes = repository.get_request_detail(request_id)
     return render_template(
         "admin/request_detail.html",
-        request=req.data,
-        items=items.data or [],
-        quotes=quotes.data or [],
+        request=req,
+        items=items,
+        quotes=quotes,
     )
 
 
 # ===== QUOTES (Admin báo giá) =====
+def _parse_quote_lines(form):
+    """
+    Tính toàn bộ dòng báo giá từ form trong bộ nhớ trước khi ghi.
+    ValueError (thông báo tiếng Việt) nếu số lượng / đơn giá không hợp lệ.
+    """
+    lines = []
+    for key in form:
+        if key.startswith("product_supplier_"):
+            product_id = key.split("_")[2]
+            try:
+                quantity = int(form.get(f"quantity_{product_id}", 0))
+                price = float(form.get(f"price_{product_id}", 0))
+            except ValueError:
+                raise ValueError("Số lượng và đơn giá phải là số") from None
+            lines.append(
+                {
+                    "product_supplier_id": form[key],
+                    "quantity": quantity,
+                    "quoted_price": price,
+                    "subtotal": quantity * price,
+                }
+            )
+    return lines
+
+
 @bp.route("/requests/<request_id>/quote", methods=["GET", "POST"])
 @admin_required
 def create_quote(request_id):
@@ -163,105 +230,64 @@ def create_quote(request_id):
     Logic form theo đặc tả: product_supplier_<product_id>, quantity_<id>, price_<id>.
     """
     if request.method == "POST":
-        # Tạo quote trước với total_amount tạm thời = 0
-        quote = (
-            supabase.table("quotes")
-            .insert(
-                {
-                    "request_id": request_id,
-                    "admin_id": session["user"],
-                    "status": "sent",
-                    "total_amount": 0,
-                }
+        try:
+            lines = _parse_quote_lines(request.form)
+            quote_id, customer_id = repository.create_quote_with_items(
+                request_id, session["user"], lines
             )
-            .execute()
+        except (ValueError, ServiceUnavailable) as e:
+            # Thông báo đã được viết cho người dùng
+            flash(str(e), "error")
+            return redirect(url_for("admin.create_quote", request_id=request_id))
+        except Exception:
+            current_app.logger.exception("Creating quote for %s failed", request_id)
+            flash("Không thể lưu báo giá, vui lòng thử lại sau.", "error")
+            return redirect(url_for("admin.create_quote", request_id=request_id))
+
+        invalidate_dashboard(customer_id)
+        events.publish(
+            customer_id, "quote", {"request_id": request_id, "quote_id": quote_id}
         )
-        quote_id = quote.data[0]["id"]
-        total = 0
-        for key in request.form:
-            if key.startswith("product_supplier_"):
-                product_id = key.split("_")[2]
-                ps_id = request.form[key]
-                quantity = int(request.form.get(f"quantity_{product_id}", 0))
-                price = float(request.form.get(f"price_{product_id}", 0))
-                subtotal = quantity * price
-                total += subtotal
-
-                supabase.table("quote_items").insert(
-                    {
-                        "quote_id": quote_id,
-                        "product_supplier_id": ps_id,
-                        "quantity": quantity,
-                        "quoted_price": price,
-                        "subtotal": subtotal,
-                    }
-                ).execute()
-        supabase.table("quotes").update({"total_amount": total}).eq(
-            "id", quote_id
-        ).execute()
-        supabase.table("requests").update({"status": "quoted"}).eq(
-            "id", request_id
-        ).execute()
 
         flash("Báo giá thành công", "success")
         return redirect(url_for("admin.requests"))
-    req_items = (
-        supabase.table("request_items")
-        .select("*, products(id, name)")
-        .eq("request_id", request_id)
-        .execute()
-    )
 
+    # Nhà cung cấp lấy từ giá đã cache của các sản phẩm trong yêu cầu, điền sẵn
+    # lựa chọn tốt nhất theo ?strategy=cheapest (rẻ nhất, mặc định) hoặc margin
+    # (lãi cao nhất)
+    strategy = "margin" if request.args.get("strategy") == "margin" else "cheapest"
+    items = repository.list_request_items(request_id)
+    index = offers_for({item["products"]["id"] for item in items})
     items_with_suppliers = []
-    for item in req_items.data or []:
-        ps = (
-            supabase.table("product_suppliers")
-            .select("*, suppliers(name)")
-            .eq("product_id", item["products"]["id"])
-            .eq("is_active", True)
-            .execute()
+    for item in items:
+        offers = index.get(item["products"]["id"], [])
+        items_with_suppliers.append(
+            {"item": item, "suppliers": offers, "best": best_offer(offers, strategy)}
         )
-        items_with_suppliers.append({"item": item, "suppliers": ps.data or []})
 
     return render_template(
         "admin/quote_form.html",
         request_id=request_id,
         items=items_with_suppliers,
+        strategy=strategy,
     )
 
 
 @bp.route("/quotes")
 @admin_required
 def quotes_list():
-    data = (
-        supabase.table("quotes")
-        .select("*, requests(customer_id)")
-        .order("created_at", desc=True)
-        .execute()
-    )
-    return render_template("admin/quotes.html", quotes=data.data or [])
+    page = _page(repository.list_quotes_page)
+    return render_template("admin/quotes.html", quotes=page.rows, page=page)
 
 
 @bp.route("/quotes/<quote_id>")
 @admin_required
 def quote_detail(quote_id):
-    quote = (
-        supabase.table("quotes")
-        .select("*, requests(*, customers(name, phone))")
-        .eq("id", quote_id)
-        .single()
-        .execute()
-    )
-    items = (
-        supabase.table("quote_items")
-        .select("*, product_suppliers(*, products(name), suppliers(name))")
-        .eq("quote_id", quote_id)
-        .execute()
-    )
+    quote, items = repository.get_quote_with_items(quote_id)
     return render_template(
         "admin/quote_detail.html",
-        quote=quote.data,
-        items=items.data or [],
+        quote=quote,
+        items=items,
     )
 
 
@@ -269,65 +295,63 @@ def quote_detail(quote_id):
 @bp.route("/orders")
 @admin_required
 def orders():
-    """Danh sách đơn hàng."""
-    data = (
-        supabase.table("orders")
-        .select("*, customers(name), suppliers(name)")
-        .order("created_at", desc=True)
-        .execute()
+    """Danh sách đơn hàng, lọc theo trạng thái / khách hàng / nhà cung cấp."""
+    filters = {
+        "status": request.args.get("status", ""),
+        "customer_id": request.args.get("customer_id", ""),
+        "supplier_id": request.args.get("supplier_id", ""),
+    }
+    page = _page(repository.list_orders_page, **filters)
+    return render_template(
+        "admin/orders.html", orders=page.rows, page=page, filters=filters
     )
-    return render_template("admin/orders.html", orders=data.data or [])
 
 
 @bp.route("/orders/<order_id>")
 @admin_required
 def order_detail(order_id):
-    order = (
-        supabase.table("orders")
-        .select("*, customers(name, phone), suppliers(name)")
-        .eq("id", order_id)
-        .single()
-        .execute()
-    )
-    items = (
-        supabase.table("order_items")
-        .select("*, product_suppliers(*, products(name), suppliers(name))")
-        .eq("order_id", order_id)
-        .execute()
-    )
-    payments = (
-        supabase.table("customer_payments")
-        .select("*")
-        .eq("order_id", order_id)
-        .execute()
-    )
-    total_paid = sum(p["amount"] for p in (payments.data or []))
-    remaining = (order.data.get("total_sell") or 0) - total_paid
+    order, items, payments = repository.get_order_detail(order_id)
+    # Số đã thanh toán lấy từ sổ công nợ (orders.paid_amount), không cộng lại
+    total_paid = order.get("paid_amount") or 0
+    remaining = (order.get("total_sell") or 0) - total_paid
 
     return render_template(
         "admin/order_detail.html",
-        order=order.data,
-        items=items.data or [],
-        payments=payments.data or [],
+        order=order,
+        items=items,
+        payments=payments,
         total_paid=total_paid,
         remaining=remaining,
     )
 
 
 # ===== PAYMENTS & STATUS =====
+def _order_event(order):
+    """Dữ liệu gửi tới trang của khách hàng khi đơn hàng thay đổi."""
+    return {
+        "order_id": order["id"],
+        "status": order.get("status"),
+        "tracking_code": order.get("tracking_code"),
+    }
+
+
 @bp.route("/orders/<order_id>/payment", methods=["POST"])
 @admin_required
 def add_payment(order_id):
     """Ghi nhận thanh toán từ khách hàng cho đơn hàng."""
-    supabase.table("customer_payments").insert(
+    amount = float(request.form.get("amount", 0))
+    repository.add_payment(
+        order_id,
         {
-            "order_id": order_id,
-            "amount": float(request.form.get("amount", 0)),
+            "amount": amount,
             "payment_method": request.form.get("payment_method"),
             "note": request.form.get("note", ""),
             "created_by": session["user"],
-        }
-    ).execute()
+        },
+    )
+    customer_id = repository.get_order_customer_id(order_id)
+    invalidate_dashboard(customer_id)
+    events.publish(customer_id, "payment", {"order_id": order_id, "amount": amount})
 
     flash("Ghi nhận thanh toán thành công", "success")
     return redirect(url_for("admin.order_detail", order_id=order_id))
@@ -342,7 +366,10 @@ def update_order_status(order_id):
     if status == "completed":
         data["completed_at"] = datetime.utcnow().isoformat()
 
-    supabase.table("orders").update(data).eq("id", order_id).execute()
+    order = repository.update_order(order_id, data)
+    if order:
+        invalidate_dashboard(order["customer_id"])
+        events.publish(order["customer_id"], "order", _order_event(order))
     flash("Cập nhật trạng thái thành công", "success")
     return redirect(url_for("admin.order_detail", order_id=order_id))
 
@@ -352,46 +379,101 @@ def update_order_status(order_id):
 def update_tracking(order_id):
     """Cập nhật mã vận chuyển và chuyển trạng thái sang shipping."""
     tracking_code = request.form.get("tracking_code")
-    supabase.table("orders").update(
-        {"tracking_code": tracking_code, "status": "shipping"}
-    ).eq("id", order_id).execute()
+    order = repository.update_order(
+        order_id, {"tracking_code": tracking_code, "status": "shipping"}
+    )
+    if order:
+        invalidate_dashboard(order["customer_id"])
+        events.publish(order["customer_id"], "order", _order_event(order))
 
     flash("Cập nhật mã vận chuyển thành công", "success")
     return redirect(url_for("admin.order_detail", order_id=order_id))
 
 
+@bp.route("/export")
+@admin_required
+def export_data():
+    """
+    Xuất orders / order_items / payments / quotes dạng CSV hoặc XLSX, lọc theo
+    ?from= / ?to= (YYYY-MM-DD) và ?status=. Dữ liệu được đọc từng trang và
+    stream ra ngay nên không nạp toàn bộ vào bộ nhớ.
+    """
+    name = request.args.get("dataset", "orders")
+    dataset = exports.DATASETS.get(name)
+    fmt = request.args.get("format", "csv")
+    if dataset is None or fmt not in ("csv", "xlsx"):
+        abort(404)
+
+    date_from = request.args.get("from", "").strip()
+    date_to = request.args.get("to", "").strip()
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        abort(400)
+
+    if fmt == "xlsx" and not exports.XLSX_AVAILABLE:
+        flash("Xuất XLSX cần cài thêm thư viện openpyxl", "error")
+        return redirect(url_for("admin.orders"))
+
+    rows = dataset.rows(
+        current_app.config["EXPORT_PAGE_SIZE"],
+        date_from=date_from or None,
+        date_to=date_to or None,
+        status=(request.args.get("status") or None) if dataset.has_status else None,
+    )
+    if fmt == "csv":
+        body = exports.csv_chunks(dataset.columns, rows)
+        mimetype = "text/csv; charset=utf-8"
+    else:
+        body = exports.xlsx_chunks(dataset.columns, rows)
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    filename = f"{name}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    response = Response(body, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@bp.route("/cache-stats")
+@admin_required
+def cache_stats():
+    """Số lần hit/miss của cache danh mục trong worker hiện tại."""
+    return jsonify(catalog_cache.stats())
+
+
+@bp.route("/debts")
+@admin_required
+def debts():
+    """Công nợ theo khách hàng, đọc trực tiếp từ sổ customer_balances."""
+    return render_template("admin/debts.html", balances=repository.list_customer_balances())
+
+
 @bp.route("/statistics")
 @admin_required
 def statistics():
     """Trang thống kê doanh thu, lợi nhuận, công nợ khách hàng."""
-    # Doanh thu & lợi nhuận từ đơn đã hoàn thành
-    orders = (
-        supabase.table("orders")
-        .select("total_sell, total_cost, profit, status")
-        .eq("status", "completed")
-        .execute()
-    )
-    total_revenue = sum(o["total_sell"] for o in (orders.data or []))
-    total_profit = sum(o["profit"] for o in (orders.data or []))
-
-    # Công nợ khách hàng
-    all_orders = supabase.table("orders").select("id, total_sell").execute()
-    all_payments = supabase.table("customer_payments").select(
-        "order_id, amount"
-    ).execute()
-
-    payments_dict = {}
-    for p in all_payments.data or []:
-        payments_dict[p["order_id"]] = payments_dict.get(p["order_id"], 0) + p["amount"]
-
-    total_debt = sum(
-        o["total_sell"] - payments_dict.get(o["id"], 0)
-        for o in (all_orders.data or [])
-    )
+    # Khoảng ngày tuỳ chọn: ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    date_from = request.args.get("from", "").strip()
+    date_to = request.args.get("to", "").strip()
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        flash("Ngày không hợp lệ, hiển thị toàn bộ dữ liệu", "error")
+        date_from = date_to = ""
+
+    # Tổng hợp trong Postgres (xem supabase/migrations), chỉ nhận về một dòng
+    stats = repository.get_statistics(date_from, date_to)
 
     return render_template(
         "admin/statistics.html",
-        total_revenue=total_revenue,
-        total_profit=total_profit,
-        total_debt=total_debt,
+        total_revenue=stats.get("total_revenue", 0),
+        total_profit=stats.get("total_profit", 0),
+        total_debt=stats.get("total_debt", 0),
+        months=stats.get("months", []),
+        date_from=date_from,
+        date_to=date_to,
     )
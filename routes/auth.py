@@ -1,12 +1,42 @@
 from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
-import requests
+
+from supabase_auth.errors import AuthApiError
 
 from config import Config
-from models.db import get_user_role, supabase
+from models.db import resolve_user, supabase, user_client
+from models.http import http_client
+from models.resilience import ServiceUnavailable
 
 bp = Blueprint("auth", __name__)
 
 
+def _start_session(user_id, email, role, customer_id):
+    """Lưu role và customer_id vào session một lần khi đăng nhập."""
+    session["user"] = user_id
+    session["email"] = email
+    session["role"] = role
+    if customer_id:
+        session["customer_id"] = customer_id
+    else:
+        session.pop("customer_id", None)
+
+
+def _ensure_customer(user):
+    """Trả về customers.id của người dùng OAuth, tạo mới nếu chưa có."""
+    existing = supabase.table("customers").select("id").eq("user_id", user.id).execute()
+    if existing.data:
+        return existing.data[0]["id"]
+    metadata = user.user_metadata or {}
+    name = metadata.get("full_name") or metadata.get("name") or user.email.split("@")[0]
+    created = supabase.table("customers").insert({
+        "user_id": user.id,
+        "name": name,
+        "email": user.email,
+        "phone": metadata.get("phone", ""),
+    }).execute()
+    return created.data[0]["id"]
+
+
 @bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -14,21 +44,30 @@ def login():
         password = request.form.get("password", "")
 
         try:
-            auth_response = supabase.auth.sign_in_with_password(
+            auth_response = user_client().auth.sign_in_with_password(
                 {"email": email, "password": password}
             )
 
             user = auth_response.user
-            session["user"] = user.id
-            session["email"] = email
-            session["role"] = get_user_role(user.id)
+            role, customer_id = resolve_user(user.id)
+            _start_session(user.id, email, role, customer_id)
 
             if session["role"] == "admin":
                 return redirect(url_for("admin.dashboard"))
             return redirect(url_for("customer.dashboard"))
 
+        except AuthApiError as e:
+            # Chỉ lỗi 4xx từ Supabase Auth mới là sai thông tin đăng nhập
+            if e.status and 400 <= e.status < 500:
+                flash("Email hoặc mật khẩu không đúng", "error")
+            else:
+                current_app.logger.exception("Login failed")
+                flash(ServiceUnavailable.MESSAGE, "error")
+        except ServiceUnavailable as e:
+            flash(str(e), "error")
         except Exception:
-            flash("Email hoặc mật khẩu không đúng", "error")
+            current_app.logger.exception("Login failed")
+            flash("Đăng nhập thất bại, vui lòng thử lại sau.", "error")
 
     return render_template("auth.html", mode="login")
 
@@ -42,7 +81,7 @@ def register():
         phone = request.form.get("phone", "").strip()
 
         try:
-            auth_response = supabase.auth.sign_up(
+            auth_response = user_client().auth.sign_up(
                 {"email": email, "password": password}
             )
 
@@ -113,8 +152,7 @@ def reset_password():
             return redirect(url_for("auth.forgot_password"))
 
         try:
-            from supabase import create_client
-            temp_client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+            temp_client = user_client()
             temp_client.auth.set_session(
                 access_token=access_token, refresh_token=refresh_token
             )
@@ -166,8 +204,7 @@ def oauth_callback():
     code = request.args.get('code')
     if code:
         try:
-            print(f"DEBUG: Processing code in callback: {code}")
-            
+            client = user_client()
             # Exchange code using REST API directly
             exchange_url = f"{Config.SUPABASE_URL}/auth/v1/token?grant_type=authorization_code"
             headers = {
@@ -181,10 +218,9 @@ def oauth_callback():
                 "redirect_uri": redirect_uri
             }
             
-            print(f"DEBUG: Exchanging code via REST API")
-            response = requests.post(exchange_url, headers=headers, data=data)
-            print(f"DEBUG: Response status: {response.status_code}")
-            print(f"DEBUG: Response: {response.text}")
+            response = http_client.post(exchange_url, headers=headers, data=data)
+            # Không ghi log nội dung phản hồi: có chứa access/refresh token
+            current_app.logger.debug("OAuth code exchange: HTTP %s", response.status_code)
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -193,56 +229,42 @@ def oauth_callback():
                 
                 if access_token:
                     # Set session and get user
-                    supabase.auth.set_session(
+                    client.auth.set_session(
                         access_token=access_token,
                         refresh_token=refresh_token
                     )
-                    user_response = supabase.auth.get_user()
+                    user_response = client.auth.get_user()
                     user = user_response.user
                 else:
                     # Fallback to client-side handling
                     return render_template("auth.html", mode="oauth_callback")
             else:
                 # Fallback to client-side handling if REST API fails
-                print(f"DEBUG: REST API exchange failed, trying client method")
-                auth_response = supabase.auth.exchange_code_for_session({"auth_code": code})
+                current_app.logger.debug("OAuth REST exchange failed, trying client method")
+                auth_response = client.auth.exchange_code_for_session({"auth_code": code})
                 
                 if hasattr(auth_response, 'user') and auth_response.user:
                     user = auth_response.user
                 elif hasattr(auth_response, 'session') and auth_response.session:
-                    supabase.auth.set_session(
+                    client.auth.set_session(
                         access_token=auth_response.session.access_token,
                         refresh_token=auth_response.session.refresh_token
                     )
-                    user_response = supabase.auth.get_user()
+                    user_response = client.auth.get_user()
                     user = user_response.user
                 else:
                     # Fallback to client-side handling
                     return render_template("auth.html", mode="oauth_callback")
             
             # Check/create customer
-            existing = supabase.table("customers").select("id").eq("user_id", user.id).execute()
-            if not existing.data:
-                metadata = user.user_metadata or {}
-                name = metadata.get("full_name") or metadata.get("name") or user.email.split("@")[0]
-                supabase.table("customers").insert({
-                    "user_id": user.id,
-                    "name": name,
-                    "email": user.email,
-                    "phone": metadata.get("phone", ""),
-                }).execute()
-
-            session["user"] = user.id
-            session["email"] = user.email
-            session["role"] = get_user_role(user.id)
+            customer_id = _ensure_customer(user)
+            _start_session(user.id, user.email, "customer", customer_id)
 
             flash("Đăng nhập thành công!", "success")
             return redirect(url_for("admin.dashboard") if session["role"] == "admin" else url_for("customer.dashboard"))
             
-        except Exception as e:
-            import traceback
-            print(f"DEBUG: Error in callback: {e}")
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        except Exception:
+            current_app.logger.exception("OAuth callback failed")
             # Fallback to client-side handling
             return render_template("auth.html", mode="oauth_callback")
     
@@ -261,21 +283,20 @@ def oauth_complete():
     refresh_token = request.form.get("refresh_token")
 
     try:
+        client = user_client()
         # Case 1: PKCE flow - exchange code for session
         if code:
-            print(f"DEBUG: Exchanging code: {code}")
-            auth_response = supabase.auth.exchange_code_for_session({"auth_code": code})
-            print(f"DEBUG: Exchange response: {auth_response}")
+            auth_response = client.auth.exchange_code_for_session({"auth_code": code})
             
             if hasattr(auth_response, 'user') and auth_response.user:
                 user = auth_response.user
             elif hasattr(auth_response, 'session') and auth_response.session:
                 # If response has session, set it and get user
-                supabase.auth.set_session(
+                client.auth.set_session(
                     access_token=auth_response.session.access_token,
                     refresh_token=auth_response.session.refresh_token
                 )
-                user_response = supabase.auth.get_user()
+                user_response = client.auth.get_user()
                 user = user_response.user
             else:
                 flash("Xác thực thất bại: không nhận được thông tin người dùng", "error")
@@ -283,7 +304,7 @@ def oauth_complete():
         
         # Case 2: Implicit flow - use tokens directly
         elif access_token:
-            auth_response = supabase.auth.set_session(
+            auth_response = client.auth.set_session(
                 access_token=access_token,
                 refresh_token=refresh_token
             )
@@ -293,28 +314,14 @@ def oauth_complete():
             return redirect(url_for("auth.login"))
 
         # Check/create customer
-        existing = supabase.table("customers").select("id").eq("user_id", user.id).execute()
-        if not existing.data:
-            metadata = user.user_metadata or {}
-            name = metadata.get("full_name") or metadata.get("name") or user.email.split("@")[0]
-            supabase.table("customers").insert({
-                "user_id": user.id,
-                "name": name,
-                "email": user.email,
-                "phone": metadata.get("phone", ""),
-            }).execute()
-
-        session["user"] = user.id
-        session["email"] = user.email
-        session["role"] = get_user_role(user.id)
+        customer_id = _ensure_customer(user)
+        _start_session(user.id, user.email, "customer", customer_id)
 
         flash("Đăng nhập thành công!", "success")
         return redirect(url_for("admin.dashboard") if session["role"] == "admin" else url_for("customer.dashboard"))
 
     except Exception as e:
-        import traceback
-        print(f"ERROR: {e}")
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        current_app.logger.exception("OAuth completion failed")
         flash(f"Lỗi xác thực: {str(e)}", "error")
         return redirect(url_for("auth.login"))
 
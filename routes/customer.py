@@ -1,181 +1,160 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-
-from models.db import supabase
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+
+from models import repository
+from models.catalog import list_products
+from models.dashboard import get_dashboard, invalidate_dashboard
+from models.resilience import ServiceUnavailable
+from models.tasks import enqueue_quote_orders
 from decorators import login_required
 
 bp = Blueprint("customer", __name__)
 
 
+def _current_customer_id():
+    """
+    customers.id của người dùng hiện tại. Được lưu vào session khi đăng nhập;
+    chỉ tra cứu lại cho các phiên tạo trước khi có customer_id trong session.
+    """
+    if "customer_id" not in session:
+        session["customer_id"] = repository.get_customer_id(session["user"])
+    return session["customer_id"]
+
+
 @bp.route("/dashboard")
 @login_required
 def dashboard():
-    customer = (
-        supabase.table("customers")
-        .select("id")
-        .eq("user_id", session["user"])
-        .single()
-        .execute()
-    )
+    customer_id = _current_customer_id()
+    data = get_dashboard(customer_id)
+    # ETag theo dữ liệu (và email hiển thị trên layout). Không trả 304 khi còn
+    # thông báo flash chưa hiển thị.
+    etag = f"{data.etag}.{session.get('email', '')}"
+    if not session.get("_flashes") and request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(
+            render_template(
+                "customer/dashboard.html", requests=data.requests, orders=data.orders
+            )
+        )
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
-    customer_id = customer.data["id"]
-    requests_res = (
-        supabase.table("requests")
-        .select("*")
-        .eq("customer_id", customer_id)
-        .order("created_at", desc=True)
-        .execute()
-    )
-    orders_res = (
-        supabase.table("orders")
-        .select("*, suppliers(name)")
-        .eq("customer_id", customer_id)
-        .order("created_at", desc=True)
-        .execute()
-    )
 
-    return render_template(
-        "customer/dashboard.html",
-        requests=requests_res.data,
-        orders=orders_res.data,
-    )
+@bp.route("/events")
+@login_required
+def events():
+    """
+    Luồng sự kiện (SSE) báo giá / đơn hàng của khách hàng. asgi.py phục vụ
+    đường dẫn này trực tiếp trên event loop; khi chạy WSGI (gunicorn app:app)
+    trả 204 để trình duyệt ngừng kết nối lại, trang vẫn cập nhật khi tải lại.
+    """
+    return "", 204
+
+
+def _parse_request_items(product_ids, quantities):
+    """
+    Kiểm tra các dòng sản phẩm từ form, gộp product_id trùng bằng cách cộng dồn
+    số lượng. Trả về dict {product_id: quantity}; ValueError nếu dữ liệu sai.
+    """
+    merged = {}
+    for pid, qty in zip(product_ids, quantities):
+        pid = (pid or "").strip()
+        qty = (qty or "").strip()
+        if not pid and not qty:
+            continue
+        if not pid or not qty:
+            raise ValueError("Mỗi dòng cần có sản phẩm và số lượng")
+        try:
+            quantity = int(qty)
+        except ValueError:
+            raise ValueError("Số lượng phải là số nguyên") from None
+        if quantity <= 0:
+            raise ValueError("Số lượng phải lớn hơn 0")
+        merged[pid] = merged.get(pid, 0) + quantity
+    if not merged:
+        raise ValueError("Vui lòng chọn ít nhất một sản phẩm")
+    return merged
 
 
 @bp.route("/request/new", methods=["GET", "POST"])
 @login_required
 def new_request():
     if request.method == "POST":
-        customer = (
-            supabase.table("customers")
-            .select("id")
-            .eq("user_id", session["user"])
-            .single()
-            .execute()
-        )
-        req = (
-            supabase.table("requests")
-            .insert(
-                {
-                    "customer_id": customer.data["id"],
-                    "status": "pending",
-                    "note": request.form.get("note", ""),
-                }
+        try:
+            items = _parse_request_items(
+                request.form.getlist("product_id[]"),
+                request.form.getlist("quantity[]"),
             )
-            .execute()
-        )
-
-        request_id = req.data[0]["id"]
-        product_ids = request.form.getlist("product_id[]")
-        quantities = request.form.getlist("quantity[]")
-
-        for pid, qty in zip(product_ids, quantities):
-            if pid and qty:
-                supabase.table("request_items").insert(
-                    {
-                        "request_id": request_id,
-                        "product_id": pid,
-                        "quantity": int(qty),
-                    }
-                ).execute()
-
+            repository.create_request_with_items(
+                _current_customer_id(), request.form.get("note", ""), items
+            )
+        except (ValueError, ServiceUnavailable) as e:
+            # Thông báo đã được viết cho người dùng
+            flash(str(e), "error")
+            return redirect(url_for("customer.new_request"))
+        except Exception:
+            current_app.logger.exception("Creating request failed")
+            flash("Không thể tạo yêu cầu, vui lòng thử lại sau.", "error")
+            return redirect(url_for("customer.new_request"))
+
+        invalidate_dashboard(_current_customer_id())
         flash("Tạo yêu cầu thành công", "success")
         return redirect(url_for("customer.dashboard"))
-    products = supabase.table("products").select("*").execute()
-    return render_template("customer/request_form.html", products=products.data)
+    return render_template("customer/request_form.html", products=list_products())
 
 
 @bp.route("/requests/<request_id>/quote")
 @login_required
 def view_quote(request_id):
-    quote = (
-        supabase.table("quotes")
-        .select("*")
-        .eq("request_id", request_id)
-        .single()
-        .execute()
-    )
-
-    items = (
-        supabase.table("quote_items")
-        .select("*, product_suppliers(*, products(name), suppliers(name))")
-        .eq("quote_id", quote.data["id"])
-        .execute()
-    )
-
+    quote = repository.get_request_quote(request_id)
     return render_template(
-        "customer/quote_detail.html", quote=quote.data, items=items.data
+        "customer/quote_detail.html",
+        quote=quote,
+        items=repository.list_quote_items(quote["id"]),
     )
 
 
 @bp.route("/quotes/<quote_id>/accept", methods=["POST"])
 @login_required
 def accept_quote(quote_id):
-    quote = (
-        supabase.table("quotes")
-        .select("*, request_id")
-        .eq("id", quote_id)
-        .single()
-        .execute()
-    )
+    # Chỉ báo giá đang ở trạng thái "sent" mới được chấp nhận, nên bấm đúp /
+    # gửi lại không tạo đơn hàng trùng lặp (xem repository.accept_quote).
+    # Đơn hàng được tạo bởi job nền (models/tasks.py); trang nhận sự kiện
+    # "order" khi xong.
+    try:
+        accepted = repository.accept_quote(quote_id)
+    except ServiceUnavailable as e:
+        flash(str(e), "error")
+        return redirect(url_for("customer.dashboard"))
+    except Exception:
+        current_app.logger.exception("Accepting quote %s failed", quote_id)
+        flash("Không thể chấp nhận báo giá, vui lòng thử lại sau.", "error")
+        return redirect(url_for("customer.dashboard"))
 
-    quote_items = (
-        supabase.table("quote_items")
-        .select("*, product_suppliers(supplier_id, cost_price)")
-        .eq("quote_id", quote_id)
-        .execute()
-    )
-    supplier_items = {}
-    for item in quote_items.data:
-        sid = item["product_suppliers"]["supplier_id"]
-        supplier_items.setdefault(sid, []).append(item)
-    req = (
-        supabase.table("requests")
-        .select("customer_id")
-        .eq("id", quote.data["request_id"])
-        .single()
-        .execute()
-    )
-    for supplier_id, items in supplier_items.items():
-        total_cost = sum(
-            i["quantity"] * i["product_suppliers"]["cost_price"] for i in items
-        )
-        total_sell = sum(i["subtotal"] for i in items)
-        profit = total_sell - total_cost
-
-        order = (
-            supabase.table("orders")
-            .insert(
-                {
-                    "quote_id": quote_id,
-                    "customer_id": req.data["customer_id"],
-                    "supplier_id": supplier_id,
-                    "total_cost": total_cost,
-                    "total_sell": total_sell,
-                    "profit": profit,
-                    "status": "pending",
-                }
-            )
-            .execute()
-        )
+    if accepted is None:
+        flash("Báo giá này đã được xử lý trước đó.", "info")
+        return redirect(url_for("customer.dashboard"))
 
-        order_id = order.data[0]["id"]
-        for item in items:
-            supabase.table("order_items").insert(
-                {
-                    "order_id": order_id,
-                    "product_supplier_id": item["product_supplier_id"],
-                    "quantity": item["quantity"],
-                    "cost_price": item["product_suppliers"]["cost_price"],
-                    "sell_price": item["quoted_price"],
-                    "subtotal": item["subtotal"],
-                }
-            ).execute()
-    supabase.table("quotes").update({"status": "accepted"}).eq(
-        "id", quote_id
-    ).execute()
-    supabase.table("requests").update({"status": "accepted"}).eq(
-        "id", quote.data["request_id"]
-    ).execute()
+    try:
+        enqueue_quote_orders(quote_id, accepted["request_id"], accepted["customer_id"])
+    except Exception:
+        current_app.logger.exception("Queueing orders for quote %s failed", quote_id)
+        repository.reopen_quote(quote_id)
+        flash("Không thể chấp nhận báo giá, vui lòng thử lại sau.", "error")
+        return redirect(url_for("customer.dashboard"))
 
+    invalidate_dashboard(_current_customer_id())
     flash("Đã chấp nhận báo giá. Đơn hàng đang được xử lý.", "success")
     return redirect(url_for("customer.dashboard"))
 
@@ -183,35 +162,15 @@ def accept_quote(quote_id):
 @bp.route("/orders/<order_id>")
 @login_required
 def order_detail(order_id):
-    order = (
-        supabase.table("orders")
-        .select("*, suppliers(name)")
-        .eq("id", order_id)
-        .single()
-        .execute()
-    )
-
-    items = (
-        supabase.table("order_items")
-        .select("*, product_suppliers(*, products(name))")
-        .eq("order_id", order_id)
-        .execute()
-    )
-
-    payments = (
-        supabase.table("customer_payments")
-        .select("*")
-        .eq("order_id", order_id)
-        .execute()
-    )
+    order, items = repository.get_order_with_items(order_id)
 
-    total_paid = sum(p["amount"] for p in payments.data)
-    remaining = order.data["total_sell"] - total_paid
+    total_paid = order.get("paid_amount") or 0
+    remaining = order["total_sell"] - total_paid
 
     return render_template(
         "customer/order_detail.html",
-        order=order.data,
-        items=items.data,
+        order=order,
+        items=items,
         total_paid=total_paid,
         remaining=remaining,
     )
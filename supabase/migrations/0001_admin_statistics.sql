@@ -0,0 +1,59 @@
+-- Thống kê doanh thu, lợi nhuận, công nợ tính trực tiếp trong Postgres.
+-- Gọi qua PostgREST: supabase.rpc("admin_statistics", {"p_from": ..., "p_to": ...})
+-- Trả về một object jsonb nhỏ: tổng cộng + chuỗi theo tháng.
+create or replace function public.admin_statistics(
+    p_from date default null,
+    p_to date default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    with scoped_orders as (
+        select
+            o.id,
+            o.status,
+            o.total_sell,
+            o.profit,
+            date_trunc('month', coalesce(o.completed_at, o.created_at))::date as month
+        from public.orders o
+        where (p_from is null or coalesce(o.completed_at, o.created_at) >= p_from)
+          and (p_to is null or coalesce(o.completed_at, o.created_at) < p_to + 1)
+    ),
+    paid as (
+        select p.order_id, sum(p.amount) as amount
+        from public.customer_payments p
+        join scoped_orders o on o.id = p.order_id
+        group by p.order_id
+    ),
+    monthly as (
+        select
+            o.month,
+            sum(case when o.status = 'completed' then o.total_sell else 0 end) as revenue,
+            sum(case when o.status = 'completed' then o.profit else 0 end) as profit,
+            sum(o.total_sell - coalesce(paid.amount, 0)) as debt
+        from scoped_orders o
+        left join paid on paid.order_id = o.id
+        group by o.month
+    )
+    select jsonb_build_object(
+        'total_revenue', coalesce((select sum(revenue) from monthly), 0),
+        'total_profit', coalesce((select sum(profit) from monthly), 0),
+        'total_debt', coalesce((select sum(debt) from monthly), 0),
+        'months', coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'month', to_char(month, 'YYYY-MM'),
+                        'revenue', revenue,
+                        'profit', profit,
+                        'debt', debt
+                    )
+                    order by month
+                )
+                from monthly
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
@@ -0,0 +1,224 @@
+-- Sổ công nợ được duy trì cộng dồn:
+--   orders.paid_amount          tổng đã thanh toán của từng đơn hàng
+--   public.customer_balances    tổng tiền hàng / đã thanh toán / còn nợ theo khách hàng
+-- Trigger cập nhật sổ trong cùng transaction với thao tác ghi customer_payments
+-- và orders, nên không cần cộng lại bảng thanh toán khi xem công nợ.
+-- reconcile_debt_ledger() dựng lại toàn bộ sổ từ dữ liệu gốc
+-- (gọi bằng `flask reconcile-ledger`).
+
+alter table public.orders
+    add column if not exists paid_amount numeric not null default 0;
+
+create table if not exists public.customer_balances (
+    customer_id uuid primary key references public.customers(id) on delete cascade,
+    total_sell numeric not null default 0,
+    total_paid numeric not null default 0,
+    debt numeric generated always as (total_sell - total_paid) stored,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists customer_balances_debt_idx
+    on public.customer_balances (debt desc);
+
+
+-- Cộng một khoản chênh lệch vào số dư của khách hàng
+create or replace function public.ledger_apply(
+    p_customer_id uuid,
+    p_sell numeric,
+    p_paid numeric
+)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+    insert into public.customer_balances as b (customer_id, total_sell, total_paid)
+    select p_customer_id, coalesce(p_sell, 0), coalesce(p_paid, 0)
+    where p_customer_id is not null
+    on conflict (customer_id) do update
+        set total_sell = b.total_sell + excluded.total_sell,
+            total_paid = b.total_paid + excluded.total_paid,
+            updated_at = now();
+$$;
+
+
+-- orders → customer_balances
+create or replace function public.ledger_orders_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.ledger_apply(old.customer_id, -old.total_sell, -old.paid_amount);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.ledger_apply(new.customer_id, new.total_sell, new.paid_amount);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists orders_ledger on public.orders;
+create trigger orders_ledger
+    after insert or delete or update of customer_id, total_sell, paid_amount
+    on public.orders
+    for each row execute function public.ledger_orders_trigger();
+
+
+-- customer_payments → orders.paid_amount (orders_ledger chuyển tiếp sang
+-- customer_balances). Khi đơn hàng đã bị xoá thì không còn gì để cập nhật.
+create or replace function public.ledger_payments_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update public.orders
+        set paid_amount = paid_amount - old.amount
+        where id = old.order_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        update public.orders
+        set paid_amount = paid_amount + new.amount
+        where id = new.order_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists customer_payments_ledger on public.customer_payments;
+create trigger customer_payments_ledger
+    after insert or delete or update of order_id, amount
+    on public.customer_payments
+    for each row execute function public.ledger_payments_trigger();
+
+
+-- Dựng lại sổ từ customer_payments và orders. Trả về số dòng đã sửa.
+create or replace function public.reconcile_debt_ledger()
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_orders integer;
+    v_customers integer;
+begin
+    -- Chặn ghi thanh toán / đơn hàng trong lúc tính lại
+    lock table public.customer_payments, public.orders in share row exclusive mode;
+
+    with paid as (
+        select o.id, coalesce(sum(p.amount), 0) as amount
+        from public.orders o
+        left join public.customer_payments p on p.order_id = o.id
+        group by o.id
+    )
+    update public.orders o
+    set paid_amount = paid.amount
+    from paid
+    where paid.id = o.id
+      and o.paid_amount is distinct from paid.amount;
+    get diagnostics v_orders = row_count;
+
+    with totals as (
+        select
+            c.id as customer_id,
+            coalesce(sum(o.total_sell), 0) as total_sell,
+            coalesce(sum(o.paid_amount), 0) as total_paid
+        from public.customers c
+        left join public.orders o on o.customer_id = c.id
+        group by c.id
+    )
+    insert into public.customer_balances as b (customer_id, total_sell, total_paid)
+    select customer_id, total_sell, total_paid from totals
+    on conflict (customer_id) do update
+        set total_sell = excluded.total_sell,
+            total_paid = excluded.total_paid,
+            updated_at = now()
+        where b.total_sell is distinct from excluded.total_sell
+           or b.total_paid is distinct from excluded.total_paid;
+    get diagnostics v_customers = row_count;
+
+    return jsonb_build_object('orders_fixed', v_orders, 'customers_fixed', v_customers);
+end;
+$$;
+
+
+-- Công nợ trong thống kê đọc từ orders.paid_amount thay vì cộng customer_payments
+create or replace function public.admin_statistics(
+    p_from date default null,
+    p_to date default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    with scoped_orders as (
+        select
+            o.status,
+            o.total_sell,
+            o.profit,
+            o.paid_amount,
+            date_trunc('month', coalesce(o.completed_at, o.created_at))::date as month
+        from public.orders o
+        where (p_from is null or coalesce(o.completed_at, o.created_at) >= p_from)
+          and (p_to is null or coalesce(o.completed_at, o.created_at) < p_to + 1)
+    ),
+    monthly as (
+        select
+            month,
+            sum(case when status = 'completed' then total_sell else 0 end) as revenue,
+            sum(case when status = 'completed' then profit else 0 end) as profit,
+            sum(total_sell - paid_amount) as debt
+        from scoped_orders
+        group by month
+    )
+    select jsonb_build_object(
+        'total_revenue', coalesce((select sum(revenue) from monthly), 0),
+        'total_profit', coalesce((select sum(profit) from monthly), 0),
+        'total_debt', coalesce((select sum(debt) from monthly), 0),
+        'months', coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'month', to_char(month, 'YYYY-MM'),
+                        'revenue', revenue,
+                        'profit', profit,
+                        'debt', debt
+                    )
+                    order by month
+                )
+                from monthly
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+
+-- Quyền: PostgREST công khai mọi hàm trong schema public dưới dạng RPC cho
+-- anon / authenticated (anon key có trong trình duyệt). Các hàm ghi sổ chỉ
+-- được gọi từ trigger (chạy với quyền chủ sở hữu), còn reconcile_debt_ledger
+-- chỉ dành cho service_role (`flask reconcile-ledger` với SUPABASE_SERVICE_KEY).
+-- Trigger kiểm tra quyền EXECUTE khi tạo, không phải khi chạy.
+revoke execute on function public.ledger_apply(uuid, numeric, numeric)
+    from public, anon, authenticated;
+revoke execute on function public.ledger_orders_trigger() from public, anon, authenticated;
+revoke execute on function public.ledger_payments_trigger() from public, anon, authenticated;
+revoke execute on function public.reconcile_debt_ledger() from public, anon, authenticated;
+grant execute on function public.reconcile_debt_ledger() to service_role;
+
+-- Sổ chỉ được ghi bởi trigger và chứa công nợ của mọi khách hàng: anon key
+-- trong trình duyệt không được đọc. Máy chủ đọc bằng service_role
+-- (db.service_client), vốn bỏ qua row level security.
+alter table public.customer_balances enable row level security;
+revoke all on public.customer_balances from public, anon, authenticated;
+grant select on public.customer_balances to service_role;
+
+
+-- Dữ liệu sẵn có
+select public.reconcile_debt_ledger();
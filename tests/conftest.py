@@ -0,0 +1,92 @@
+"""
+Tests run the whole app against the in-memory backend (models/fake.py).
+Config is read at import time, so the environment is set up before anything
+from the app is imported.
+"""
+import os
+import tempfile
+from typing import NamedTuple
+
+_tmp = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.update(
+    {
+        "DATA_BACKEND": "fake",
+        "FAKE_LATENCY_MS": "0",
+        "CACHE_BACKEND": "memory",
+        "JOBS_WORKER_THREADS": "0",
+        "JOBS_DB_PATH": os.path.join(_tmp, "jobs.sqlite3"),
+        "METRICS_DIR": "",
+        "EVENTS_DATABASE_URL": "",
+    }
+)
+
+import pytest  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models import db, jobs, repository  # noqa: E402
+from models.catalog import catalog_cache  # noqa: E402
+from models.dashboard import dashboard_cache  # noqa: E402
+from models.resilience import policy  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def fake():
+    """The fake backend, with caches, injected faults, the breaker and jobs reset."""
+    db.fake.faults.clear()
+    catalog_cache.invalidate()
+    dashboard_cache.invalidate()
+    policy.breaker.record_success()
+    policy.budget.tokens = policy.budget.max_tokens
+    yield db.fake
+    db.fake.faults.clear()
+    policy.breaker.record_success()
+    jobs.queue._conn().execute("delete from jobs")
+
+
+class AcceptedQuote(NamedTuple):
+    quote_id: str
+    request_id: str
+    customer_id: str
+
+
+@pytest.fixture
+def accepted_quote(fake):
+    """A one-line quote for the first customer, accepted but without orders yet."""
+    customer_id = fake.tables["customers"][0]["id"]
+    product = fake.tables["products"][0]
+    offer = next(o for o in fake.tables["product_suppliers"] if o["product_id"] == product["id"])
+    request_id = repository.create_request_with_items(customer_id, "", {product["id"]: 2})
+    quote_id, _ = repository.create_quote_with_items(
+        request_id,
+        "admin",
+        [{"product_supplier_id": offer["id"], "quantity": 2, "quoted_price": 10, "subtotal": 20}],
+    )
+    accepted = repository.accept_quote(quote_id)
+    return AcceptedQuote(quote_id, request_id, accepted["customer_id"])
+
+
+def _login(app, email):
+    user_id = db.fake.auth.users[email][1].id
+    role, customer_id = db.resolve_user(user_id)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user=user_id, email=email, role=role)
+        if customer_id:
+            session["customer_id"] = customer_id
+    return client
+
+
+@pytest.fixture
+def admin_client(app, fake):
+    return _login(app, "admin@example.com")
+
+
+@pytest.fixture
+def customer_client(app, fake):
+    return _login(app, "customer@example.com")
@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.mark.parametrize("cost_price, sell_price", [("", "1500"), ("1000", "abc")])
+def test_bad_supplier_price_is_rejected(admin_client, fake, cost_price, sell_price):
+    product = fake.tables["products"][0]
+    supplier = fake.tables["suppliers"][0]
+    before = len(fake.tables["product_suppliers"])
+
+    response = admin_client.post(
+        f"/admin/products/{product['id']}/suppliers",
+        data={"supplier_id": supplier["id"], "cost_price": cost_price, "sell_price": sell_price},
+    )
+
+    assert response.status_code == 302
+    assert len(fake.tables["product_suppliers"]) == before
+    with admin_client.session_transaction() as session:
+        assert session["_flashes"] == [("error", "Giá vốn và giá bán phải là số")]
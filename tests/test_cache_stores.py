@@ -0,0 +1,144 @@
+import multiprocessing
+import pickle
+import threading
+
+import pytest
+
+from models import cache
+
+NAMESPACE = "test"
+
+
+def _memory(tmp_path):
+    return cache.MemoryStore(16)
+
+
+def _sqlite(tmp_path):
+    return cache.SQLiteStore(str(tmp_path / "cache.sqlite3"), NAMESPACE, 16)
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    fakeredis = pytest.importorskip("fakeredis")
+    if cache.redis is None:
+        pytest.skip("redis package not installed")
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield f"redis://{host}:{port}/0"
+    server.shutdown()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "redis":
+        url = request.getfixturevalue("redis_url")
+        store = cache.RedisStore(url, NAMESPACE)
+    else:
+        store = {"memory": _memory, "sqlite": _sqlite}[request.param](tmp_path)
+    store.clear()
+    return store
+
+
+def test_get_set_delete_clear(store):
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store)
+    assert c.get("catalog") is None
+    c.set("catalog", [{"id": "p1", "name": "Ốc vít"}])
+    c.set("other", 1)
+    assert c.get("catalog") == [{"id": "p1", "name": "Ốc vít"}]
+    c.invalidate("catalog")
+    assert c.get("catalog") is None
+    assert c.get("other") == 1
+    c.invalidate()
+    assert c.get("other") is None
+    assert c.stats()["hits"] == 2
+
+
+def test_expired_entry_is_only_served_stale(store, monkeypatch):
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store, stale_ttl=600)
+    c.set("catalog", ["cũ"])
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 120)
+    assert c.get("catalog") is None
+
+    def failing():
+        raise ConnectionError
+
+    assert c.get_or_load("catalog", failing, stale_on=(ConnectionError,)) == ["cũ"]
+    assert c.stats()["stale_served"] == 1
+
+
+def test_many_keys_load_only_the_missing_ones(store):
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store)
+    c.set("a", 1)
+    loaded = []
+
+    def loader(keys):
+        loaded.append(sorted(keys))
+        return {key: key.upper() for key in keys}
+
+    assert c.get_many_or_load(["a", "b", "c"], loader) == {"a": 1, "b": "B", "c": "C"}
+    assert c.get_many_or_load(["b", "c"], loader) == {"b": "B", "c": "C"}
+    assert loaded == [["b", "c"]]
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_shared_stores_keep_json_not_pickle(backend, tmp_path, request):
+    if backend == "redis":
+        store = cache.RedisStore(request.getfixturevalue("redis_url"), NAMESPACE)
+    else:
+        store = _sqlite(tmp_path)
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store)
+    c.set("pair", ("a", 1))
+    assert c.get("pair") == ["a", 1]
+    with pytest.raises(TypeError):
+        store.set("object", cache._Entry(0, object()), 60)
+
+    # A pickled payload planted in the store is a miss, not something to load
+    class Boom:
+        def __reduce__(self):
+            return (pytest.fail, ("unpickled",))
+
+    payload = pickle.dumps(cache._Entry(1e12, Boom()))
+    if backend == "redis":
+        store.client.set(store._key("planted"), payload)
+    else:
+        store._conn().execute(
+            "insert or replace into cache_entries values (?, ?, ?, ?)",
+            (NAMESPACE, "planted", payload, 1e12),
+        )
+    assert c.get("planted") is None
+
+
+def _other_process(backend, target, key, results):
+    """Read `key`, then invalidate it, from a separate process."""
+    if backend == "redis":
+        store = cache.RedisStore(target, NAMESPACE)
+    else:
+        store = cache.SQLiteStore(target, NAMESPACE, 16)
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store)
+    results.put(c.get(key))
+    c.invalidate(key)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_invalidation_reaches_other_processes(backend, tmp_path, request):
+    if backend == "redis":
+        target = request.getfixturevalue("redis_url")
+        store = cache.RedisStore(target, NAMESPACE)
+    else:
+        target = str(tmp_path / "cache.sqlite3")
+        store = cache.SQLiteStore(target, NAMESPACE, 16)
+    c = cache.TTLCache(maxsize=16, ttl=60, store=store)
+    c.set("catalog", {"rows": 3})
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    worker = ctx.Process(target=_other_process, args=(backend, target, "catalog", results))
+    worker.start()
+    seen = results.get(timeout=30)
+    worker.join(timeout=30)
+
+    assert worker.exitcode == 0
+    assert seen == {"rows": 3}
+    assert c.get("catalog") is None
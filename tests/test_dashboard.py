@@ -0,0 +1,57 @@
+from models import jobs, repository
+
+
+def _customer_id(client):
+    with client.session_transaction() as session:
+        return session["customer_id"]
+
+
+def _etag(client):
+    response = client.get("/customer/dashboard")
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_unchanged_dashboard_is_a_304(customer_client, fake):
+    etag = _etag(customer_client)
+    response = customer_client.get("/customer/dashboard", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_payment_changes_the_etag(customer_client, admin_client, fake):
+    customer_id = _customer_id(customer_client)
+    fake.seed("orders", [{"customer_id": customer_id, "status": "pending", "total_sell": 300}])
+    order_id = fake.tables["orders"][-1]["id"]
+    etag = _etag(customer_client)
+
+    admin_client.post(
+        f"/admin/orders/{order_id}/payment", data={"amount": "100", "payment_method": "cash"}
+    )
+    response = customer_client.get("/customer/dashboard", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_orders_from_an_accepted_quote_change_the_etag(customer_client, fake):
+    customer_id = _customer_id(customer_client)
+    product = fake.tables["products"][0]
+    offer = next(o for o in fake.tables["product_suppliers"] if o["product_id"] == product["id"])
+    request_id = repository.create_request_with_items(customer_id, "", {product["id"]: 1})
+    quote_id, _ = repository.create_quote_with_items(
+        request_id,
+        "admin",
+        [{"product_supplier_id": offer["id"], "quantity": 1, "quoted_price": 10, "subtotal": 10}],
+    )
+    etag = _etag(customer_client)
+
+    customer_client.post(f"/customer/quotes/{quote_id}/accept")
+    customer_client.get("/customer/dashboard")  # shows the flash message
+    assert jobs.queue.run_pending() == 1
+    response = customer_client.get("/customer/dashboard", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,18 @@
+from models import db, repository
+
+
+def test_debts_page_reads_the_ledger_with_the_service_key(admin_client, fake, monkeypatch):
+    customer = fake.tables["customers"][0]
+    fake.seed("orders", [{"customer_id": customer["id"], "status": "completed", "total_sell": 500}])
+    repository.reconcile_debt_ledger()
+    used = []
+
+    def service_client():
+        used.append(True)
+        return db.supabase
+
+    monkeypatch.setattr(db, "service_client", service_client)
+
+    response = admin_client.get("/admin/debts")
+    assert response.status_code == 200
+    assert used and customer["name"] in response.text
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+
+import asgi
+from app import app as flask_app
+from models import events
+
+
+def _cookie(session):
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    return f"{flask_app.config['SESSION_COOKIE_NAME']}={serializer.dumps(session)}"
+
+
+def _get(path, headers=()):
+    async def get():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers=dict(headers))
+
+    return asyncio.run(get())
+
+
+def test_anonymous_stream_is_a_204():
+    assert _get(asgi.EVENTS_PATH).status_code == 204
+    # A session without a customer (an admin) gets no stream either
+    response = _get(asgi.EVENTS_PATH, {"cookie": _cookie({"user": "u1", "role": "admin"})})
+    assert response.status_code == 204
+
+
+async def _stream(cookie, customer_id):
+    """Open the stream, publish one event once it is up, then disconnect."""
+    sent = []
+    chunks = asyncio.Queue()
+    disconnect = asyncio.Event()
+
+    async def receive():
+        if not sent:
+            sent.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        await chunks.put(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": asgi.EVENTS_PATH,
+        "query_string": b"",
+        "headers": [(b"cookie", cookie.encode())],
+    }
+    task = asyncio.ensure_future(asgi.app(scope, receive, send))
+    start = await asyncio.wait_for(chunks.get(), 5)
+    first = await asyncio.wait_for(chunks.get(), 5)
+    events.publish(customer_id, "payment", {"order_id": "o1", "amount": 100})
+    event = await asyncio.wait_for(chunks.get(), 5)
+    disconnect.set()
+    await asyncio.wait_for(task, 5)
+    return start, first["body"], event["body"]
+
+
+def test_published_event_reaches_the_customer_stream():
+    cookie = _cookie({"user": "u1", "role": "customer", "customer_id": "c1"})
+    start, first, event = asyncio.run(_stream(cookie, "c1"))
+
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream") in start["headers"]
+    assert first == b"retry: 5000\n\n"
+    assert event == b'event: payment\ndata: {"order_id": "o1", "amount": 100}\n\n'
+    # The closed stream is unsubscribed
+    assert "c1" not in events.bus._subscribers
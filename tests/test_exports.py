@@ -0,0 +1,63 @@
+import csv
+import io
+
+from models import exports
+
+
+def _export(admin_client, query):
+    response = admin_client.get(f"/admin/export?{query}")
+    assert response.status_code == 200
+    return list(csv.reader(io.StringIO(response.text.lstrip("﻿"))))
+
+
+def test_csv_cells_cannot_start_a_formula():
+    columns = [("Ghi chú", lambda r: r["note"]), ("Số tiền", lambda r: r["amount"])]
+    rows = [
+        {"note": '=HYPERLINK("http://x","y")', "amount": -5},
+        {"note": "+1", "amount": 0},
+        {"note": "-2+3", "amount": 0},
+        {"note": "@SUM(A1)", "amount": 0},
+        {"note": "bình thường", "amount": 0},
+    ]
+    lines = list(csv.reader(io.StringIO("".join(exports.csv_chunks(columns, rows)).lstrip("﻿"))))
+    assert [line[0] for line in lines[1:]] == [
+        '\'=HYPERLINK("http://x","y")', "'+1", "'-2+3", "'@SUM(A1)", "bình thường",
+    ]
+    # Numbers are written as numbers
+    assert lines[1][1] == "-5"
+
+
+def _order(fake, created_at):
+    customer = fake.tables["customers"][0]
+    fake.seed("orders", [{"customer_id": customer["id"], "status": "new", "created_at": created_at}])
+    return fake.tables["orders"][-1]
+
+
+def test_payments_export_filters_on_paid_at(admin_client, fake):
+    order = _order(fake, "2023-06-01T00:00:00+00:00")
+    fake.seed(
+        "customer_payments",
+        [
+            {"order_id": order["id"], "amount": 100, "note": "tháng 1", "paid_at": "2023-01-10T08:00:00+00:00"},
+            {"order_id": order["id"], "amount": 200, "note": "tháng 2", "paid_at": "2023-02-10T08:00:00+00:00"},
+        ],
+    )
+    lines = _export(admin_client, "dataset=payments&from=2023-02-01&to=2023-02-28")
+    assert [(line[1][:10], line[6]) for line in lines[1:]] == [("2023-02-10", "tháng 2")]
+
+
+def test_order_items_export_uses_the_order_date(admin_client, fake):
+    inside = _order(fake, "2023-03-05T00:00:00+00:00")
+    outside = _order(fake, "2023-04-05T00:00:00+00:00")
+    offer = fake.tables["product_suppliers"][0]
+    fake.seed(
+        "order_items",
+        [
+            {"order_id": order["id"], "product_supplier_id": offer["id"], "quantity": 2}
+            for order in (inside, outside)
+        ],
+    )
+    lines = _export(admin_client, "dataset=order_items&from=2023-03-01&to=2023-03-31")
+    assert [(line[0], line[1][:10], line[5]) for line in lines[1:]] == [
+        (inside["id"], "2023-03-05", "2")
+    ]
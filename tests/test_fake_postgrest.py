@@ -0,0 +1,56 @@
+import pytest
+from postgrest.exceptions import APIError
+from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+
+from models import fake_postgrest
+from models.fake import FakeClient
+from models.http import build_client
+
+
+@pytest.fixture(scope="module")
+def remote():
+    """The real supabase client talking to the stand-in over HTTP."""
+    fake = FakeClient()
+    server = fake_postgrest.start(fake)
+    client = create_client(
+        server.url,
+        fake_postgrest.API_KEY,
+        options=SyncClientOptions(httpx_client=build_client()),
+    )
+    yield fake, client
+    server.shutdown()
+
+
+def test_crud_over_http(remote):
+    fake, client = remote
+    rows = client.table("suppliers").insert(
+        [{"name": "A, (quoted)", "phone": "1"}, {"name": "B", "phone": "2"}]
+    ).execute().data
+    assert [r["name"] for r in rows] == ["A, (quoted)", "B"]
+    ids = [r["id"] for r in rows]
+
+    found = (
+        client.table("suppliers").select("id, name").in_("id", ids)
+        .order("name", desc=True).execute()
+    )
+    assert [r["name"] for r in found.data] == ["B", "A, (quoted)"]
+
+    one = client.table("suppliers").select("name").eq("name", "A, (quoted)").single().execute()
+    assert one.data == {"name": "A, (quoted)"}
+
+    counted = client.table("suppliers").select("id", count="exact", head=True).or_(
+        f"phone.eq.2,id.eq.{ids[0]}"
+    ).execute()
+    assert counted.count == 2
+
+    client.table("suppliers").update({"phone": "9"}).eq("id", ids[1]).execute()
+    client.table("suppliers").delete().eq("id", ids[0]).execute()
+    assert [r["phone"] for r in fake.tables["suppliers"]] == ["9"]
+
+
+def test_errors_over_http(remote):
+    _, client = remote
+    with pytest.raises(APIError) as error:
+        client.table("suppliers").select("*").eq("name", "missing").single().execute()
+    assert error.value.code == "PGRST116"
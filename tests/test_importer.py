@@ -0,0 +1,76 @@
+import logging
+
+from models import importer, repository
+
+HEADER = "product_name,supplier_name,cost_price,sell_price\n"
+
+
+def _import(*lines, chunk_size=100):
+    return importer.import_price_list([HEADER, *(line + "\n" for line in lines)], chunk_size)
+
+
+def _offer(fake, product_name, supplier_name):
+    product = next(p for p in fake.tables["products"] if p["name"] == product_name)
+    supplier = next(s for s in fake.tables["suppliers"] if s["name"] == supplier_name)
+    return next(
+        o
+        for o in fake.tables["product_suppliers"]
+        if o["product_id"] == product["id"] and o["supplier_id"] == supplier["id"]
+    )
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported(fake):
+    report = _import(
+        ",NCC Mới,1,2",
+        "Ốc mới,,1,2",
+        "Ốc mới,NCC Mới,abc,2",
+        "Ốc mới,NCC Mới,-1,2",
+        "Ốc mới,NCC Mới,1000,1500",
+    )
+
+    assert report.rows == 5 and report.prices_inserted == 1
+    assert report.errors == [
+        (2, "Thiếu product_name"),
+        (3, "Thiếu supplier_name"),
+        (4, "cost_price không phải là số: 'abc'"),
+        (5, "cost_price không được âm"),
+    ]
+    assert _offer(fake, "Ốc mới", "NCC Mới")["sell_price"] == 1500
+
+
+def test_unknown_suppliers_and_products_are_created_once(fake):
+    product = fake.tables["products"][0]["name"]
+    report = _import(
+        f"{product},NCC Nhập,1,2",
+        "Ốc nhập,NCC Nhập,3,4",
+        "Ốc nhập,NCC Nhập,5,6",
+        chunk_size=2,
+    )
+
+    assert report.error_count == 0
+    assert (report.suppliers_created, report.products_created) == (1, 1)
+    assert [s["name"] for s in fake.tables["suppliers"]].count("NCC Nhập") == 1
+    assert [p["name"] for p in fake.tables["products"]].count("Ốc nhập") == 1
+    assert (report.prices_inserted, report.prices_updated) == (2, 1)
+    assert _offer(fake, "Ốc nhập", "NCC Nhập")["cost_price"] == 5
+
+
+def test_failed_chunk_write_is_reported_without_the_error_text(fake, monkeypatch, caplog):
+    save = repository.save_product_supplier_prices
+    calls = []
+
+    def failing_once(prices):
+        calls.append(prices)
+        if len(calls) == 1:
+            raise RuntimeError("password=secret")
+        return save(prices)
+
+    monkeypatch.setattr(repository, "save_product_supplier_prices", failing_once)
+    with caplog.at_level(logging.ERROR, logger="models.importer"):
+        report = _import("Ốc A,NCC Lỗi,1,2", "Ốc B,NCC Lỗi,1,2", "Ốc C,NCC Lỗi,1,2", chunk_size=2)
+
+    assert report.errors == [(2, "Không ghi được dữ liệu dòng 2-3, vui lòng thử lại")]
+    assert "secret" not in report.errors[0][1]
+    assert "password=secret" in caplog.text
+    # The next chunk is still written
+    assert report.prices_inserted == 1
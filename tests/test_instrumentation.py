@@ -0,0 +1,24 @@
+import json
+import logging
+import re
+
+
+def test_server_timing_counts_the_data_calls(customer_client, fake, app, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, "SLOW_REQUEST_QUERIES", 1)
+    before = fake.calls
+    with caplog.at_level(logging.WARNING, logger="slow_requests"):
+        response = customer_client.get("/customer/request/new")
+    calls = fake.calls - before
+
+    assert response.status_code == 200
+    # Cold catalog: one read of the product list
+    assert calls == 1
+    timing = response.headers["Server-Timing"]
+    assert re.match(r'db;dur=[\d.]+;desc="1 calls", app;dur=[\d.]+$', timing)
+
+    logged = [json.loads(r.getMessage()) for r in caplog.records if "slow_request" in r.getMessage()]
+    assert [(r["endpoint"], r["db_calls"]) for r in logged] == [("customer.new_request", 1)]
+
+    # Warm catalog: no data calls at all
+    response = customer_client.get("/customer/request/new")
+    assert 'desc="0 calls"' in response.headers["Server-Timing"]
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from models import jobs, repository
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return jobs.JobQueue(str(tmp_path / "jobs.sqlite3"), lease=0.3, backoff=0.01, max_backoff=0.01)
+
+
+def _status(queue, job_id):
+    return queue._conn().execute("select status from jobs where id = ?", (job_id,)).fetchone()[0]
+
+
+def test_heartbeat_keeps_a_slow_job_from_a_second_worker(queue):
+    taken = []
+
+    @jobs.handler("test_slow")
+    def slow(payload):
+        time.sleep(0.8)  # well past the 0.3s lease
+
+    job_id = queue.enqueue("test_slow", {})
+    worker = threading.Thread(target=queue.run_one)
+    worker.start()
+    time.sleep(0.5)
+    taken.append(queue.claim())
+    worker.join()
+
+    assert taken == [None]
+    assert _status(queue, job_id) == "done"
+
+
+def test_expired_lease_fences_the_first_worker(queue):
+    queue.enqueue("test_fenced", {})
+    first = queue.claim()
+    time.sleep(0.35)
+    second = queue.claim()
+
+    assert second.id == first.id and second.token != first.token
+    assert not queue.renew(first)
+    assert not queue.complete(first)
+    assert not queue.fail(first, "late", dead=True)
+    assert queue.complete(second)
+    assert _status(queue, first.id) == "done"
+
+
+def test_check_lease_stops_a_handler_that_was_taken_over(queue, monkeypatch):
+    @jobs.handler("test_taken_over")
+    def taken_over(payload):
+        # Another worker claims the job meanwhile
+        queue._conn().execute("update jobs set lease_token = 'other'")
+        jobs.check_lease()
+        pytest.fail("check_lease did not raise")
+
+    monkeypatch.setattr(jobs, "queue", queue)
+    job_id = queue.enqueue("test_taken_over", {})
+    assert queue.run_one()
+    # Left to the worker that holds the lease now
+    assert _status(queue, job_id) == "running"
+    jobs.check_lease()  # outside a job: no-op
+
+
+def _orders(fake, quote_id):
+    return [o for o in fake.tables["orders"] if o.get("quote_id") == quote_id]
+
+
+def test_rebuild_waits_for_the_lease_check(fake, accepted_quote):
+    quote_id, request_id, customer_id = accepted_quote
+    # Headers without items: possibly another run still writing them
+    fake.seed("orders", [{"quote_id": quote_id, "customer_id": customer_id, "status": "pending"}])
+
+    def lost():
+        raise jobs.LeaseLost
+
+    with pytest.raises(jobs.LeaseLost):
+        repository.create_quote_orders(quote_id, request_id, customer_id, before_rebuild=lost)
+    assert len(_orders(fake, quote_id)) == 1
+
+    orders = repository.create_quote_orders(quote_id, request_id, customer_id)
+    assert [o["id"] for o in orders] == [o["id"] for o in _orders(fake, quote_id)]
+
+
+def test_reopened_quote_is_not_rebuilt(fake, accepted_quote):
+    quote_id, request_id, customer_id = accepted_quote
+    repository.reopen_quote(quote_id)
+    assert repository.create_quote_orders(quote_id, request_id, customer_id) == []
+    assert _orders(fake, quote_id) == []
+
+
+def test_failed_run_removes_only_its_own_orders(fake, monkeypatch, accepted_quote):
+    quote_id, request_id, customer_id = accepted_quote
+    table = repository._table
+
+    def failing_items(name):
+        query = table(name)
+        if name == "order_items":
+            def insert(rows):
+                # A concurrent run completes its orders, then this insert fails
+                fake.seed("orders", [{"quote_id": quote_id, "customer_id": customer_id}])
+                raise RuntimeError("insert failed")
+
+            query.insert = insert
+        return query
+
+    monkeypatch.setattr(repository, "_table", failing_items)
+    with pytest.raises(RuntimeError):
+        repository.create_quote_orders(quote_id, request_id, customer_id)
+
+    assert len(_orders(fake, quote_id)) == 1  # the other run's order is kept
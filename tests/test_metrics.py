@@ -0,0 +1,52 @@
+from models import jobs, metrics, tasks
+
+
+def test_metrics_requires_token_or_admin(app, admin_client, customer_client, monkeypatch):
+    anonymous = app.test_client()
+    assert anonymous.get("/metrics").status_code == 401
+    assert customer_client.get("/metrics").status_code == 401
+    assert admin_client.get("/metrics").status_code == 200
+
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    assert anonymous.get("/metrics").status_code == 401
+    response = anonymous.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+def _value(counter, **labels):
+    return counter.values.get(tuple(sorted(labels.items())), 0)
+
+
+def test_job_supabase_calls_are_counted(fake, accepted_quote):
+    quote_id, request_id, customer_id = accepted_quote
+    kind = tasks.QUOTE_ORDERS
+    done = _value(metrics.JOBS, kind=kind, outcome="done")
+    calls = _value(metrics.DATA_CALLS, table="orders", op="insert", source="job")
+
+    tasks.enqueue_quote_orders(quote_id, request_id, customer_id)
+    assert jobs.queue.run_pending() == 1
+
+    assert _value(metrics.JOBS, kind=kind, outcome="done") == done + 1
+    assert _value(metrics.DATA_CALLS, table="orders", op="insert", source="job") > calls
+
+
+def test_failed_job_calls_count_as_errors(fake, accepted_quote):
+    quote_id, request_id, customer_id = accepted_quote
+    kind = tasks.QUOTE_ORDERS
+    retries = _value(metrics.JOBS, kind=kind, outcome="retry")
+    errors = sum(
+        value for key, value in metrics.DATA_CALL_ERRORS.values.items()
+        if ("source", "job") in key
+    )
+
+    tasks.enqueue_quote_orders(quote_id, request_id, customer_id)
+    fake.faults.fail_next(10, kind="http503")
+    assert jobs.queue.run_one()
+    fake.faults.clear()
+
+    assert _value(metrics.JOBS, kind=kind, outcome="retry") == retries + 1
+    assert sum(
+        value for key, value in metrics.DATA_CALL_ERRORS.values.items()
+        if ("source", "job") in key
+    ) > errors
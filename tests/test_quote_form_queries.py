@@ -0,0 +1,69 @@
+from models import repository
+from models.catalog import catalog_cache, offers_for
+
+
+def _add_products(fake, count):
+    suppliers = fake.tables["suppliers"]
+    fake.seed("products", [{"name": f"Sản phẩm thêm {i}", "category": "Test"} for i in range(count)])
+    products = fake.tables["products"][-count:]
+    fake.seed(
+        "product_suppliers",
+        [
+            {
+                "product_id": product["id"],
+                "supplier_id": supplier["id"],
+                "cost_price": 1000 + j,
+                "sell_price": 1500 + j,
+            }
+            for product in products
+            for j, supplier in enumerate(suppliers)
+        ],
+    )
+    return products
+
+
+def _quote_form_calls(admin_client, fake, products):
+    customer_id = fake.tables["customers"][0]["id"]
+    request_id = repository.create_request_with_items(
+        customer_id, "test", {p["id"]: 1 for p in products}
+    )
+    before = fake.calls
+    response = admin_client.get(f"/admin/requests/{request_id}/quote")
+    assert response.status_code == 200
+    for product in products:
+        assert product["name"] in response.text
+    return fake.calls - before
+
+
+def test_quote_form_query_count_does_not_grow_with_products(admin_client, fake):
+    small = _quote_form_calls(admin_client, fake, _add_products(fake, 2))
+    # Cold catalog cache again, so the offer lookup is counted both times
+    catalog_cache.invalidate()
+    large = _quote_form_calls(admin_client, fake, _add_products(fake, 40))
+    assert 0 < small == large
+
+
+def test_offers_without_a_price_are_skipped(admin_client, fake):
+    products = _add_products(fake, 1)
+    supplier = fake.tables["suppliers"][0]
+    fake.seed(
+        "product_suppliers",
+        [
+            {"product_id": products[0]["id"], "supplier_id": supplier["id"], "cost_price": None, "sell_price": 10},
+            {"product_id": products[0]["id"], "supplier_id": supplier["id"], "cost_price": 5, "sell_price": None},
+        ],
+    )
+    offers = offers_for([products[0]["id"]])[products[0]["id"]]
+    assert offers and all(o["cost_price"] is not None and o["sell_price"] is not None for o in offers)
+    assert _quote_form_calls(admin_client, fake, products) > 0
+
+
+def test_only_the_requested_products_are_read(fake):
+    products = _add_products(fake, 3)
+    before = fake.calls
+    offers = offers_for([products[0]["id"]])
+    assert fake.calls - before == 1
+    assert set(offers) == {products[0]["id"]}
+    # Cached per product: asking again, or for a subset, reads nothing
+    offers_for([products[0]["id"]])
+    assert fake.calls - before == 1
@@ -0,0 +1,79 @@
+import logging
+
+import pytest
+
+from models import jobs, repository
+from models.resilience import ServiceUnavailable
+
+
+def _quote_lines(fake):
+    customer_id = fake.tables["customers"][0]["id"]
+    product = fake.tables["products"][0]
+    offer = next(o for o in fake.tables["product_suppliers"] if o["product_id"] == product["id"])
+    request_id = repository.create_request_with_items(customer_id, "", {product["id"]: 2})
+    lines = [{"product_supplier_id": offer["id"], "quantity": 2, "quoted_price": 10, "subtotal": 20}]
+    return request_id, lines
+
+
+def _fail_items_insert(fake, monkeypatch, cleanup_error=None):
+    """The quote_items insert fails; so does its cleanup with `cleanup_error`."""
+    table = repository._table
+
+    def failing(name):
+        query = table(name)
+        if name == "quote_items":
+            insert = query.insert
+
+            def failing_insert(rows):
+                fake.faults.fail_next(1, kind="http503")
+                return insert(rows)
+
+            def failing_delete():
+                raise cleanup_error
+
+            query.insert = failing_insert
+            if cleanup_error is not None:
+                query.delete = failing_delete
+        return query
+
+    monkeypatch.setattr(repository, "_table", failing)
+
+
+def _quotes(fake, request_id):
+    return [q for q in fake.tables["quotes"] if q["request_id"] == request_id]
+
+
+def test_failed_items_insert_leaves_no_quote(fake, monkeypatch):
+    request_id, lines = _quote_lines(fake)
+    _fail_items_insert(fake, monkeypatch)
+
+    with pytest.raises(ServiceUnavailable):
+        repository.create_quote_with_items(request_id, "admin", lines)
+    assert _quotes(fake, request_id) == []
+
+
+def test_failed_cleanup_keeps_the_original_error(fake, monkeypatch, caplog):
+    request_id, lines = _quote_lines(fake)
+    _fail_items_insert(fake, monkeypatch, cleanup_error=RuntimeError("cleanup failed"))
+
+    with caplog.at_level(logging.ERROR, logger="models.repository"):
+        with pytest.raises(ServiceUnavailable):
+            repository.create_quote_with_items(request_id, "admin", lines)
+    assert "Removing half-written quote" in caplog.text
+
+
+def test_accepting_twice_creates_one_set_of_orders(customer_client, fake):
+    request_id, lines = _quote_lines(fake)
+    quote_id, _ = repository.create_quote_with_items(request_id, "admin", lines)
+
+    for _ in range(2):
+        response = customer_client.post(f"/customer/quotes/{quote_id}/accept")
+        assert response.status_code == 302
+    with customer_client.session_transaction() as session:
+        assert ("info", "Báo giá này đã được xử lý trước đó.") in session["_flashes"]
+
+    assert jobs.queue.counts() == {"queued": 1}
+    assert jobs.queue.run_pending() == 1
+    orders = [o for o in fake.tables["orders"] if o.get("quote_id") == quote_id]
+    assert len(orders) == 1  # one supplier in the quote
+    assert [q["status"] for q in fake.tables["quotes"] if q["id"] == quote_id] == ["accepted"]
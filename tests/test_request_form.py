@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from routes.customer import _parse_request_items
+
+
+def test_parse_request_items_merges_duplicates():
+    assert _parse_request_items(["a", "b", "a", ""], ["2", "1", "3", ""]) == {"a": 5, "b": 1}
+
+
+@pytest.mark.parametrize(
+    "quantity, message",
+    [("1.5", "Số lượng phải là số nguyên"), ("0", "Số lượng phải lớn hơn 0")],
+)
+def test_parse_request_items_rejects_bad_quantity(quantity, message):
+    with pytest.raises(ValueError, match=message):
+        _parse_request_items(["a"], [quantity])
+
+
+def test_bad_quantity_is_reported_without_breaking_the_page(customer_client, fake):
+    product_id = fake.tables["products"][0]["id"]
+    response = customer_client.post(
+        "/customer/request/new",
+        data={"product_id[]": [product_id], "quantity[]": ["1.5'"]},
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    assert "base 10" not in response.text
+    # The message reaches the inline script as a JSON string literal
+    assert f"showToast({json.dumps('Số lượng phải là số nguyên')}, 'error')" in response.text
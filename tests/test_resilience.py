@@ -0,0 +1,178 @@
+import time
+
+import httpx
+import pytest
+from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+
+from models import cache, concurrency
+from models.catalog import catalog_cache
+from models.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Policy,
+    ResilientClient,
+    RetryBudget,
+    ServiceUnavailable,
+)
+
+
+def _policy(failures=2, reset=0.05, budget=None, retries=2, deadline=None, attempt_timeout=0):
+    return Policy(
+        CircuitBreaker(failures, reset),
+        budget or RetryBudget(ratio=0, max_tokens=10),
+        retries=retries,
+        backoff=0,
+        sleep=lambda seconds: None,
+        deadline=deadline,
+        attempt_timeout=attempt_timeout,
+    )
+
+
+class Flaky:
+    """Fails with `error` the first `failures` calls, then returns "ok"."""
+
+    def __init__(self, failures, error=httpx.ReadTimeout("down")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def test_breaker_opens_then_half_opens_for_one_probe():
+    policy = _policy(failures=2, reset=0.05)
+    down = Flaky(failures=100)
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable):
+            policy.call(down, idempotent=False)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+    # Open: fails fast without calling out
+    with pytest.raises(CircuitOpenError) as exc:
+        policy.call(down, idempotent=False)
+    assert down.calls == 2 and 0 < exc.value.retry_after <= 0.05
+
+    # After the reset timeout a single probe goes through; while it runs,
+    # other calls still fail fast
+    time.sleep(0.06)
+
+    def probe():
+        assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            policy.call(down, idempotent=False)
+        return "ok"
+
+    assert policy.call(probe, idempotent=False) == "ok"
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_opens_the_breaker_again():
+    policy = _policy(failures=1, reset=0.05)
+    with pytest.raises(ServiceUnavailable):
+        policy.call(Flaky(failures=1), idempotent=False)
+    time.sleep(0.06)
+    with pytest.raises(ServiceUnavailable):
+        policy.call(Flaky(failures=1), idempotent=False)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+
+def test_reads_are_retried_until_the_budget_runs_out():
+    policy = _policy(failures=100, budget=RetryBudget(ratio=0, max_tokens=2), retries=2)
+    flaky = Flaky(failures=2)
+    assert policy.call(flaky, idempotent=True) == "ok"
+    assert flaky.calls == 3 and policy.budget.tokens == 0
+
+    # Budget spent: the next failing read is not retried
+    flaky = Flaky(failures=1)
+    with pytest.raises(ServiceUnavailable):
+        policy.call(flaky, idempotent=True)
+    assert flaky.calls == 1
+
+
+def test_writes_are_not_retried():
+    policy = _policy(failures=100)
+    flaky = Flaky(failures=1)
+    with pytest.raises(ServiceUnavailable):
+        policy.call(flaky, idempotent=False)
+    assert flaky.calls == 1
+
+
+def test_no_retry_that_would_overrun_the_read_deadline():
+    policy = _policy(failures=100, deadline=1, attempt_timeout=2)
+    flaky = Flaky(failures=1)
+    with pytest.raises(ServiceUnavailable):
+        policy.call(flaky, idempotent=True)
+    assert flaky.calls == 1
+
+
+def test_gather_past_its_deadline_is_a_service_unavailable():
+    with pytest.raises(ServiceUnavailable) as exc:
+        concurrency.gather(lambda: time.sleep(0.3), lambda: 1, timeout=0.05)
+    assert exc.value.retry_after == 0.05
+
+
+def test_gather_timeout_is_a_503_with_retry_after(admin_client, fake, monkeypatch):
+    def slow(*calls, timeout=None):
+        return concurrency.gather(lambda: time.sleep(0.3), *calls, timeout=0.05)[1:]
+
+    fake.seed("orders", [{"customer_id": fake.tables["customers"][0]["id"], "status": "pending"}])
+    monkeypatch.setattr("models.repository.gather", slow)
+    response = admin_client.get(f"/admin/orders/{fake.tables['orders'][-1]['id']}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_catalog_is_served_stale_with_x_degraded(customer_client, fake, monkeypatch):
+    assert customer_client.get("/customer/request/new").status_code == 200
+    assert "X-Degraded" not in customer_client.get("/customer/request/new").headers
+
+    # Past the catalog TTL, with Supabase down
+    now = time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + catalog_cache.ttl + 1)
+    fake.faults.fail_next(100, kind="connect")
+    response = customer_client.get("/customer/request/new")
+
+    assert response.status_code == 200
+    assert response.headers["X-Degraded"] == "catalog"
+    assert fake.tables["products"][0]["name"] in response.text
+    assert catalog_cache.stats()["stale_served"] >= 1
+
+
+def test_catalog_without_a_stale_copy_is_a_503(customer_client, fake):
+    fake.faults.fail_next(100, kind="http503")
+    response = customer_client.get("/customer/request/new")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_one_http_request_per_policy_attempt():
+    requests = []
+
+    def unavailable(request):
+        requests.append(request)
+        return httpx.Response(503, json={"message": "unavailable"})
+
+    http = httpx.Client(transport=httpx.MockTransport(unavailable))
+    client = ResilientClient(
+        create_client(
+            "http://supabase.test",
+            "anon-key",
+            options=SyncClientOptions(httpx_client=http, auto_refresh_token=False),
+        ),
+        _policy(failures=100, budget=RetryBudget(ratio=0, max_tokens=10), retries=2),
+    )
+
+    with pytest.raises(ServiceUnavailable):
+        client.table("products").select("id").eq("id", "p1").single().execute()
+    assert len(requests) == 3  # the first attempt and two retries
+    assert all("X-Retry-Count" not in r.headers for r in requests)
+
+    requests.clear()
+    with pytest.raises(ServiceUnavailable):
+        client.rpc("admin_statistics", {}).execute()
+    assert len(requests) == 3